@@ -0,0 +1,161 @@
+"""
+Incrementally Updated Belief Map of the Chemical Field Inside the Tank
+
+Every sensor reading is splatted onto a fixed grid over the tank with a
+truncated Gaussian kernel. Adding a reading only touches the window of grid
+cells under the kernel, so the cost of an update is bounded no matter how many
+readings the boat has already collected.
+"""
+
+# Import Basic Modules
+import math
+import numpy as np
+# Import Grid Interpolation
+from gridInterpolation import bilinearInterpolate
+
+
+class beliefMap(object):
+    """
+    A beliefMap is a kernel-smoothed estimate of the field over the tank grid.
+
+    The estimate at each grid node is sum(w*z)/sum(w) over all readings, where
+    w is a Gaussian of the distance to the reading. Both sums, the estimate and
+    its gradient are stored as arrays and updated inside the kernel window only.
+    """
+    def __init__(self, tankWidth, tankHeight, scaleTiles = 4, kernelWidth = 1, kernelCutoff = 3, priorWeight = 1E-3, priorValue = 0):
+        """
+        tankWidth, tankHeight: the tank dimensions (tiles)
+        scaleTiles: the number of grid nodes per tile
+        kernelWidth: the standard deviation of the Gaussian kernel (tiles)
+        kernelCutoff: the kernel is truncated at kernelCutoff*kernelWidth
+        priorWeight, priorValue: the weight/value assumed where nothing was read
+        """
+        # Define Grid Parameters
+        self.tankWidth = tankWidth
+        self.tankHeight = tankHeight
+        self.scaleTiles = scaleTiles
+        self.numX = int(tankWidth*scaleTiles) + 1
+        self.numY = int(tankHeight*scaleTiles) + 1
+        # Define Kernel Parameters
+        self.kernelWidth = kernelWidth
+        self.windowRadius = int(math.ceil(kernelCutoff*kernelWidth*scaleTiles))
+        self.priorWeight = priorWeight
+        self.priorValue = priorValue
+
+        # Initialize the Map
+        self.reset()
+
+    def reset(self):
+        # Running Sums of the Kernel Weights and Weighted Readings
+        self.weightSum = np.zeros((self.numX, self.numY))
+        self.valueSum = np.zeros((self.numX, self.numY))
+        # The Current Estimate and its Gradient
+        self.estimate = np.full((self.numX, self.numY), float(self.priorValue))
+        self.gradX = np.zeros((self.numX, self.numY))
+        self.gradY = np.zeros((self.numX, self.numY))
+        # Cache the Location of the Maximum
+        self.maxIndex = (0, 0)
+        self.numReadings = 0
+
+    def getWindow(self, x, y, padding = 0):
+        # Find the Grid Node Closest to the Reading
+        xIndex = int(round(x*self.scaleTiles))
+        yIndex = int(round(y*self.scaleTiles))
+        # Bound the Kernel Window by the Grid
+        radius = self.windowRadius + padding
+        xStart = max(0, xIndex - radius); xEnd = min(self.numX, xIndex + radius + 1)
+        yStart = max(0, yIndex - radius); yEnd = min(self.numY, yIndex + radius + 1)
+        return xStart, xEnd, yStart, yEnd
+
+    def addReading(self, x, y, z):
+        """
+        Add a single reading z at the position (x, y). Only the grid nodes
+        inside the kernel window are updated.
+        """
+        # Ignore Readings Outside the Grid or Without a Value
+        if not (0 <= x <= self.tankWidth and 0 <= y <= self.tankHeight) or not np.isfinite(z):
+            return
+        xStart, xEnd, yStart, yEnd = self.getWindow(x, y)
+        if xStart >= xEnd or yStart >= yEnd:
+            return
+
+        # Find the Kernel Weights Inside the Window
+        xGrid = np.arange(xStart, xEnd)/self.scaleTiles - x
+        yGrid = np.arange(yStart, yEnd)/self.scaleTiles - y
+        weights = np.exp(-(xGrid[:,None]**2 + yGrid[None,:]**2)/(2*self.kernelWidth**2))
+        # Add the Reading to the Running Sums
+        self.weightSum[xStart:xEnd, yStart:yEnd] += weights
+        self.valueSum[xStart:xEnd, yStart:yEnd] += weights*z
+        self.numReadings += 1
+
+        # Update the Estimate and Gradient Inside the Window
+        self.updateWindow(x, y)
+
+    def addReadings(self, sensorPoints):
+        """
+        Add a collection of (x, y, z) sensor points to the map.
+        """
+        for sensorPoint in sensorPoints:
+            self.addReading(sensorPoint[0], sensorPoint[1], sensorPoint[2])
+
+    def updateWindow(self, x, y):
+        # Recompute the Estimate Where the Sums Changed
+        xStart, xEnd, yStart, yEnd = self.getWindow(x, y)
+        window = (slice(xStart, xEnd), slice(yStart, yEnd))
+        self.estimate[window] = (self.valueSum[window] + self.priorWeight*self.priorValue) / (self.weightSum[window] + self.priorWeight)
+
+        # Recompute the Gradient One Node Past the Window (Central Differences Reach Across the Edge)
+        gxStart, gxEnd, gyStart, gyEnd = self.getWindow(x, y, padding = 1)
+        self.gradX[gxStart:gxEnd, gyStart:gyEnd] = self.windowGradient(gxStart, gxEnd, gyStart, gyEnd, axis = 0)
+        self.gradY[gxStart:gxEnd, gyStart:gyEnd] = self.windowGradient(gxStart, gxEnd, gyStart, gyEnd, axis = 1)
+
+        # Keep the Cached Maximum Up to Date
+        windowMax = np.unravel_index(np.argmax(self.estimate[window]), self.estimate[window].shape)
+        windowMax = (windowMax[0] + xStart, windowMax[1] + yStart)
+        # If the Old Maximum Was Inside the Window it May Have Dropped: Search the Whole Grid Again
+        if xStart <= self.maxIndex[0] < xEnd and yStart <= self.maxIndex[1] < yEnd:
+            self.maxIndex = np.unravel_index(np.argmax(self.estimate), self.estimate.shape)
+        elif self.estimate[windowMax] > self.estimate[self.maxIndex]:
+            self.maxIndex = windowMax
+
+    def windowGradient(self, xStart, xEnd, yStart, yEnd, axis):
+        # Pad the Slice by One Node so the Central Difference is Exact on the Border
+        numNodes = self.estimate.shape[axis]
+        start, end = (xStart, xEnd) if axis == 0 else (yStart, yEnd)
+        lower = max(0, start - 1); upper = min(numNodes, end + 1)
+        if axis == 0:
+            block = self.estimate[lower:upper, yStart:yEnd]
+        else:
+            block = self.estimate[xStart:xEnd, lower:upper]
+        # Use Central Differences (One Sided on the Grid Border)
+        if block.shape[axis] < 2:
+            return np.zeros((xEnd - xStart, yEnd - yStart))
+        gradient = np.gradient(block, 1/self.scaleTiles, axis = axis)
+        # Remove the Padding
+        offset = start - lower
+        if axis == 0:
+            return gradient[offset:offset + (end - start), :]
+        return gradient[:, offset:offset + (end - start)]
+
+    def interpolateGrid(self, grid, x, y):
+        # Bilinear Interpolation of a Grid at the Given Positions
+        return bilinearInterpolate(grid, self.scaleTiles, x, y)
+
+    def valueAt(self, x, y):
+        """
+        Return the estimated field at the position(s) (x, y).
+        """
+        return self.interpolateGrid(self.estimate, x, y)
+
+    def gradientAt(self, x, y):
+        """
+        Return the estimated gradient (dz/dx, dz/dy) at the position (x, y).
+        """
+        return np.array([self.interpolateGrid(self.gradX, x, y), self.interpolateGrid(self.gradY, x, y)])
+
+    def getMaximum(self):
+        """
+        Return the (x, y) position and value of the largest estimate.
+        """
+        xIndex, yIndex = self.maxIndex
+        return xIndex/self.scaleTiles, yIndex/self.scaleTiles, self.estimate[xIndex, yIndex]
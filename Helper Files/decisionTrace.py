@@ -0,0 +1,133 @@
+"""
+Sampled Traces of a Boat's Decisions
+
+A decision trace stores, for every sampleEvery-th step of a boat, what its
+strategy weighed up (the gradient, the heuristic direction and the angle
+between them), which branch it took and how its speed changed, so a run can
+be debugged without plotting or printing while it runs. Steps are collected
+in a preallocated buffer and written out when it fills. The file is
+    b"BOATTRC1" | header length (uint32) | JSON header | records
+where the JSON header holds the strategy and its parameters and every record
+is a fixed entry of recordType. plotDecisions() draws chosen steps afterwards.
+"""
+
+# Import Basic Modules
+import json
+import struct
+import numpy as np
+import matplotlib.pyplot as plt
+
+# File Layout
+TRACE_MAGIC = b"BOATTRC1"
+recordType = np.dtype([('step', '<u4'), ('x', '<f8'), ('y', '<f8'), ('gradX', '<f4'), ('gradY', '<f4'),
+                       ('heuristicX', '<f4'), ('heuristicY', '<f4'), ('blendAngle', '<f4'), ('branch', 'u1'), ('blended', 'u1'),
+                       ('newX', '<f4'), ('newY', '<f4'), ('speedBefore', '<f4'), ('speedAfter', '<f4')])
+# The Branch a Step Took is Stored as a Single Byte
+branchNames = ["sourceNear", "gradient", "weightedMax", "stuck"]
+
+
+class decisionTraceWriter(object):
+    """
+    Collects a boat's sampled decisions and appends them to a trace file.
+    """
+    def __init__(self, traceFile, header = None, sampleEvery = 1, bufferSize = 256):
+        """
+        traceFile: the path of the trace to create (overwritten if it exists)
+        header: a JSON-serializable dict with the run's parameters
+        sampleEvery: record one step in this many
+        """
+        self.traceFile = traceFile
+        self.sampleEvery = max(1, int(sampleEvery))
+        self.records = np.zeros(max(1, int(bufferSize)), dtype=recordType)
+        self.numBuffered = 0
+        self.numRecords = 0
+        self.stepNum = -1
+        # Write the File Header
+        headerBytes = json.dumps(dict(header or {}, sampleEvery = self.sampleEvery)).encode()
+        self.outFile = open(traceFile, "wb")
+        self.outFile.write(TRACE_MAGIC + struct.pack("<I", len(headerBytes)) + headerBytes)
+
+    def nextStep(self):
+        """
+        Count a step. returns: True if this step is sampled (record it)
+        """
+        self.stepNum += 1
+        return self.stepNum % self.sampleEvery == 0
+
+    def record(self, **stepValues):
+        """
+        Store the current step's decision (fields of recordType; those left
+        out are zero). Written to the file once the buffer is full.
+        """
+        self.records[self.numBuffered] = 0
+        stepRecord = self.records[self.numBuffered]
+        stepRecord['step'] = self.stepNum
+        for fieldName, fieldValue in stepValues.items():
+            stepRecord[fieldName] = fieldValue
+        self.numBuffered += 1
+        if self.numBuffered == len(self.records):
+            self.flush()
+
+    def flush(self):
+        self.outFile.write(self.records[:self.numBuffered].tobytes())
+        self.outFile.flush()
+        self.numRecords += self.numBuffered
+        self.numBuffered = 0
+
+    def close(self):
+        if not self.outFile.closed:
+            self.flush()
+            self.outFile.close()
+
+
+def readDecisionTrace(traceFile):
+    """
+    Load a decision trace.
+
+    returns: the header dict and a structured array of recordType
+    """
+    with open(traceFile, "rb") as inFile:
+        if inFile.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError("Not a Decision Trace: " + str(traceFile))
+        headerLength, = struct.unpack("<I", inFile.read(4))
+        header = json.loads(inFile.read(headerLength).decode())
+        recordBytes = inFile.read()
+    # Ignore a Partly Written Last Record
+    numRecords = len(recordBytes)//recordType.itemsize
+    return header, np.frombuffer(recordBytes[:numRecords*recordType.itemsize], dtype=recordType)
+
+
+def plotDecisions(traceFile, stepNums = None, arrowLength = 1, outFile = None):
+    """
+    Draw the recorded decisions of a trace: at each step, the gradient
+    (black), the heuristic direction (red) and the direction taken (green).
+
+    stepNums: the steps to draw (None = every recorded step)
+    outFile: save the figure here instead of showing it
+    """
+    header, records = readDecisionTrace(traceFile)
+    if stepNums is not None:
+        records = records[np.isin(records['step'], stepNums)]
+    fig = plt.figure()
+    ax = fig.add_subplot()
+    ax.plot(records['x'], records['y'], 'o-', c = 'tab:blue', alpha = 0.4, markersize = 3)
+    for vectorX, vectorY, vectorColor in (('gradX', 'gradY', 'black'), ('heuristicX', 'heuristicY', 'red'), ('newX', 'newY', 'green')):
+        # Draw Every Vector at the Same Length
+        vectorLength = np.hypot(records[vectorX], records[vectorY])
+        vectorScale = np.divide(arrowLength, vectorLength, out=np.zeros(len(records)), where=vectorLength > 0)
+        ax.quiver(records['x'], records['y'], records[vectorX]*vectorScale, records[vectorY]*vectorScale, color = vectorColor,
+                  angles = 'xy', scale_units = 'xy', scale = 1, width = 0.004)
+    for stepRecord in records:
+        ax.annotate(str(stepRecord['step']) + " " + branchNames[stepRecord['branch']] + ("+" if stepRecord['blended'] else ""),
+                    (stepRecord['x'], stepRecord['y']), fontsize = 7)
+    # Set Figure Information
+    ax.set_xlabel("X-Axis")
+    ax.set_ylabel("Y-Axis")
+    ax.set_title("Decisions of " + str(header.get('strategy', "the Boat")))
+    ax.set_aspect('equal')
+    if outFile is not None:
+        fig.savefig(outFile)
+        plt.close(fig)
+    else:
+        plt.show()
+    return ax
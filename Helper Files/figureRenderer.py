@@ -0,0 +1,118 @@
+"""
+Per-Run Figures Drawn on a Cached Raster of the Field
+
+The field is sampled once per dataset into a raster image (fieldRaster) and
+drawn with imshow, so a figure only adds the trajectories on top of it.
+A figureRenderer saves the figures from a pool of background processes using
+the Agg backend, so a sweep never waits for matplotlib:
+
+    renderer = figureRenderer(waterTank)
+    compareAlgorythms(..., renderer = renderer)
+    renderer.close()   # Wait for the Last Figures
+"""
+
+# Import Basic Modules
+import os
+import multiprocessing
+import numpy as np
+# Import Plotting Modules
+import matplotlib.pyplot as plt
+
+# Rasters Already Computed This Session, by Dataset and Tank Size
+fieldRasters = {}
+
+
+def fieldRaster(waterTank, numPoints = 300):
+    """
+    Sample the tank's field on a numPoints x numPoints grid (cached per
+    dataset and tank size).
+
+    returns: the readings indexed [x, y] and the image extent
+    """
+    rasterKey = (getattr(waterTank, 'simFile', None) or id(waterTank), type(waterTank).__name__, waterTank.tankWidth, waterTank.tankHeight, numPoints,
+                 getattr(waterTank, 'sensorDepths', None), getattr(waterTank, 'depthMode', None))
+    if rasterKey not in fieldRasters:
+        xVec = np.linspace(0, waterTank.tankWidth, numPoints)
+        yVec = np.linspace(0, waterTank.tankHeight, numPoints)
+        xx, yy = np.meshgrid(xVec, yVec, indexing='ij')
+        fieldRasters[rasterKey] = (waterTank.fieldReadings(xx, yy), (0, waterTank.tankWidth, 0, waterTank.tankHeight))
+    return fieldRasters[rasterKey]
+
+
+def drawRunFigure(fieldImage, extent, algPositions, legendLabels, colorTypes, zOrder, outFile, dpi = 300):
+    """
+    Draw the trajectories of one run over the field and save the figure.
+
+    fieldImage: the field readings indexed [x, y] (see fieldRaster)
+    algPositions: a list of {'x': [...], 'y': [...]} paths, one per strategy
+    legendLabels: the legend entry of each path
+    returns: the figure (already saved to outFile)
+    """
+    fig = plt.figure()
+    ax = fig.add_subplot(111, xlim=[extent[0], extent[1]], ylim=[extent[2], extent[3]], autoscale_on=False)
+    ax.set_aspect('auto')
+    # Draw the Field Once as an Image
+    fieldPlot = ax.imshow(fieldImage.T, origin='lower', extent=extent, cmap='jet', aspect='auto', interpolation='nearest')
+    fig.colorbar(fieldPlot)
+
+    for pathNum, pathPositions in enumerate(algPositions):
+        ax.plot(pathPositions['x'], pathPositions['y'], color=colorTypes[pathNum], label=legendLabels[pathNum], linewidth=2, zorder=zOrder[pathNum])
+
+    ax.axis('off')
+    lgd = ax.legend(loc='upper left', bbox_to_anchor=(1.25, 1.02), fancybox=True, shadow=True)
+    ax.tick_params(left=False, bottom=False, labelleft=False, labelbottom=False)
+
+    os.makedirs(os.path.dirname(outFile) or ".", exist_ok=True)
+    fig.savefig(outFile, dpi=dpi, transparent=True, bbox_extra_artists=(lgd,), bbox_inches='tight')
+    return fig
+
+
+# The Field Raster Each Rendering Worker Draws On (Set Once per Process)
+rendererState = {}
+
+def initializeRenderer(fieldImage, extent, dpi):
+    # Workers Never Show Figures
+    plt.switch_backend('Agg')
+    rendererState.update(fieldImage = fieldImage, extent = extent, dpi = dpi)
+
+def renderFigure(algPositions, legendLabels, colorTypes, zOrder, outFile):
+    fig = drawRunFigure(rendererState['fieldImage'], rendererState['extent'], algPositions, legendLabels, colorTypes, zOrder, outFile, rendererState['dpi'])
+    plt.close(fig)
+    return outFile
+
+
+class figureRenderer(object):
+    """
+    Saves per-run figures from a pool of background processes. The field
+    raster is computed once and sent to each worker when it starts.
+
+    numWorkers: the number of rendering processes (None = one per CPU)
+    """
+    def __init__(self, waterTank, numWorkers = None, dpi = 300, numPoints = 300):
+        self.fieldImage, self.extent = fieldRaster(waterTank, numPoints)
+        self.workerPool = multiprocessing.Pool(numWorkers, initializeRenderer, (self.fieldImage, self.extent, dpi))
+        self.pendingFigures = []
+
+    def submit(self, algPositions, legendLabels, colorTypes, zOrder, outFile):
+        """
+        Queue a figure (see drawRunFigure) and return immediately.
+        """
+        self.pendingFigures.append(self.workerPool.apply_async(renderFigure, (algPositions, legendLabels, colorTypes, zOrder, outFile)))
+        # Forget Figures That are Done (Raising Any Rendering Error)
+        while self.pendingFigures and self.pendingFigures[0].ready():
+            self.pendingFigures.pop(0).get()
+
+    def wait(self):
+        """
+        Wait until every queued figure is saved.
+
+        returns: the saved file names
+        """
+        savedFiles = [pendingFigure.get() for pendingFigure in self.pendingFigures]
+        self.pendingFigures = []
+        return savedFiles
+
+    def close(self):
+        self.wait()
+        self.workerPool.close()
+        self.workerPool.join()
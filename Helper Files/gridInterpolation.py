@@ -0,0 +1,25 @@
+"""
+Interpolation on Regular Grids Over the Tank
+
+A grid with scaleTiles nodes per tile has its node (i, j) at
+(i/scaleTiles, j/scaleTiles). The tanks' rasterized fields and the belief map
+are both stored this way and read back through bilinearInterpolate.
+"""
+
+# Import Basic Modules
+import numpy as np
+
+
+def bilinearInterpolate(grid, scaleTiles, x, y):
+    """
+    Bilinear interpolation of a grid whose node (i, j) lies at
+    (i/scaleTiles, j/scaleTiles). Positions outside are clamped to the edge.
+    Accepts single values or arrays.
+    """
+    xGrid = np.clip(np.asarray(x, dtype=float)*scaleTiles, 0, grid.shape[0] - 1)
+    yGrid = np.clip(np.asarray(y, dtype=float)*scaleTiles, 0, grid.shape[1] - 1)
+    xIndex = np.minimum(xGrid.astype(int), grid.shape[0] - 2)
+    yIndex = np.minimum(yGrid.astype(int), grid.shape[1] - 2)
+    xFrac = xGrid - xIndex; yFrac = yGrid - yIndex
+    return (grid[xIndex, yIndex]*(1 - xFrac)*(1 - yFrac) + grid[xIndex + 1, yIndex]*xFrac*(1 - yFrac)
+            + grid[xIndex, yIndex + 1]*(1 - xFrac)*yFrac + grid[xIndex + 1, yIndex + 1]*xFrac*yFrac)
@@ -5,14 +5,20 @@ This simulation has been adapted from https://ocw.mit.edu/courses/electrical-eng
 # Import Basic Modules
 import os
 import sys
+import copy
 import math
 import random
+import asyncio
+import threading
 import numpy as np
 # Import Code to Simulate/Visualize the Boat's Movement
 import simulateBoat
 # Interpolation
 from scipy import interpolate
-from scipy.interpolate import LinearNDInterpolator
+from scipy.interpolate import LinearNDInterpolator, NearestNDInterpolator
+# Obstacle Distance Fields
+from scipy import ndimage
+from scipy.spatial import cKDTree
 # Plotting
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import axes3d
@@ -21,10 +27,123 @@ import matplotlib.patheffects as pe
 sys.path.append('./Helper Files/simulatedSource/')  # Folder with All the Helper Files
 sys.path.append('./simulatedSource/')  # Folder with All the Helper Files
 import extractSimulatedData
+# Import Incremental Map of the Sensor Readings
+import beliefMap
+# Import Grid Interpolation
+from gridInterpolation import bilinearInterpolate
+# Import Recording/Replaying of Sensor Sessions
+import sessionLog
+# Import On-Disk Cache of Simulation Runs
+import resultCache
+import readingCache
+import telemetryBuffer
+# Import Memory-Mapped 3D Fields
+import volumeGrid
+# Import Runs That Can be Snapshotted and Forked
+import simulationRun
+# Import Figure Rendering
+import figureRenderer
+# Import Sampled Traces of Boat Decisions
+import decisionTrace
+# Import the Particle Filter Over Source Locations
+import particleFilter
 
 # --------------------------------------------------------------------------- #
 #                            Basic Object Classes                             #
 # --------------------------------------------------------------------------- #
+def findFieldPeaks(fieldGrid, scaleTiles, minProminence = 0.05, minSeparation = 3, maxPeaks = None):
+    """
+    Find the peaks of a grid whose node (i, j) lies at (i/scaleTiles,
+    j/scaleTiles) with one pass of a maximum and a minimum filter.
+
+    A node is a peak when it is the highest node within minSeparation tiles
+    (a square window) and rises at least minProminence (a fraction of the
+    grid's maximum) above the lowest node in that window.
+
+    maxPeaks: keep only the highest maxPeaks peaks (None = all of them)
+    returns: an array of shape (numPeaks, 2) of peak positions, highest first
+    """
+    fieldMax = np.max(fieldGrid)
+    if not fieldMax > 0:
+        return np.zeros((0, 2))
+    # Compare Every Node to the Highest and Lowest Nodes Around It
+    windowSize = 2*int(round(minSeparation*scaleTiles)) + 1
+    maxGrid = ndimage.maximum_filter(fieldGrid, size=windowSize, mode='nearest')
+    minGrid = ndimage.minimum_filter(fieldGrid, size=windowSize, mode='nearest')
+    peakNodes = np.argwhere((fieldGrid == maxGrid) & (fieldGrid - minGrid >= minProminence*fieldMax) & (fieldGrid > 0))
+    # Order the Peaks from Highest to Lowest
+    peakHeights = fieldGrid[peakNodes[:,0], peakNodes[:,1]]
+    peakPositions = peakNodes[np.argsort(-peakHeights, kind='stable')]/scaleTiles
+    # Flat Tops Give Several Equal Nodes: Accept Peaks Highest First, Dropping Those Too Close to an Accepted One
+    closePeaks = cKDTree(peakPositions).query_ball_point(peakPositions, np.nextafter(minSeparation, 0))
+    isKept = np.zeros(len(peakPositions), dtype=bool); numKept = 0
+    for peakNum in range(len(peakPositions)):
+        if maxPeaks is not None and numKept >= maxPeaks:
+            break
+        if not isKept[closePeaks[peakNum]].any():
+            isKept[peakNum] = True; numKept += 1
+    return peakPositions[isKept]
+
+def supercoverTiles(startX, startY, endX, endY, edgeTolerance = 1E-9, returnSegments = False):
+    """
+    Find the tiles touched by each segment (start, end): the tiles at both
+    ends and, wherever a segment crosses a grid line, the tiles on each side
+    of it (all four at a corner). Every segment is handled at once.
+
+    startX, startY, endX, endY: arrays (or single values) of the segments
+    returns: the x and y indices of the touched tiles (with repeats; tiles
+        off the tank are not removed), and with returnSegments the segment
+        each tile belongs to
+    """
+    startX, startY, endX, endY = (np.atleast_1d(np.asarray(value, dtype=float)) for value in (startX, startY, endX, endY))
+    # The Ends of Each Segment
+    pointsX = [startX, endX]; pointsY = [startY, endY]
+    pointSegments = [np.arange(len(startX)), np.arange(len(startX))]
+    # Where Each Segment Crosses the Vertical (x = k), Then Horizontal (y = k), Grid Lines
+    for lineStart, lineEnd, alongStart, alongEnd, linesAreX in ((startX, endX, startY, endY, True), (startY, endY, startX, endX, False)):
+        firstLine = np.ceil(np.minimum(lineStart, lineEnd))
+        numLines = np.where(lineStart != lineEnd, np.floor(np.maximum(lineStart, lineEnd)) - firstLine + 1, 0).astype(int)
+        maxLines = int(numLines.max(initial=0))
+        if maxLines == 0:
+            continue
+        lineNums = np.arange(maxLines)
+        crossesLine = lineNums[None,:] < numLines[:,None]
+        gridLines = (firstLine[:,None] + lineNums[None,:])[crossesLine]
+        segmentNums = np.nonzero(crossesLine)[0]
+        # Fraction of the Segment at the Crossing
+        crossFraction = (gridLines - lineStart[segmentNums])/(lineEnd[segmentNums] - lineStart[segmentNums])
+        crossAlong = alongStart[segmentNums] + crossFraction*(alongEnd[segmentNums] - alongStart[segmentNums])
+        pointsX.append(gridLines if linesAreX else crossAlong)
+        pointsY.append(crossAlong if linesAreX else gridLines)
+        pointSegments.append(segmentNums)
+    pointsX = np.concatenate(pointsX); pointsY = np.concatenate(pointsY)
+    # Take the Tiles on Either Side of Any Grid Line a Point Lies On
+    lowX, highX = np.floor(pointsX - edgeTolerance), np.floor(pointsX + edgeTolerance)
+    lowY, highY = np.floor(pointsY - edgeTolerance), np.floor(pointsY + edgeTolerance)
+    tileX = np.concatenate([lowX, lowX, highX, highX]); tileY = np.concatenate([lowY, highY, lowY, highY])
+    if returnSegments:
+        return tileX.astype(int), tileY.astype(int), np.tile(np.concatenate(pointSegments), 4)
+    return tileX.astype(int), tileY.astype(int)
+
+def arrayBytes(value):
+    """
+    Return the bytes held by the NumPy arrays in value: an array, a container
+    of arrays, or a SciPy interpolator (its samples and triangulation).
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(arrayBytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(arrayBytes(item) for item in value)
+    if isinstance(value, (LinearNDInterpolator, NearestNDInterpolator)):
+        numBytes = arrayBytes(value.points) + arrayBytes(value.values)
+        triangulation = getattr(value, 'tri', None)
+        if triangulation is not None:
+            numBytes += sum(arrayBytes(getattr(triangulation, arrayName)) for arrayName in ('simplices', 'neighbors', 'equations', 'transform'))
+        return numBytes
+    return 0
+
 class Position(object):
     """
     A Position represents a location in a two-dimensional tank.
@@ -104,8 +223,11 @@ class rectangularTank(object):
 
     A tank has a tankWidth and a tankHeight and contains (tankWidth * tankHeight) tiles. At any
     particular time, each of these tiles are either visited or not visited
+
+    All of a tank's data is kept in NumPy arrays: the visited tiles are a
+    boolean array indexed [x, y], and field data is stored as fieldDtype.
     """
-    def __init__(self, tankWidth, tankHeight):
+    def __init__(self, tankWidth, tankHeight, fieldDtype = np.float64):
         """
         Initializes a rectangular tank with the specified tankWidth and tankHeight.
 
@@ -113,31 +235,64 @@ class rectangularTank(object):
 
         tankWidth: an integer > 0
         tankHeight: an integer > 0
+        fieldDtype: the precision of the stored field data (np.float32 halves its memory)
         """
         # Define Basic Parameters
         self.tankWidth = int(tankWidth)
         self.tankHeight = int(tankHeight)
-        self.tiles = {}
+        self.fieldDtype = np.dtype(fieldDtype)
+        self.tiles = np.zeros((self.tankWidth, self.tankHeight), dtype=bool)
+        # Obstacles Inside the Tank (None = Open Water)
+        self.obstacleMask = None
+        self.obstacleSDF = None
+        self.obstacleScale = 1
+        self.projectionTables = {}
+        # Log of Every Reading (None = Not Recording)
+        self.sessionLog = None
+        # Cache of Recent Readings (None = Always Read the Sensors)
+        self.readingCache = None
+        # Mark Every Tile a Move Crosses (False = Only the Tile Moved To)
+        self.markSweptPaths = True
         
         # Initialize the Board
         self.initializeBoard()
     
     def initializeBoard(self):
-        for x in range(self.tankWidth):
-            for y in range(self.tankHeight):
-                self.tiles[(x, y)] = False
+        self.tiles.fill(False)
             
     def markAsVisited(self, pos):
         """
         Mark the tile under the position POS as visited.
-        Assumes that POS represents a valid position inside this tank.
+        Positions off the tiles (e.g. on the far walls) mark nothing.
 
         pos: a Position object
         """
         x = math.floor(pos.getX())
         y = math.floor(pos.getY())
-        self.tiles[(x, y)] = True
+        if 0 <= x < self.tankWidth and 0 <= y < self.tankHeight:
+            self.tiles[x, y] = True
         
+    def markPath(self, startPos, endPos):
+        """
+        Mark the tiles a move from startPos to endPos crosses as visited (only
+        the tile under endPos if markSweptPaths is False).
+
+        startPos, endPos: Position objects
+        """
+        if not self.markSweptPaths:
+            self.markAsVisited(endPos)
+        else:
+            self.markSegments(startPos.getX(), startPos.getY(), endPos.getX(), endPos.getY())
+    
+    def markSegments(self, startX, startY, endX, endY):
+        """
+        Mark every tile crossed by the segments (start, end) as visited (see
+        supercoverTiles). Accepts arrays, so all boats of a step are marked at once.
+        """
+        tileX, tileY = supercoverTiles(startX, startY, endX, endY)
+        onTiles = (0 <= tileX) & (tileX < self.tankWidth) & (0 <= tileY) & (tileY < self.tankHeight)
+        self.tiles[tileX[onTiles], tileY[onTiles]] = True
+    
     def hasVisited(self, m, n):
         """
         Return True if the tile (m, n) has been visited.
@@ -147,7 +302,7 @@ class rectangularTank(object):
         n: an integer
         returns: True if (m, n) was visited, False otherwise
         """
-        return self.tiles[(m, n)]
+        return bool(self.tiles[m, n])
     
     def getNumTiles(self):
         """
@@ -163,7 +318,7 @@ class rectangularTank(object):
 
         returns: an integer
         """
-        return sum(self.tiles.values())
+        return int(np.count_nonzero(self.tiles))
     
     def getRandomPosition(self):
         """
@@ -174,36 +329,311 @@ class rectangularTank(object):
         return Position(random.random() * self.tankWidth,
                         random.random() * self.tankHeight)
     
+    def memoryUsage(self):
+        """
+        Return the bytes held by each of the tank's arrays.
+
+        returns: a dict from attribute name to bytes, plus the 'total'
+        """
+        memoryUsage = {}
+        for attributeName, attributeValue in vars(self).items():
+            numBytes = arrayBytes(attributeValue)
+            if numBytes:
+                memoryUsage[attributeName] = numBytes
+        memoryUsage['total'] = sum(memoryUsage.values())
+        return memoryUsage
+    
+    def posReadings(self, positions, sensorTypes):
+        """
+        Read several sensor positions. Tanks that can read sensors at the same
+        time override this; by default each position is read in turn.
+        """
+        return [self.posReading(position, sensorType = sensorType) for position, sensorType in zip(positions, sensorTypes)]
+    
+    def fieldReadings(self, x, y):
+        """
+        Return the readings at many positions at once (arrays x and y of the
+        same shape). Tanks with a vectorized field override this.
+        """
+        readings = [float(np.squeeze(self.posReading((xPos, yPos)))) for xPos, yPos in zip(np.ravel(x), np.ravel(y))]
+        return np.reshape(readings, np.shape(x))
+    
+    def readSensors(self, positions, sensorTypes):
+        """
+        Read several sensor positions for a boat (through posReadings) and
+        record the readings if the session is being logged. With a reading
+        cache, only positions not already cached are read.
+        """
+        if self.readingCache is None:
+            readings = self.posReadings(positions, sensorTypes)
+        else:
+            readings = [self.readingCache.lookup(position) for position in positions]
+            # Read the Positions Missing from the Cache
+            missingReads = [readNum for readNum, reading in enumerate(readings) if reading is None]
+            if missingReads:
+                newReadings = self.posReadings([positions[readNum] for readNum in missingReads], [sensorTypes[readNum] for readNum in missingReads])
+                for readNum, reading in zip(missingReads, newReadings):
+                    self.readingCache.store(positions[readNum], reading)
+                    readings[readNum] = reading
+        if self.sessionLog is not None:
+            self.sessionLog.writeReadings(positions, sensorTypes, readings)
+        return readings
+    
+    def useReadingCache(self, positionQuantum = 0.01, maxEntries = 100000):
+        """
+        Answer repeated reads from a readingCache: reads within positionQuantum
+        of a cached position reuse its reading. Returns the cache (its stats
+        are in getStats()); positionQuantum = None turns caching off.
+        """
+        self.readingCache = readingCache.readingCache(positionQuantum, maxEntries) if positionQuantum is not None else None
+        return self.readingCache
+    
+    def startRecording(self, logFile):
+        """
+        Record every reading made through readSensors() to a session log that
+        replayTank can replay.
+        """
+        self.stopRecording()
+        sourceLocations = [(float(locX), float(locY)) for locX, locY in getattr(self, 'sourceLocations', None) or []]
+        self.sessionLog = sessionLog.sessionLogWriter(logFile, {'tankType': type(self).__name__, 'tankWidth': self.tankWidth,
+                                                                'tankHeight': self.tankHeight, 'sourceLocations': sourceLocations})
+    
+    def stopRecording(self):
+        if self.sessionLog is not None:
+            self.sessionLog.close()
+            self.sessionLog = None
+    
     def isPositionIntank(self, pos, tankBuffer):
         """
-        Return True if pos is inside the tank.
+        Return True if pos is inside the tank and at least tankBuffer away
+        from every obstacle.
 
         pos: a Position object.
         returns: True if pos is in the tank, False otherwise.
         """
         return ((tankBuffer <= pos.getX() < self.tankWidth - tankBuffer)
-                and (tankBuffer <= pos.getY() < self.tankHeight - tankBuffer))
+                and (tankBuffer <= pos.getY() < self.tankHeight - tankBuffer)
+                and self.obstacleDistance(pos.getX(), pos.getY()) >= tankBuffer)
+    
+    def isPathIntank(self, startPos, endPos, tankBuffer):
+        """
+        Return True if the straight move from startPos to endPos stays inside
+        the tank and never comes within tankBuffer of an obstacle.
+        """
+        if not self.isPositionIntank(endPos, tankBuffer):
+            return False
+        return self.findBlockedSample(startPos.getX(), startPos.getY(), endPos.getX(), endPos.getY(), tankBuffer)[2] is None
+    
+    # ----------------------------- Obstacles ----------------------------- #
+    
+    def setObstacleMask(self, obstacleMask, scaleTiles = 10):
+        """
+        Add obstacles to the tank and compile them into a signed distance field.
+
+        obstacleMask: a boolean array with scaleTiles nodes per tile, indexed
+            [x, y], of shape (tankWidth*scaleTiles, tankHeight*scaleTiles).
+            True marks a node that is blocked. Node (i, j) covers the square
+            starting at (i/scaleTiles, j/scaleTiles).
+        scaleTiles: the number of mask nodes per tile
+        """
+        self.obstacleMask = np.asarray(obstacleMask, dtype=bool)
+        self.obstacleScale = scaleTiles
+        self.projectionTables = {}
+        # Without Obstacles there is Nothing to Compile
+        if not self.obstacleMask.any():
+            self.obstacleMask = None
+            self.obstacleSDF = None
+            return
+        # Distance to the Closest Obstacle (Positive) or to Open Water (Negative)
+        outsideDist = ndimage.distance_transform_edt(~self.obstacleMask)
+        insideDist = ndimage.distance_transform_edt(self.obstacleMask)
+        self.obstacleSDF = ((outsideDist - insideDist)/scaleTiles).astype(self.fieldDtype)
+    
+    def getObstacleIndex(self, x, y):
+        # Find the Obstacle Grid Node Under the Position(s)
+        xIndex = np.clip(np.floor(np.asarray(x)*self.obstacleScale).astype(int), 0, self.obstacleSDF.shape[0] - 1)
+        yIndex = np.clip(np.floor(np.asarray(y)*self.obstacleScale).astype(int), 0, self.obstacleSDF.shape[1] - 1)
+        return xIndex, yIndex
+    
+    def obstacleDistance(self, x, y):
+        """
+        Return the signed distance from (x, y) to the closest obstacle. The
+        distance is negative inside an obstacle and infinite without obstacles.
+        Accepts single values or arrays.
+        """
+        if self.obstacleSDF is None:
+            return np.full(np.shape(x), np.inf) if np.ndim(x) else np.inf
+        xIndex, yIndex = self.getObstacleIndex(x, y)
+        return self.obstacleSDF[xIndex, yIndex]
+    
+    def getProjectionTable(self, tankBuffer):
+        """
+        Return, for every obstacle grid node, the index of the closest node
+        that is at least tankBuffer from the walls and every obstacle. The
+        table is built once per buffer.
+        """
+        tableKey = round(tankBuffer, 6)
+        if tableKey not in self.projectionTables:
+            # Find the Nodes the Boat is Allowed On
+            xCenters = (np.arange(self.obstacleSDF.shape[0]) + 0.5)/self.obstacleScale
+            yCenters = (np.arange(self.obstacleSDF.shape[1]) + 0.5)/self.obstacleScale
+            insideWalls = ((tankBuffer <= xCenters) & (xCenters < self.tankWidth - tankBuffer))[:,None] \
+                        & ((tankBuffer <= yCenters) & (yCenters < self.tankHeight - tankBuffer))[None,:]
+            allowedNodes = insideWalls & (self.obstacleSDF >= tankBuffer)
+            # Store the Closest Allowed Node for Each Node
+            projectionTable = ndimage.distance_transform_edt(~allowedNodes, return_distances=False, return_indices=True)
+            self.projectionTables[tableKey] = projectionTable.astype(np.int32)
+        return self.projectionTables[tableKey]
+    
+    def projectPosition(self, x, y, tankBuffer):
+        """
+        Return the closest position to (x, y) that is at least tankBuffer away
+        from every obstacle (a single table lookup).
+        """
+        if self.obstacleSDF is None or self.obstacleDistance(x, y) >= tankBuffer:
+            return x, y
+        xIndex, yIndex = self.getObstacleIndex(x, y)
+        projectionTable = self.getProjectionTable(tankBuffer)
+        return (projectionTable[0][xIndex, yIndex] + 0.5)/self.obstacleScale, (projectionTable[1][xIndex, yIndex] + 0.5)/self.obstacleScale
+    
+    def samplePath(self, startX, startY, endX, endY):
+        # Sample the Path Once per Obstacle Grid Node (Bounded by the Boat's Speed)
+        numSamples = int(math.ceil(math.hypot(endX - startX, endY - startY)*self.obstacleScale)) + 1
+        pathFraction = np.linspace(0, 1, numSamples + 1)[1:]
+        return startX + (endX - startX)*pathFraction, startY + (endY - startY)*pathFraction
+    
+    def findBlockedSample(self, startX, startY, endX, endY, tankBuffer):
+        """
+        Return the path's samples (see samplePath) and the index of the first
+        one within tankBuffer of an obstacle (None = the path is clear).
+
+        When the start is farther from every obstacle than the move is long
+        (plus a grid cell), the path is clear after one lookup and is not
+        sampled (the samples are then None).
+        """
+        moveLength = math.hypot(endX - startX, endY - startY)
+        if self.obstacleDistance(startX, startY) - moveLength - math.sqrt(2)/self.obstacleScale >= tankBuffer:
+            return None, None, None
+        xPath, yPath = self.samplePath(startX, startY, endX, endY)
+        blockedPath = np.flatnonzero(self.obstacleDistance(xPath, yPath) < tankBuffer)
+        return xPath, yPath, (blockedPath[0] if len(blockedPath) else None)
+    
+    def resolveMove(self, currentPos, candidatePos, tankBuffer, clampBuffer = None):
+        """
+        Return where a move from currentPos to candidatePos ends. Moves past
+        the walls are clamped clampBuffer inside the tank and moves into an
+        obstacle stop at the last point at least tankBuffer away from it, so
+        the boat never passes through a barrier.
+
+        The wall clamp is closed form. The obstacle check is one distance
+        field lookup when the boat is farther from every obstacle than the
+        move is long; closer in, it looks up the field once per obstacle grid
+        node along the path (O(move length*obstacleScale) lookups, done as
+        one vectorized call).
+        """
+        clampBuffer = tankBuffer if clampBuffer is None else clampBuffer
+        newX, newY = candidatePos.getX(), candidatePos.getY()
+        # If The Position is Not in the Tank, Bound the Position by the Tank
+        if not ((tankBuffer <= newX < self.tankWidth - tankBuffer) and (tankBuffer <= newY < self.tankHeight - tankBuffer)):
+            newX = max(clampBuffer, min(newX, self.tankWidth - clampBuffer))
+            newY = max(clampBuffer, min(newY, self.tankHeight - clampBuffer))
+        if self.obstacleSDF is None:
+            return Position(newX, newY)
+        
+        # If Starting Too Close to an Obstacle, Move to the Closest Free Point
+        startX, startY = self.projectPosition(currentPos.getX(), currentPos.getY(), tankBuffer)
+        # Stop Before the First Point on the Path That is Too Close to an Obstacle
+        xPath, yPath, blockedIndex = self.findBlockedSample(startX, startY, newX, newY, tankBuffer)
+        if blockedIndex is None:
+            return Position(newX, newY)
+        elif blockedIndex == 0:
+            return Position(startX, startY)
+        return Position(xPath[blockedIndex - 1], yPath[blockedIndex - 1])
+    
+    def resolveMoves(self, startX, startY, endX, endY, tankBuffer, clampBuffer = None):
+        """
+        resolveMove for arrays of moves: returns the x and y where each move
+        from (startX, startY) to (endX, endY) ends.
+
+        The clamp, the start projection and the far-from-obstacles test are
+        whole-array operations. Only the moves that fail that test are
+        sampled, all together on one padded (numMoves, numSamples) grid.
+        """
+        clampBuffer = tankBuffer if clampBuffer is None else clampBuffer
+        startX, startY, endX, endY = (np.array(value, dtype=float) for value in (startX, startY, endX, endY))
+        # If The Position is Not in the Tank, Bound the Position by the Tank
+        outsideTank = ~((tankBuffer <= endX) & (endX < self.tankWidth - tankBuffer) & (tankBuffer <= endY) & (endY < self.tankHeight - tankBuffer))
+        endX = np.where(outsideTank, np.clip(endX, clampBuffer, self.tankWidth - clampBuffer), endX)
+        endY = np.where(outsideTank, np.clip(endY, clampBuffer, self.tankHeight - clampBuffer), endY)
+        if self.obstacleSDF is None:
+            return endX, endY
+        
+        # If Starting Too Close to an Obstacle, Move to the Closest Free Point
+        tooClose = self.obstacleDistance(startX, startY) < tankBuffer
+        if tooClose.any():
+            xIndex, yIndex = self.getObstacleIndex(startX[tooClose], startY[tooClose])
+            projectionTable = self.getProjectionTable(tankBuffer)
+            startX[tooClose] = (projectionTable[0][xIndex, yIndex] + 0.5)/self.obstacleScale
+            startY[tooClose] = (projectionTable[1][xIndex, yIndex] + 0.5)/self.obstacleScale
+        # Only Sample the Moves That Could Come Within tankBuffer of an Obstacle (See findBlockedSample)
+        moveLength = np.hypot(endX - startX, endY - startY)
+        nearMoves = np.flatnonzero(self.obstacleDistance(startX, startY) - moveLength - math.sqrt(2)/self.obstacleScale < tankBuffer)
+        if len(nearMoves) == 0:
+            return endX, endY
+        # Sample Every Path at samplePath's Points, Padded to the Longest Path
+        numSamples = np.ceil(moveLength[nearMoves]*self.obstacleScale).astype(int) + 1
+        sampleNums = np.arange(1, numSamples.max() + 1)
+        pathFraction = np.where(sampleNums == numSamples[:,None], 1.0, sampleNums*(1.0/numSamples[:,None]))
+        onPath = sampleNums <= numSamples[:,None]
+        xPath = startX[nearMoves,None] + (endX - startX)[nearMoves,None]*pathFraction
+        yPath = startY[nearMoves,None] + (endY - startY)[nearMoves,None]*pathFraction
+        # Stop Before the First Point on the Path That is Too Close to an Obstacle
+        blockedPath = onPath & (self.obstacleDistance(xPath, yPath) < tankBuffer)
+        isBlocked = blockedPath.any(axis=1)
+        blockedIndex = np.argmax(blockedPath, axis=1)
+        stopX = np.where(blockedIndex == 0, startX[nearMoves], xPath[np.arange(len(nearMoves)), blockedIndex - 1])
+        stopY = np.where(blockedIndex == 0, startY[nearMoves], yPath[np.arange(len(nearMoves)), blockedIndex - 1])
+        endX[nearMoves] = np.where(isBlocked, stopX, endX[nearMoves])
+        endY[nearMoves] = np.where(isBlocked, stopY, endY[nearMoves])
+        return endX, endY
+    
 
     def reinitialize(self):
         self.initializeBoard()
-        self.tiles[self.sourceLocations[0]] == True
+    
+    def getState(self):
+        """
+        Return a copy of everything a run changes in the tank (the visited tiles).
+        """
+        return {'tiles': self.tiles.copy()}
+    
+    def setState(self, tankState):
+        """
+        Put the tank back to a state from getState.
+        """
+        np.copyto(self.tiles, tankState['tiles'])
 
 
 class cosmolSimTank(rectangularTank):
         
-    def __init__(self, sourceLocations, tankWidth, tankHeight, simFile):
-        super().__init__(tankWidth, tankHeight)  # Get Variables Inherited from the helper_Files Class
+    def __init__(self, sourceLocations, tankWidth, tankHeight, simFile, fieldDtype = np.float64, plotData = True):
+        super().__init__(tankWidth, tankHeight, fieldDtype)  # Get Variables Inherited from the helper_Files Class
         
-        self.mapedTiles = {}        
-        self.getSimData(simFile, tankWidth, tankHeight)
+        self.simFile = simFile
+        # Read the Sensors from the Rasterized Field at This Scale (None = Interpolate the Samples)
+        self.readRaster = None
+        # Rasterized Fields and Their Gradients, by Scale (See rasterizeField)
+        self.fieldRasters = {}
+        self.getSimData(simFile, tankWidth, tankHeight, len(sourceLocations) if sourceLocations else None)
         
-        # Initialize the Board
-        self.plotSimData()
+        # Show the Data (Not When Built Off the Main Thread, e.g. by a Service)
+        if plotData:
+            self.plotSimData()
     
     def dataRound(self, array, toDigit = 20):
         return np.round(array, toDigit)
         
-    def getSimData(self, simFile, tankWidth, tankHeight):
+    def getSimData(self, simFile, tankWidth, tankHeight, numSources = None):
         # Extract the Data from the Excel File
         self.simX, self.simY, self.simZ = extractSimulatedData.processData().getData(simFile)
         # Shift to Start at Zero,Zero
@@ -216,25 +646,43 @@ class cosmolSimTank(rectangularTank):
         # Round X,Y so its Discrete and Comparable
         self.simX = self.dataRound(self.simX)
         self.simY = self.dataRound(self.simY)
-        # Find the Single Source Input
-        maxIndex = np.argmax(self.simZ)
-        self.sourceLocations = [(np.round(self.simX[maxIndex]), np.round(self.simY[maxIndex]))]
+        # Samples Without a Reading are Barriers: Compile Them into Obstacles
+        barrierPoints = np.isnan(self.simZ)
+        if barrierPoints.any():
+            self.findObstacles(barrierPoints)
+            self.simX = self.simX[~barrierPoints]
+            self.simY = self.simY[~barrierPoints]
+            self.simZ = self.simZ[~barrierPoints]
+        # Interpolate the Space (SciPy Keeps its Own Float64 Copy of the Samples)
+        self.interp = LinearNDInterpolator(np.column_stack((self.simX, self.simY)), self.simZ)
         
-        maxIndex2 = np.argmax(self.simZ[20 < self.simX])
-        self.sourceLocations.append((np.round(self.simX[20 < self.simX][maxIndex2]), np.round(self.simY[20 < self.simX][maxIndex2])))
+        # Find the Sources (At Most One per Given Source Location)
+        self.sourceLocations = self.findSources(numSources)
         print(self.sourceLocations)
-        
-        # Interpolate the Space
-        self.interp = LinearNDInterpolator(list(zip(self.simX, self.simY)), self.simZ)
-                
-        # Store Data in Mapped Tiles Data Structure
-        positions = list(zip(self.simX, self.simY))
-        self.mapedTiles = dict(zip(positions, self.simZ))
+        # Keep the Samples Only as Contiguous Arrays of the Tank's Precision
+        self.simX = np.ascontiguousarray(self.simX, dtype=self.fieldDtype)
+        self.simY = np.ascontiguousarray(self.simY, dtype=self.fieldDtype)
+        self.simZ = np.ascontiguousarray(self.simZ, dtype=self.fieldDtype)
         
         # Reinitialize Tiles
         self.initializeBoard()
-        #self.tiles = dict(zip(positions, len(self.simZ)*[False]))
-        self.tiles[self.sourceLocations[0]] == True
+    
+    def findObstacles(self, barrierPoints, scaleTiles = 10, samplePoints = None):
+        """
+        Build the obstacle mask from the simulation samples: a mask node is
+        blocked when the closest sample to it has no reading.
+
+        samplePoints: the (x, y) of each sample (default: the simulation's)
+        """
+        if samplePoints is None:
+            samplePoints = np.column_stack((self.simX, self.simY))
+        # Find the Closest Sample to Each Mask Node
+        xCenters = (np.arange(self.tankWidth*scaleTiles) + 0.5)/scaleTiles
+        yCenters = (np.arange(self.tankHeight*scaleTiles) + 0.5)/scaleTiles
+        xx, yy = np.meshgrid(xCenters, yCenters, indexing='ij')
+        _, closestSample = cKDTree(samplePoints).query(np.column_stack((xx.ravel(), yy.ravel())))
+        # Compile the Blocked Nodes into the Tank's Distance Field
+        self.setObstacleMask(barrierPoints[closestSample].reshape(xx.shape), scaleTiles)
     
     def plotSimData(self):  
         # Plot Model
@@ -244,8 +692,64 @@ class cosmolSimTank(rectangularTank):
         plt.show()
     
     def posReading(self, currentPos, sensorType = ""):
+        if self.readRaster is not None:
+            return max(0, float(bilinearInterpolate(self.rasterizeField(self.readRaster), self.readRaster, currentPos[0], currentPos[1])))
         return max(0, self.interp(currentPos))
         #return max(0,interpolate.griddata((self.simX, self.simY), self.simZ, currentPos, method='linear'))
+    
+    def fieldReadings(self, x, y):
+        if self.readRaster is not None:
+            return bilinearInterpolate(self.rasterizeField(self.readRaster), self.readRaster, x, y)
+        # Match posReading: No Negative Readings and Zero Outside the Data
+        return np.maximum(0, np.nan_to_num(self.interp(x, y), nan=0.0))
+    
+    def rasterizeField(self, scaleTiles = 10):
+        """
+        Sample the field on a regular grid (scaleTiles nodes per tile) and
+        precompute its gradient there. The grids are cached per scale, so this
+        only does work the first time it is called for a given scale.
+        """
+        return self.fieldRaster(scaleTiles)[0]
+    
+    def fieldRaster(self, scaleTiles = 10):
+        """
+        Return the cached (fieldGrid, gradX, gradY) at this scale, rasterizing
+        the field first if needed.
+        """
+        if scaleTiles not in self.fieldRasters:
+            xGrid = np.arange(self.tankWidth*scaleTiles + 1)/scaleTiles
+            yGrid = np.arange(self.tankHeight*scaleTiles + 1)/scaleTiles
+            xx, yy = np.meshgrid(xGrid, yGrid, indexing='ij')
+            # Match posReading: No Negative Readings and Zero Outside the Data
+            fieldGrid = np.maximum(0, np.nan_to_num(self.interp(xx, yy), nan=0.0))
+            gradX, gradY = [gradGrid.astype(self.fieldDtype) for gradGrid in np.gradient(fieldGrid, 1/scaleTiles)]
+            self.fieldRasters[scaleTiles] = (fieldGrid.astype(self.fieldDtype), gradX, gradY)
+        return self.fieldRasters[scaleTiles]
+    
+    def findSources(self, maxSources = None, minProminence = 0.05, minSeparation = 3, scaleTiles = 10):
+        """
+        Locate the sources as the peaks of the rasterized field (see
+        findFieldPeaks), rounded to the closest tile.
+
+        maxSources: keep only the highest maxSources peaks (None = all of them)
+        returns: a list of (x, y) source locations, highest peak first
+        """
+        peakPositions = findFieldPeaks(self.rasterizeField(scaleTiles), scaleTiles, minProminence, minSeparation, maxSources)
+        return [(np.round(peakX), np.round(peakY)) for peakX, peakY in peakPositions]
+    
+    def gradientAt(self, points, scaleTiles = 10):
+        """
+        Return the field's gradient at each (x, y) row of points, read from the
+        cached gradient grid.
+
+        points: an array of shape (numPoints, 2) (or a single (x, y))
+        returns: an array of shape (numPoints, 2) (or (2,) for a single point)
+        """
+        _, gradX, gradY = self.fieldRaster(scaleTiles)
+        points = np.asarray(points, dtype=float)
+        gradient = np.stack((bilinearInterpolate(gradX, scaleTiles, points[...,0], points[...,1]),
+                             bilinearInterpolate(gradY, scaleTiles, points[...,0], points[...,1])), axis=-1)
+        return gradient
 
     def euclideanDist(self, P1, P2):
         return np.linalg.norm((P1[0]-P2[0], P1[1]-P2[1]))
@@ -258,7 +762,7 @@ class cosmolSimTank(rectangularTank):
                 i -= maxDev
                 for j in range(maxDev*2+1):
                     j -= maxDev
-                    if self.tiles[(max(0,min(locX+i, self.tankWidth-1)), max(0,min(locY+j,self.tankHeight-1)))] == True:
+                    if self.tiles[int(max(0,min(locX+i, self.tankWidth-1))), int(max(0,min(locY+j,self.tankHeight-1)))] == True:
                         return True
         return False
     
@@ -272,24 +776,108 @@ class cosmolSimTank(rectangularTank):
         return xData, yData, zData
     
 
+class volumeTank(cosmolSimTank):
+    """
+    A tank over a 3D simulation export (x, y, z, value rows). The volume is
+    stored once as a memory-mapped grid (gridFile, default: next to simFile)
+    and read with trilinear lookups, so it is never loaded into RAM.
+
+    The sensors read at sensorDepths (z, in the export's units from its
+    lowest plane). With several depths, a reading is the maximum ('max') or
+    the mean ('mean') across them. Everything else (rasterized field,
+    sources, gradient) works as in cosmolSimTank on those readings.
+    """
+    
+    def __init__(self, sourceLocations, tankWidth, tankHeight, simFile, sensorDepths = None, depthMode = 'max', gridFile = None, fieldDtype = np.float64, plotData = True):
+        self.gridFile = gridFile or os.path.splitext(simFile)[0] + "_volume.npy"
+        self.sensorDepths = sensorDepths
+        self.depthMode = depthMode
+        super().__init__(sourceLocations, tankWidth, tankHeight, simFile, fieldDtype, plotData)
+    
+    def getSimData(self, simFile, tankWidth, tankHeight, numSources = None):
+        # Build the Grid File Once (Again if the Export Changes)
+        if not os.path.isfile(self.gridFile) or os.path.getmtime(self.gridFile) < os.path.getmtime(simFile):
+            simX, simY, simZ, simValues = extractSimulatedData.processData().getVolumeData(simFile)
+            volumeGrid.writeVolumeGrid(simX, simY, simZ, np.abs(simValues), self.gridFile)
+        self.volume = volumeGrid.volumeGrid(self.gridFile)
+        # Reduce X,Y to Gameboard Positions; Measure Depth from the Lowest Plane
+        self.volume.xAxis = (self.volume.xAxis - self.volume.xAxis[0])*(tankWidth-1)/max(np.ptp(self.volume.xAxis), 1E-12)
+        self.volume.yAxis = (self.volume.yAxis - self.volume.yAxis[0])*(tankHeight-1)/max(np.ptp(self.volume.yAxis), 1E-12)
+        self.volume.zAxis = self.volume.zAxis - self.volume.zAxis[0]
+        # Read at Mid-Depth Unless Told Otherwise (Finding the Sources There)
+        self.numSources = numSources
+        self.setSensorDepths(self.sensorDepths if self.sensorDepths is not None else np.ptp(self.volume.zAxis)/2, self.depthMode)
+        print(self.sourceLocations)
+        # Reinitialize Tiles
+        self.initializeBoard()
+    
+    def setSensorDepths(self, sensorDepths, depthMode = 'max'):
+        """
+        Read the sensors at one depth (a depth slice) or across several. The
+        sources are found again in the field read at the new depths, and the
+        obstacles are the grid nodes without data at any of those depths.
+        """
+        self.sensorDepths = tuple(float(depth) for depth in np.atleast_1d(sensorDepths))
+        self.depthMode = depthMode
+        # The Rasterized Fields and Cached Readings Were Read at the Old Depths
+        self.fieldRasters.clear()
+        if self.readingCache is not None:
+            self.readingCache.clear()
+        # Nodes Without a Reading at the Sensor Depths are Barriers: Compile Them into Obstacles
+        barrierNodes = np.any([np.isnan(self.depthSlice(depth)) for depth in self.sensorDepths], axis=0)
+        if barrierNodes.any():
+            xx, yy = np.meshgrid(self.volume.xAxis, self.volume.yAxis, indexing='ij')
+            self.findObstacles(barrierNodes.ravel(), samplePoints = np.column_stack((xx.ravel(), yy.ravel())))
+        elif self.obstacleMask is not None:
+            self.setObstacleMask(np.zeros_like(self.obstacleMask), self.obstacleScale)
+        # Find the Sources (At Most One per Given Source Location)
+        self.sourceLocations = self.findSources(self.numSources)
+    
+    def interp(self, x, y = None):
+        # Read (x, y) Positions (or a Single (x, y) Point) at the Sensor Depths
+        if y is None:
+            x, y = np.asarray(x, dtype=float)[...,0], np.asarray(x, dtype=float)[...,1]
+        depthReadings = [self.volume.trilinear(x, y, depth) for depth in self.sensorDepths]
+        if len(depthReadings) == 1:
+            return depthReadings[0]
+        return np.max(depthReadings, axis=0) if self.depthMode == 'max' else np.mean(depthReadings, axis=0)
+    
+    def posReadings(self, positions, sensorTypes):
+        # Read All of a Boat's Sensors in One Lookup
+        positions = np.asarray(positions, dtype=float)
+        return list(self.fieldReadings(positions[:,0], positions[:,1]))
+    
+    def depthSlice(self, depth = None):
+        """
+        Return the field at a depth (default: the first sensor depth) on the
+        export's own x, y grid, indexed [x, y].
+        """
+        return self.volume.depthSlice(self.sensorDepths[0] if depth is None else depth)
+    
+    def plotSimData(self):
+        # Plot the Depth Slice the Sensors Read
+        fig = plt.figure()
+        ax = fig.add_subplot(111)
+        fieldPlot = ax.imshow(self.depthSlice().T, origin='lower', cmap='jet', extent=(self.volume.xAxis[0], self.volume.xAxis[-1], self.volume.yAxis[0], self.volume.yAxis[-1]))
+        fig.colorbar(fieldPlot)
+        ax.set_title("Depth " + str(round(self.sensorDepths[0], 4)))
+        plt.show()
+
 
 class diffusionModelTank(rectangularTank):
     
-    def __init__(self, sourceLocations, tankWidth, tankHeight):
-        super().__init__(tankWidth, tankHeight)  # Get Variables Inherited from the helper_Files Class
+    def __init__(self, sourceLocations, tankWidth, tankHeight, fieldDtype = np.float64):
+        super().__init__(tankWidth, tankHeight, fieldDtype)  # Get Variables Inherited from the helper_Files Class
         
-        self.mapedTiles = {}
+        self.modelGrid = None
         self.sourceLocations = sourceLocations
         self.scaleTiles = 10
         
         #self.diffuseSources()
     
     def initializeMap(self):
-        for x in range(self.tankWidth*self.scaleTiles):
-            x = x/self.scaleTiles
-            for y in range(self.tankHeight*self.scaleTiles):
-                y = y/self.scaleTiles
-                self.mapedTiles[(x, y)] = 0
+        # Node (i, j) of the Model Grid is at (i/scaleTiles, j/scaleTiles)
+        self.modelGrid = np.zeros((self.tankWidth*self.scaleTiles, self.tankHeight*self.scaleTiles), dtype=self.fieldDtype)
     
     def diffuseModel(self, delX, delY):
         return math.exp(-(delY**2 + delX**2)/2)
@@ -297,20 +885,20 @@ class diffusionModelTank(rectangularTank):
     def diffuseSources(self):
         self.initializeMap()
         
+        xGrid = np.arange(self.modelGrid.shape[0])/self.scaleTiles
+        yGrid = np.arange(self.modelGrid.shape[1])/self.scaleTiles
         for sourceLocation in self.sourceLocations:
             xSource = sourceLocation[0]
             ySource = sourceLocation[1]
-            for x in range(self.tankWidth):
-                delX = x - xSource
-                for y in range(self.tankHeight):
-                    delY = y - ySource
-                    
-                    self.mapedTiles[(x, y)] += self.diffuseModel(delX, delY)
+            delX = (xGrid - xSource)[:,None]
+            delY = (yGrid - ySource)[None,:]
+            
+            self.modelGrid += np.exp(-(delY**2 + delX**2)/2).astype(self.fieldDtype)
     
     def plotDiffuseModel(self):
-        # Unpack Tuples
-        xy, z = zip(*self.mapedTiles)
-        x,y = zip(*xy)
+        # Unpack the Grid
+        xx, yy = np.meshgrid(np.arange(self.modelGrid.shape[0])/self.scaleTiles, np.arange(self.modelGrid.shape[1])/self.scaleTiles, indexing='ij')
+        x, y, z = xx.ravel(), yy.ravel(), self.modelGrid.ravel()
         
         # Plot Model
         fig = plt.figure()
@@ -331,6 +919,29 @@ class diffusionModelTank(rectangularTank):
         
         return sensorReading
     
+    def fieldReadings(self, x, y):
+        # Add Each Source's Contribution at Every Position
+        sensorReadings = np.zeros(np.shape(x))
+        for sourceLocation in self.sourceLocations:
+            sensorReadings += np.exp(-((np.asarray(x) - sourceLocation[0])**2 + (np.asarray(y) - sourceLocation[1])**2)/2)
+        return sensorReadings
+    
+    def gradientAt(self, points):
+        """
+        Return the exact gradient of the Gaussian model at each (x, y) row of
+        points.
+
+        points: an array of shape (numPoints, 2) (or a single (x, y))
+        returns: an array of shape (numPoints, 2) (or (2,) for a single point)
+        """
+        points = np.asarray(points, dtype=float)
+        gradient = np.zeros(points.shape)
+        # d/dx exp(-(delX^2 + delY^2)/2) = -delX*exp(-(delX^2 + delY^2)/2)
+        for sourceLocation in self.sourceLocations:
+            delPos = points - np.asarray(sourceLocation, dtype=float)
+            gradient -= delPos*np.exp(-np.sum(delPos**2, axis=-1)/2)[...,None]
+        return gradient
+    
     def sourceFound(self, maxDev = 0):
         for sourceLocation in self.sourceLocations:
             locX = sourceLocation[0]
@@ -339,7 +950,7 @@ class diffusionModelTank(rectangularTank):
                 i -= maxDev
                 for j in range(maxDev*2+1):
                     j -= maxDev
-                    if self.tiles[(locX+i, locY+j)] == True:
+                    if self.tiles[int(locX+i), int(locY+j)] == True:
                         return True
         return False
     
@@ -357,7 +968,6 @@ class userInputModel(rectangularTank):
     def __init__(self, sourceLocations, tankWidth, tankHeight):
         super().__init__(tankWidth, tankHeight)  # Get Variables Inherited from the helper_Files Class
         
-        self.mapedTiles = {}
         self.sourceLocations = sourceLocations
     
     def posReading(self, currentPos, sensorType = "Sensor"):
@@ -366,6 +976,142 @@ class userInputModel(rectangularTank):
     def sourceFound(self):
         return bool(int(input("End the Simulation (Yes = 1; No = 0): ")))
 
+class replayTank(rectangularTank):
+    """
+    A tank that answers readings from a recorded session log. Positions that
+    were recorded return the recorded reading; any other position is linearly
+    interpolated from the recording (nearest reading outside the recorded
+    area), so a replay is deterministic and runs at full speed.
+    """
+    
+    def __init__(self, logFile, sourceLocations = None):
+        header, self.records = sessionLog.readSessionLog(logFile)
+        super().__init__(header['tankWidth'], header['tankHeight'])  # Get Variables Inherited from the helper_Files Class
+        
+        self.sourceLocations = [tuple(sourceLocation) for sourceLocation in (sourceLocations or header.get('sourceLocations', []))]
+        # Find the Unique Recorded Positions (Later Readings Win)
+        positions = np.column_stack((self.dataRound(self.records['x']), self.dataRound(self.records['y'])))
+        positions, lastIndex = np.unique(positions[::-1], axis=0, return_index=True)
+        self.recordedReadings = np.ascontiguousarray(self.records['reading'][::-1][lastIndex])
+        # Interpolate Between the Recorded Positions
+        self.nearestInterp = NearestNDInterpolator(positions, self.recordedReadings)
+        self.interp = LinearNDInterpolator(positions, self.recordedReadings) if len(positions) >= 3 else None
+    
+    def dataRound(self, array, toDigit = 9):
+        return np.round(array, toDigit)
+    
+    def posReading(self, currentPos, sensorType = ""):
+        # Return the Recorded Reading if We Have One
+        recordedPos = (self.dataRound(float(currentPos[0])), self.dataRound(float(currentPos[1])))
+        closestDist, closestIndex = self.nearestInterp.tree.query(recordedPos)
+        if closestDist == 0:
+            return float(self.recordedReadings[closestIndex])
+        # Otherwise Interpolate the Recording
+        reading = np.nan
+        if self.interp is not None:
+            try:
+                reading = float(self.interp(currentPos[0], currentPos[1]))
+            except Exception:
+                reading = np.nan
+        if np.isnan(reading):
+            reading = float(self.nearestInterp(currentPos[0], currentPos[1]))
+        return reading
+    
+    def sourceFound(self, maxDev = 1):
+        for locX, locY in self.sourceLocations:
+            for i in range(-maxDev, maxDev+1):
+                for j in range(-maxDev, maxDev+1):
+                    if self.tiles[int(max(0, min(locX+i, self.tankWidth-1))), int(max(0, min(locY+j, self.tankHeight-1)))]:
+                        return True
+        return False
+
+
+class hardwareTank(rectangularTank):
+    """
+    A tank whose readings come from an asyncSensorSource (real sensors or a
+    sensorServer stand-in). The three sensors of a boat are read at the same
+    time, and readBoats() reads several boats at once.
+    """
+    
+    def __init__(self, sourceLocations, tankWidth, tankHeight, sensorSource):
+        super().__init__(tankWidth, tankHeight)  # Get Variables Inherited from the helper_Files Class
+        
+        self.sourceLocations = sourceLocations
+        self.sensorSource = sensorSource
+        # Run the Source on its Own Event Loop so the Boats Can Stay Synchronous
+        self.loop = asyncio.new_event_loop()
+        self.loopThread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loopThread.start()
+        self.runAsync(self.sensorSource.connect())
+    
+    def runAsync(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+    
+    def posReading(self, currentPos, sensorType = "Sensor"):
+        return self.runAsync(self.sensorSource.readWithRetry(currentPos, sensorType))
+    
+    def posReadings(self, positions, sensorTypes):
+        return self.runAsync(self.sensorSource.readSensors(positions, sensorTypes))
+    
+    def readBoats(self, boats):
+        """
+        Read the three sensors of every boat at the same time.
+
+        returns: a list (one per boat) of [front, left, right] readings
+        """
+        boatsPositions = [boat.getSensorsPos(boat.getBoatPosition()) for boat in boats]
+        return self.runAsync(self.sensorSource.readBoats(boatsPositions))
+    
+    def sourceFound(self, maxDev = 1):
+        # Ask the Source First (e.g. an Operator Switch)
+        sourceFound = self.runAsync(self.sensorSource.sourceFoundWithRetry())
+        if sourceFound is not None:
+            return bool(sourceFound)
+        # Otherwise Check the Tiles Around the Known Sources (Without Any, the Run Goes to maxSteps)
+        for locX, locY in self.sourceLocations or []:
+            for i in range(-maxDev, maxDev+1):
+                for j in range(-maxDev, maxDev+1):
+                    if self.tiles[int(max(0, min(locX+i, self.tankWidth-1))), int(max(0, min(locY+j, self.tankHeight-1)))]:
+                        return True
+        return False
+    
+    def close(self):
+        self.runAsync(self.sensorSource.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loopThread.join()
+        self.loop.close()
+
+class strategyParameters(object):
+    """
+    The tunable constants of a search strategy. Each strategy class holds its
+    defaults in its 'parameters' attribute; Boat.withParameters() makes a
+    copy of a strategy that uses different values. A strategy with constants
+    of its own subclasses this, setting them before calling __init__.
+    """
+    def __init__(self, **parameterValues):
+        self.sensorAngle = 120          # Angle of the Side Sensors from the Front Sensor (Degrees)
+        self.numHold = 5                # Number of Past Readings the Heuristic Interpolates
+        self.heuristicScale = 1         # Multiplies the Heuristic's Search Radius
+        self.nearSourceRatio = 0.75     # Heuristic Steps Shorter Than This Fraction of the Radius Mean the Source is Near
+        self.blendAngle = 75            # Add the Heuristic to the Gradient When They are Within This Angle (Degrees)
+        self.turnSlowAngle = None       # Turns Sharper Than This Slow the Boat Down (Degrees; None = Never)
+        self.turnSpeedFactor = 1        # Speed Multiplier for Sharp Turns
+        self.update(**parameterValues)
+    
+    def update(self, **parameterValues):
+        for parameterName, parameterValue in parameterValues.items():
+            if not hasattr(self, parameterName):
+                raise ValueError("Unknown Strategy Parameter: " + parameterName)
+            setattr(self, parameterName, parameterValue)
+        return self
+    
+    def copy(self, **parameterValues):
+        return type(self)(**vars(self)).update(**parameterValues)
+    
+    def __repr__(self):
+        return type(self).__name__ + "(" + ", ".join(parameterName + "=" + repr(parameterValue) for parameterName, parameterValue in sorted(vars(self).items())) + ")"
+
+
 class Boat(object):
     """
     Represents a boat finding the source
@@ -376,6 +1122,11 @@ class Boat(object):
     Subclasses of boat should provide movement strategies by implementing
     updatePosition(), which simulates a single time-step.
     """
+    # True if the Next Move Only Depends on the Position, Heading and Speed
+    isMemoryless = False
+    # The Strategy's Tunable Constants
+    parameters = strategyParameters()
+    
     def __init__(self, tank, boatSpeed, boatLocation = Position(0,0), boatDirection = np.array([0,1]), sensorDistance = 1.6):
         """
         Initializes a boat with the given speed in the specified tank. The
@@ -389,8 +1140,9 @@ class Boat(object):
         self.boatSpeed = boatSpeed
         self.maxSpeed = boatSpeed
         self.position = Position(boatLocation[0], boatLocation[1])
-        self.boatDirection = boatDirection
+        self.boatDirection = np.asarray(boatDirection, dtype=float)
         self.boatAngle = self.getAngle(self.boatDirection)
+        self.startAngle = self.boatAngle
         self.sourceNear = False
         
         # Initialize Place in Tank
@@ -398,12 +1150,59 @@ class Boat(object):
         self.tank.markAsVisited(self.position)
         
         # Initialize Sensor Parameters
-        self.sensorAngle = 120;
         self.sensorDistance = sensorDistance; # deciMeters
         
-        # Keep Track of Past Movements
-        self.pastValues = {}
+        # Keep Track of the Recent Readings
+        self.telemetry = telemetryBuffer.telemetryBuffer(self.parameters.numHold)
+        
+        # Set What Follows From the Strategy's Parameters
+        self.applyParameters()
         
+    def applyParameters(self):
+        """
+        Set the attributes that follow from the strategy's parameters. Also
+        done by fromState, so a state from a strategy with other parameters
+        continues with this strategy's values.
+        """
+        self.sensorAngle = self.parameters.sensorAngle
+        self.telemetry.resize(self.parameters.numHold)
+        
+    # Attributes Shared Between Copies of a Boat Instead of Copied
+    sharedAttributes = ('tank', 'ax', 'decisionTrace')
+    
+    def getState(self):
+        """
+        Return a copy of the boat's state: kinematics, recent readings and
+        any belief map. The tank is not copied.
+        """
+        return copy.deepcopy({name: value for name, value in self.__dict__.items() if name not in self.sharedAttributes})
+    
+    @classmethod
+    def fromState(cls, tank, boatState):
+        """
+        Make a boat of this type in tank from a state of getState. The state
+        can come from another strategy (e.g. another withParameters version):
+        the new strategy's methods are used from then on, and what follows
+        from its parameters is set again (see applyParameters). Attributes
+        the state does not have fall back to the class defaults (e.g. AStar's
+        beliefMap) or are built by applyParameters.
+        """
+        boat = cls.__new__(cls)
+        boat.__dict__.update(copy.deepcopy(boatState))
+        boat.tank = tank
+        boat.ax = None
+        boat.applyParameters()
+        return boat
+    
+    @classmethod
+    def withParameters(cls, **parameterValues):
+        """
+        Return a copy of this strategy (a subclass of the same name) whose
+        parameters are changed to parameterValues.
+        """
+        parameters = cls.parameters.copy(**parameterValues)
+        return type(cls.__name__, (cls,), {'parameters': parameters, 'strategyVersion': repr(parameters), '__module__': cls.__module__})
+    
     def getBoatPosition(self):
         """
         Return the position of the boat.
@@ -445,19 +1244,6 @@ class Boat(object):
         """
         self.boatDirection = np.array(directionVec)/np.linalg.norm(directionVec)
     
-    def updatePastRecord(self, currentPosObj, currentVal):
-        # Get the Current Position (Rounded to Current Square)
-        x = math.floor(currentPosObj.getX())
-        y = math.floor(currentPosObj.getY())
-        currentPos = (x,y)
-        # Get Previous Past Values at the Position
-        pastVals = self.pastValues.get(currentPos, [])
-        # Add the New Position's Value
-        pastVals.append(currentVal)
-        # Store the New Value in the Dictionary if No Position was There
-        if len(pastVals) == 1:
-            self.pastValues[currentPos] = pastVals
-    
     def getSensorsPos(self, currentPosObj):
         # Get the Current Position
         x = currentPosObj.getX()
@@ -499,9 +1285,8 @@ class Boat(object):
         # Find the Location of Each of the Three Sensors
         frontSensorPos, leftSensorPos, rightSensorPos = self.getSensorsPos(self.position)
         # Find the Interpolated Values at the Sensor's Position
-        frontSensorVal = self.tank.posReading(frontSensorPos, sensorType = "Front Sensor")
-        leftSensorPosVal = self.tank.posReading(leftSensorPos, sensorType = "Left Sensor")
-        rightSensorPosVal = self.tank.posReading(rightSensorPos, sensorType = "Right Sensor")
+        frontSensorVal, leftSensorPosVal, rightSensorPosVal = self.tank.readSensors([frontSensorPos, leftSensorPos, rightSensorPos],
+                                                                                    ["Front Sensor", "Left Sensor", "Right Sensor"])
         # Define Each Sensor in 3D Space
         frontPoint = np.array([frontSensorPos[0], frontSensorPos[1], frontSensorVal])
         leftPoint = np.array([leftSensorPos[0], leftSensorPos[1], leftSensorPosVal])
@@ -509,29 +1294,47 @@ class Boat(object):
         # Return Points
         return frontPoint, leftPoint, rightPoint
 
+    def fieldIsFlat(self, flatTolerance = 1E-6, numReadings = 2):
+        """
+        Return True if the field around the boat is flat: the last numReadings
+        readings all differ by at most flatTolerance or, for strategies that
+        keep no readings, the tank's gradient (if it has one) changes the
+        field by at most flatTolerance over the sensor distance.
+        """
+        if self.telemetry.numHeld() >= numReadings:
+            recentValues = self.telemetry.points(numReadings)[:,2]
+            return bool(recentValues.max() - recentValues.min() <= flatTolerance)
+        if self.telemetry.numHeld() == 0 and hasattr(self.tank, 'gradientAt'):
+            fieldGradient = self.tank.gradientAt((self.position.getX(), self.position.getY()))
+            return bool(np.linalg.norm(fieldGradient)*self.sensorDistance <= flatTolerance)
+        return False
+    
+    def coastStraight(self):
+        """
+        Move one time-step along the current heading without sensing.
+        """
+        self.updateBoat(self.boatDirection)
+    
     def updateBoat(self, newDirection, printMovement = False):
         # Find the Angle
         newAngle = self.getAngle(newDirection)
         
-        # Check to See if the Position is in the Tank
-        candidatePosition = self.position.getNewPosition(newAngle, self.boatSpeed)
-        while not self.tank.isPositionIntank(candidatePosition, self.sensorDistance/2):
-            # If The Position is Not in the Tank, Bound the Position by the Tank
-            boundaryVals = [self.tank.tankWidth, self.tank.tankHeight]
-            potentialVals = [candidatePosition.getX(), candidatePosition.getY()]
-            potentialPos = []
-            for axisPos in range(len(newDirection)):
-                potentialPos.append(max(self.sensorDistance, min(potentialVals[axisPos], boundaryVals[axisPos]-self.sensorDistance)))
-            # If We are NOT Moving
-            if self.position.getX() == potentialPos[0] and self.position.getY() == potentialPos[1]:
-                newAngle = random.randrange(360)
-                candidatePosition = self.position.getNewPosition(newAngle, self.boatSpeed)
-            else:
-                # Retrieve the New Position Object
-                candidatePosition = Position(potentialPos[0], potentialPos[1])
-                # Retrive New Direction and Angle
-                newDirection = [candidatePosition.getX() - self.position.getX(), candidatePosition.getY() - self.position.getY()]
+        # Check to See if the Position is in the Tank (Bounded by the Walls and Obstacles)
+        targetPosition = self.position.getNewPosition(newAngle, self.boatSpeed)
+        candidatePosition = self.tank.resolveMove(self.position, targetPosition, self.sensorDistance/2, self.sensorDistance)
+        # If We are NOT Moving, Turn Around
+        if self.position.getX() == candidatePosition.getX() and self.position.getY() == candidatePosition.getY():
+            newAngle = (newAngle + 180) % 360
+            newDirection = self.getDirection(newAngle)
+            targetPosition = self.position.getNewPosition(newAngle, self.boatSpeed)
+            candidatePosition = self.tank.resolveMove(self.position, targetPosition, self.sensorDistance/2, self.sensorDistance)
+        # Retrive New Direction and Angle if the Move was Bounded
+        if candidatePosition.getX() != targetPosition.getX() or candidatePosition.getY() != targetPosition.getY():
+            newDirection = [candidatePosition.getX() - self.position.getX(), candidatePosition.getY() - self.position.getY()]
+            if np.linalg.norm(newDirection) != 0:
                 newAngle = self.getAngle(newDirection)
+            else:
+                newDirection = self.getDirection(newAngle)
         
         # Print Movement Results to the User
         if printMovement:
@@ -556,10 +1359,10 @@ class Boat(object):
                 self.plotResult(newDirection, self.position, candidatePosition, xCenter, yCenter, turnRadius)
                 print("")
         
-        # Move to the Position
+        # Move to the Position (Marking Every Tile Crossed)
         self.setBoatAngle(newAngle)
+        self.tank.markPath(self.position, candidatePosition)
         self.setBoatPosition(candidatePosition)
-        self.tank.markAsVisited(self.position)
         self.setBoatDirectionVector(newDirection)
     
     def findRadius(self, distance, delX):
@@ -606,9 +1409,9 @@ class standardBoat(Boat):
         been Visited.
         """
         candidatePosition = self.position.getNewPosition(self.boatAngle, self.boatSpeed)
-        if self.tank.isPositionIntank(candidatePosition, self.sensorDistance/2):
+        if self.tank.isPathIntank(self.position, candidatePosition, self.sensorDistance/2):
+            self.tank.markPath(self.position, candidatePosition)
             self.setBoatPosition(candidatePosition)
-            self.tank.markAsVisited(self.position)
         else:
             self.boatAngle = random.randrange(360)
             self.boatDirection = self.getDirection(self.boatAngle)
@@ -620,6 +1423,8 @@ class randomDirection(Boat):
 
     At each time-step, a randomDirection picks a direction and angle and moves there
     """
+    # Headings Tried Before Taking the Last One as Far as it Goes (see tank.resolveMove)
+    maxHeadings = 36
     
     def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
         super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
@@ -637,14 +1442,20 @@ class randomDirection(Boat):
         newAngle = random.randrange(360)
         # Get New Position that is Inside the Tank
         new_pos = currentPosition.getNewPosition(newAngle, self.boatSpeed)
-        while not self.tank.isPositionIntank(new_pos, self.sensorDistance/2):
+        for _ in range(self.maxHeadings - 1):
+            if self.tank.isPathIntank(currentPosition, new_pos, self.sensorDistance/2):
+                break
             # If Not in Tank, Randonly Select New Angle Again
             newAngle = random.randrange(360)
             new_pos = currentPosition.getNewPosition(newAngle, self.boatSpeed)
+        else:
+            # Every Heading is Blocked (e.g. Starting Against a Barrier): Go as Far as the Walls and Obstacles Allow
+            if not self.tank.isPathIntank(currentPosition, new_pos, self.sensorDistance/2):
+                new_pos = self.tank.resolveMove(currentPosition, new_pos, self.sensorDistance/2, self.sensorDistance)
             
         # Update the Boat Parameters
+        self.tank.markPath(currentPosition, new_pos)
         self.setBoatPosition(new_pos)
-        self.tank.markAsVisited(new_pos)
         self.setBoatAngle(newAngle)
         self.boatDirection = self.getDirection(self.boatAngle)
 
@@ -652,75 +1463,99 @@ class AStar(Boat):
     """
     Move to the Highest Gradient
     """
+    # Slow to a Quarter Speed on Turns Sharper Than 60 Degrees
+    parameters = strategyParameters(turnSlowAngle = 60, turnSpeedFactor = 1/4)
+    # Where Sampled Decisions are Recorded (None = Not Traced; see traceDecisions)
+    decisionTrace = None
+    # Optional Map of Every Reading (None = Only Use the Recent Values; see useBeliefMap)
+    beliefMap = None
+    # True if the Strategy Always Keeps a Belief Map
+    keepsBeliefMap = False
     
     def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
         super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
         
-        # Hold Past Three Values
-        self.recentVals = []    # List of Tuple of Recent Values
-        self.numHold = 5        # Number of Past Values to Hold
-        # Heursitci Information
-        boatAngle = self.getAngle(self.boatDirection)
-        self.heuristicRadius = min(abs(self.sensorDistance*math.cos(math.radians(boatAngle-self.sensorAngle))), abs(self.sensorDistance*math.sin(math.radians(boatAngle-self.sensorAngle))))
         # Plotting Parameters
         self.ax = None
         
+    def applyParameters(self):
+        super().applyParameters()
+        # Number of Past Readings Held (in self.telemetry)
+        self.numHold = self.parameters.numHold
+        # Heursitci Information (From the Starting Heading)
+        self.heuristicRadius = min(abs(self.sensorDistance*math.cos(math.radians(self.startAngle-self.sensorAngle))), abs(self.sensorDistance*math.sin(math.radians(self.startAngle-self.sensorAngle))))
+        self.heuristicRadius *= self.parameters.heuristicScale
+        # Build the Belief Map From the Readings Already Held (e.g. a State From a Strategy Without One)
+        if self.keepsBeliefMap and self.beliefMap is None:
+            self.useBeliefMap()
         
-    def boatStuck(self, numConsider = 5, numSensors = 3):
+    def useBeliefMap(self, scaleTiles = 4, kernelWidth = 1):
+        """
+        Build the heuristic from every reading instead of the last few. The
+        readings are added to an incrementally updated beliefMap.
+        """
+        self.beliefMap = beliefMap.beliefMap(self.tank.tankWidth, self.tank.tankHeight, scaleTiles, kernelWidth)
+        # Add the Readings Already Held
+        for prevReading in self.telemetry.window():
+            self.beliefMap.addReadings(prevReading)
+        
+        
+    def traceDecisions(self, traceFile, sampleEvery = 1, bufferSize = 256):
+        """
+        Record the decision of every sampleEvery-th step to traceFile (see
+        decisionTrace). Returns the writer: close it when the run is over.
+        """
+        header = {'strategy': type(self).__name__, 'parameters': vars(self.parameters), 'heuristicRadius': self.heuristicRadius}
+        self.decisionTrace = decisionTrace.decisionTraceWriter(traceFile, header, sampleEvery, bufferSize)
+        return self.decisionTrace
+        
+    def boatStuck(self, numConsider = 5):
         """
         If the boat keeps going back and forwards to same spot, return True
         """
-        # Seperate X,Y,Z Sensor Data from the Recent Readings
-        prevX, prevY, prevZ = self.getPastVals(numConsider)
-        if len(prevX) >= numSensors*numConsider:
-            # Take Last numConsider Samples of First Sensor
-            prevX = prevX[-numSensors*numConsider:len(prevX)][0::numSensors];
-            prevY = prevY[-numSensors*numConsider:len(prevY)][0::numSensors];
-            # Round Data
-            prevX = np.round(prevX, 4); prevY = np.round(prevY, 4);
-            # Check to See if the boat keeps returning to its old position
-            for pointNum in range(2,len(prevX),2):
-                if prevX[0] != prevX[pointNum] or prevY[0] != prevY[pointNum]:
-                    return False
-            return True
-        else:
-            return False
+        # The Front Sensor Keeps Returning to Where it Was Two Steps Back
+        return self.telemetry.isOscillating(numConsider)
         
     def updatePastVals(self, threeSensorPoints):
-        # Store Each Sensor's Value at the Current Position
-        self.recentVals.append(threeSensorPoints)
-        # Only Record the Last 'numHold' Positions
-        if len(self.recentVals) > self.numHold:
-            self.recentVals.pop(0)
+        # Store Each Sensor's Value at the Current Position (Oldest is Overwritten)
+        self.telemetry.append(threeSensorPoints)
+        # Add the Readings to the Full History Map
+        if self.beliefMap is not None:
+            self.beliefMap.addReadings(threeSensorPoints)
     
     def getPastVals(self, untilNum = 3):
-        # Seperate X,Y,Z Sensor Data from the Recent Readings
-        prevX = []; prevY = []; prevZ = []
-        for prevReading in self.recentVals[-untilNum:]:
-            for prevPoint in prevReading:
-                prevX.append(prevPoint[0])
-                prevY.append(prevPoint[1])
-                prevZ.append(prevPoint[2])
-        return prevX, prevY, prevZ
+        # Seperate X,Y,Z Sensor Data from the Recent Readings (Views, Not Copies)
+        prevPoints = self.telemetry.points(untilNum)
+        return prevPoints[:,0], prevPoints[:,1], prevPoints[:,2]
             
     def getHeuristic(self, currentPos, plotDecisions = False):
-        # Seperate X,Y,Z Sensor Data from the Recent Readings
-        prevX, prevY, prevZ = self.getPastVals(3)
-        # Interpolate the Space with the Recent Readings
         xSamples, ySamples = self.PointsInCircum(currentPos.getX(), currentPos.getY(), self.heuristicRadius)
-        zSamples = interpolate.griddata((prevX, prevY), prevZ, (xSamples, ySamples), method='cubic')
+        # Read the Space from the Map of Every Reading
+        if self.beliefMap is not None:
+            zSamples = self.beliefMap.valueAt(xSamples, ySamples)
+        else:
+            # Seperate X,Y,Z Sensor Data from the Recent Readings
+            prevX, prevY, prevZ = self.getPastVals(3)
+            # Interpolate the Space with the Recent Readings
+            zSamples = interpolate.griddata((prevX, prevY), prevZ, (xSamples, ySamples), method='cubic')
         
         # If No Heuristic Gradient, Keep Going Straight
         allSame = all(self.roundValues(zVal,30) == self.roundValues(zSamples[0],30) for zVal in zSamples)
         if allSame:
             newDirection = self.boatDirection*self.heuristicRadius
+            # With the Full History, Head Back Towards the Best Reading Instead
+            if self.beliefMap is not None:
+                maxX, maxY, _ = self.beliefMap.getMaximum()
+                maxDirection = np.array([maxX - currentPos.getX(), maxY - currentPos.getY()])
+                if np.linalg.norm(maxDirection) != 0:
+                    newDirection = maxDirection*self.heuristicRadius/np.linalg.norm(maxDirection)
         # Else, Find the Heuristic Direction
         else:
             # Find Max Point on the Circle
             directionIndex = np.argmax(zSamples)
             # Find the New Direction
             newDirection = np.array([xSamples[directionIndex] - currentPos.getX(), ySamples[directionIndex] - currentPos.getY()])
-            if self.heuristicRadius*0.75 > np.linalg.norm(newDirection):
+            if self.heuristicRadius*self.parameters.nearSourceRatio > np.linalg.norm(newDirection):
                 self.boatSpeed = np.linalg.norm(newDirection)
                 self.sourceNear = True
             else:
@@ -731,6 +1566,14 @@ class AStar(Boat):
             self.ax = self.plotHeurisitic(xSamples, ySamples, zSamples, currentPos, newDirection)
         return newDirection
     
+    def slowOnTurns(self, newDirection):
+        # Slow Down for Sharp Turns; Otherwise Go Full Speed Unless Near the Source
+        newAngleDiff = self.getAngle(newDirection, self.boatDirection)
+        if self.parameters.turnSlowAngle is not None and newAngleDiff > self.parameters.turnSlowAngle:
+            self.boatSpeed = self.boatSpeed*self.parameters.turnSpeedFactor
+        elif not self.sourceNear:
+            self.boatSpeed = self.maxSpeed
+    
     def getGradient(self, frontPoint, leftPoint, rightPoint):
         # Find the Normal Vector to the 3-Point Plane
         normVector = np.cross(frontPoint - leftPoint, rightPoint - leftPoint)
@@ -746,6 +1589,9 @@ class AStar(Boat):
         Move the boat to a new position and mark the tile it is on as having
         been Visited.
         """
+        # Count the Step in the Decision Trace (Only Sampled Steps are Recorded)
+        traceStep = self.decisionTrace is not None and self.decisionTrace.nextStep()
+        speedBefore = self.boatSpeed
         # Find the Current Sensor Locations/Values
         frontPoint, leftPoint, rightPoint = self.getSensorPoints()
         # Keep Track of Previous Results
@@ -757,19 +1603,25 @@ class AStar(Boat):
         gradDirection = self.getGradient(frontPoint, leftPoint, rightPoint)
         
         # If the Source is Near, Follow the Interpolated Map
+        blendAngle = np.nan; blended = False
         if self.sourceNear:
+            decisionBranch = 0
             newDirection = guessDirection
         # Else Try Gradient Descent + Heursitc Combo
         elif np.linalg.norm(gradDirection) != 0:
+            decisionBranch = 1
             newDirection = gradDirection
             # Find the Difference in Angle
-            gradHeuristicAngle = self.getAngle(gradDirection/np.linalg.norm(gradDirection), guessDirection)
+            blendAngle = self.getAngle(gradDirection/np.linalg.norm(gradDirection), guessDirection)
             # If Not Too Different, Then Combine Them
-            if gradHeuristicAngle < 75:
+            blended = blendAngle < self.parameters.blendAngle
+            if blended:
                 newDirection = newDirection + guessDirection
         # Use Weighted Max Direction
         else:
-            print("The Gradient is Zero; Using Max Weighted Direction")
+            decisionBranch = 2
+            if self.decisionTrace is None:
+                print("The Gradient is Zero; Using Max Weighted Direction")
             newDirection = [0,0]; currentPos = [self.position.getX(), self.position.getY()]
             for point in [frontPoint, leftPoint, rightPoint]:
                 newDirection += (point[0:2] - currentPos)*point[-1]
@@ -778,12 +1630,14 @@ class AStar(Boat):
             else:
                 newDirection = self.boatDirection
             # Apply Heuristic
-            diffAngle = self.getAngle(newDirection, guessDirection)
-            if diffAngle < 75:
+            blendAngle = self.getAngle(newDirection, guessDirection)
+            blended = blendAngle < self.parameters.blendAngle
+            if blended:
                 newDirection = newDirection + guessDirection
         
         # Check to See if You Are Stuck: Switching Back and Forwards
         if self.boatStuck():
+            decisionBranch = 3
             newDirection = self.getDirection(random.randrange(360))
         # If No Directio, Go Straight
         if np.linalg.norm(newDirection) == 0:
@@ -792,11 +1646,14 @@ class AStar(Boat):
         newDirection = newDirection/np.linalg.norm(newDirection)
         
         # Prevent Big Changes
-        newAngleDiff = self.getAngle(newDirection, self.boatDirection)
-        if newAngleDiff > 60:
-            self.boatSpeed = self.boatSpeed/4
-        elif not self.sourceNear:
-            self.boatSpeed = self.maxSpeed
+        self.slowOnTurns(newDirection)
+        
+        # Record the Decision
+        if traceStep:
+            self.decisionTrace.record(x = self.position.getX(), y = self.position.getY(), gradX = gradDirection[0], gradY = gradDirection[1],
+                                      heuristicX = guessDirection[0], heuristicY = guessDirection[1], blendAngle = blendAngle,
+                                      branch = decisionBranch, blended = blended, newX = newDirection[0], newY = newDirection[1],
+                                      speedBefore = speedBefore, speedAfter = self.boatSpeed)
         
         if plotDecisions:
             try:
@@ -879,9 +1736,32 @@ class gradientDescent(AStar):
     """
     Move to the Highest Gradient
     """
+    # The Next Move Only Depends on the Position, Heading and Speed
+    isMemoryless = True
+    # Slow to Half Speed on Turns Sharper Than 90 Degrees
+    parameters = strategyParameters(turnSlowAngle = 90, turnSpeedFactor = 1/2)
+    # Read the Gradient from a Simulated Tank's gradientAt() Instead of the Sensors
+    useGradientOracle = False
     
     def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
         super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
+    
+    def getNewDirection(self):
+        """
+        Sense the field and return the (unit) direction to move in next.
+        """
+        # Find the Gradient Direction
+        if self.useGradientOracle:
+            newDirection = self.tank.gradientAt((self.position.getX(), self.position.getY()))
+        else:
+            # Find the Current Sensor Locations/Values
+            frontPoint, leftPoint, rightPoint = self.getSensorPoints()
+            newDirection = self.getGradient(frontPoint, leftPoint, rightPoint)
+        # If Completely Unsure, Go Straight
+        if np.linalg.norm(newDirection) == 0:
+            newDirection = self.boatDirection
+        # Normalize the Direction
+        return newDirection/np.linalg.norm(newDirection)
                 
     def updatePosition(self):
         """
@@ -890,23 +1770,10 @@ class gradientDescent(AStar):
         Move the boat to a new position and mark the tile it is on as having
         been Visited.
         """
-        # Find the Current Sensor Locations/Values
-        frontPoint, leftPoint, rightPoint = self.getSensorPoints()
-        
-        # Find the Gradient Direction
-        newDirection = self.getGradient(frontPoint, leftPoint, rightPoint)
-        # If Completely Unsure, Go Straight
-        if np.linalg.norm(newDirection) == 0:
-            newDirection = self.boatDirection
-        # Normalize the Direction
-        newDirection = newDirection/np.linalg.norm(newDirection)
+        newDirection = self.getNewDirection()
         
         # Prevent Big Changes
-        newAngleDiff = self.getAngle(newDirection, self.boatDirection)
-        if newAngleDiff > 90:
-            self.boatSpeed = self.boatSpeed/2
-        elif not self.sourceNear:
-            self.boatSpeed = self.maxSpeed
+        self.slowOnTurns(newDirection)
         
         # Update Boat
         self.updateBoat(newDirection)
@@ -916,17 +1783,15 @@ class maxDirection(Boat):
     """
     Move to the Highest Gradient
     """
+    # The Next Move Only Depends on the Position, Heading and Speed
+    isMemoryless = True
     
     def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
         super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
         
-        
-    def updatePosition(self):
+    def getNewDirection(self):
         """
-        Simulate the passage of a single time-step.
-
-        Move the boat to a new position and mark the tile it is on as having
-        been Visited.
+        Sense the field and return the (unit) direction to move in next.
         """
         # Find Your Current Location Information
         frontPoint, leftPoint, rightPoint = self.getSensorPoints()
@@ -939,22 +1804,29 @@ class maxDirection(Boat):
             newDirection = newDirection/np.linalg.norm(newDirection)
         else:
             newDirection = self.boatDirection
+        return newDirection
         
+    def updatePosition(self):
+        """
+        Simulate the passage of a single time-step.
+
+        Move the boat to a new position and mark the tile it is on as having
+        been Visited.
+        """
         # Update Boat
-        self.updateBoat(newDirection)
+        self.updateBoat(self.getNewDirection())
 
 class weightedMaxDirection(Boat):
+    # The Next Move Only Depends on the Position, Heading and Speed
+    isMemoryless = True
         
     def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
         super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
         
         
-    def updatePosition(self, applyHeuristic = False, plotDecisions = True, printMovement = False, findTangetPlane = False):
+    def getNewDirection(self):
         """
-        Simulate the passage of a single time-step.
-
-        Move the boat to a new position and mark the tile it is on as having
-        been Visited.
+        Sense the field and return the (unit) direction to move in next.
         """
         # Find Your Current Location Information
         frontPoint, leftPoint, rightPoint = self.getSensorPoints()
@@ -969,23 +1841,29 @@ class weightedMaxDirection(Boat):
         else:
             newDirection = self.boatDirection
         # ------------------------------ #
+        return newDirection
         
+    def updatePosition(self, applyHeuristic = False, plotDecisions = True, printMovement = False, findTangetPlane = False):
+        """
+        Simulate the passage of a single time-step.
+
+        Move the boat to a new position and mark the tile it is on as having
+        been Visited.
+        """
         # Update Boat
-        self.updateBoat(newDirection)
+        self.updateBoat(self.getNewDirection())
         
         
 class interpolatedMap(AStar):
     """
     Move to the Highest Gradient
     """
+    # Hold Past Three Values; Slow to 3/4 Speed on Turns Sharper Than 90 Degrees
+    parameters = strategyParameters(numHold = 3, turnSlowAngle = 90, turnSpeedFactor = 3/4)
     
     def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
         super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
         
-        # Hold Past Three Values
-        self.recentVals = []    # List of Tuple of Recent Values
-        self.numHold = 3        # Number of Past Values to Hold
-        
     def updatePosition(self):
         """
         Simulate the passage of a single time-step.
@@ -1009,16 +1887,103 @@ class interpolatedMap(AStar):
             newDirection = self.boatDirection
             
         # Prevent Big Changes
-        newAngleDiff = self.getAngle(newDirection, self.boatDirection)
-        if newAngleDiff > 90:
-            self.boatSpeed = self.boatSpeed*3/4
-        elif not self.sourceNear:
-            self.boatSpeed = self.maxSpeed
+        self.slowOnTurns(newDirection)
             
         # Update Boat
         self.updateBoat(newDirection)
 
 
+class beliefMapAStar(AStar):
+    """
+    AStar with a Heuristic Built from Every Reading
+    """
+    # Keep a Map of the Full Reading History
+    keepsBeliefMap = True
+    
+    def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
+        super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
+
+
+class beliefInterpolatedMap(interpolatedMap):
+    """
+    interpolatedMap Using Every Reading Instead of the Last Three
+    """
+    # Keep a Map of the Full Reading History
+    keepsBeliefMap = True
+    
+    def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
+        super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
+
+
+class particleFilterParameters(strategyParameters):
+    """
+    strategyParameters Plus the Particle Filter's Constants
+    """
+    def __init__(self, **parameterValues):
+        self.numParticles = 20000       # Number of Source Guesses in the Particle Filter
+        self.plumeWidth = 5             # Width (Standard Deviation) of the Plume the Particle Filter Models (Tiles)
+        self.readingNoise = 1           # Spread of a Log Reading About the Modelled Plume
+        self.modeRadius = 3             # Within This Many Sensor Distances of the Particle Filter's Mode, Climb the Sensed Gradient
+        super().__init__(**parameterValues)
+
+
+class particleFilterSearch(AStar):
+    """
+    Head for the Most Likely Source Location Given Every Reading So Far
+    """
+    parameters = particleFilterParameters()
+    
+    def __init__(self, tank, boatSpeed, boatLocations, boatDirection,sensorDistance):
+        super().__init__(tank, boatSpeed, boatLocations, boatDirection,sensorDistance)
+        
+    def applyParameters(self):
+        super().applyParameters()
+        filterSettings = (self.parameters.numParticles, self.parameters.plumeWidth, self.parameters.readingNoise)
+        currentFilter = getattr(self, 'particleFilter', None)
+        if currentFilter is not None and (currentFilter.numParticles, currentFilter.plumeWidth, currentFilter.readingNoise) == filterSettings:
+            return
+        # Weighted Guesses of the Source (Seeded From Python's random, so Seeded Runs Repeat)
+        self.particleFilter = particleFilter.particleFilter(self.tank.tankWidth, self.tank.tankHeight, *filterSettings, seed = random.getrandbits(32))
+        # Add the Readings Already Held
+        for prevReading in self.telemetry.window():
+            self.particleFilter.addReadings(prevReading)
+        
+    def getNewDirection(self):
+        """
+        Sense the field, update the particle filter and return the (unit)
+        direction to move in next.
+        """
+        # Score Every Particle Against the New Readings
+        frontPoint, leftPoint, rightPoint = self.getSensorPoints()
+        self.updatePastVals((frontPoint, leftPoint, rightPoint))
+        self.particleFilter.addReadings((frontPoint, leftPoint, rightPoint))
+        
+        # Head for the Posterior Mode
+        modeX, modeY, _ = self.particleFilter.getMode()
+        newDirection = np.array([modeX - self.position.getX(), modeY - self.position.getY()])
+        modeDistance = np.linalg.norm(newDirection)
+        if modeDistance >= self.parameters.modeRadius*self.sensorDistance:
+            self.boatSpeed = self.maxSpeed
+            return newDirection/modeDistance
+        # Close to the Mode One Plume Can Not Pin Down Nearby Sources: Climb the Gradient at Half Speed
+        gradDirection = self.getGradient(frontPoint, leftPoint, rightPoint)
+        self.boatSpeed = self.maxSpeed/2
+        if np.linalg.norm(gradDirection) != 0:
+            return gradDirection/np.linalg.norm(gradDirection)
+        if modeDistance != 0:
+            return newDirection/modeDistance
+        return self.boatDirection
+        
+    def updatePosition(self):
+        """
+        Simulate the passage of a single time-step.
+
+        Move the boat to a new position and mark the tile it is on as having
+        been Visited.
+        """
+        self.updateBoat(self.getNewDirection())
+
+
 # --------------------------------------------------------------------------- #
 #                             Run Boat Simulation                             #
 # --------------------------------------------------------------------------- #
@@ -1074,7 +2039,25 @@ def runSimulation(sourceLocations, boatLocations, boatSpeed, boatDirection, sens
     #Return the Total Time Steps it Took
     return total_time_steps
 
-def compareAlgorythms(sourceLocations, boatLocations, boatSpeed, boatDirection, sensorDistance, tankWidth, tankHeight, numBoats = 1, simFile = "./", outFile = "./diffusion_stable_UpperRight.png"):
+def runStrategy(waterTank, boatType, boatLocations, boatSpeed, boatDirection, sensorDistance, numBoats = 1, maxSteps = 40, seed = None, maxMacroSteps = 1):
+    """
+    Runs a single strategy from the start until the source is found or
+    maxSteps have passed.
+
+    seed: the seed for Python's random module (None = leave it as is)
+    maxMacroSteps: cross flat parts of the field in legs of up to this many
+        steps without sensing (1 = sense every step; see simulationRun)
+    returns: the path of the last boat ({'x': [...], 'y': [...]}) and the
+        number of time-steps taken
+    """
+    strategyRun = simulationRun.simulationRun(waterTank, boatType, boatLocations, boatSpeed, boatDirection, sensorDistance, numBoats, maxSteps, seed)
+    strategyRun.useMacroSteps(maxMacroSteps)
+    # Run the Search Algorythm Until the Boat Reaches the Source
+    strategyRun.runToEnd()
+    return strategyRun.getResults()
+
+def compareAlgorythms(sourceLocations, boatLocations, boatSpeed, boatDirection, sensorDistance, tankWidth, tankHeight, numBoats = 1, simFile = "./", outFile = "./diffusion_stable_UpperRight.png",
+                      cacheFolder = None, maxCacheBytes = 1E9, seed = None, maxSteps = 40, renderer = None):
     """
     Runs NUM_TRIALS trials of the simulation and returns the mean number of
     time-steps needed to clean the fraction MIN_COVERAGE of the tank.
@@ -1088,7 +2071,11 @@ def compareAlgorythms(sourceLocations, boatLocations, boatSpeed, boatDirection,
     tankWidth: an int (tankWidth > 0)
     tankHeight: an int (tankHeight > 0)
     numBoats: an int (numBoats > 0)
-    visualize: Boolean
+    cacheFolder: a folder to cache runs in (None = no cache). Only seeded runs
+        are cached, since unseeded random strategies are not repeatable.
+    seed: the seed for Python's random module at the start of each run
+    renderer: a figureRenderer to save the figure in the background (None =
+        draw and show it here)
     """
     # Initialize the Boat
     #boatTypes = [AStar, gradientDescent, interpolatedMap , weightedMaxDirection, maxDirection, randomDirection]
@@ -1103,67 +2090,42 @@ def compareAlgorythms(sourceLocations, boatLocations, boatSpeed, boatDirection,
     waterTank = cosmolSimTank(sourceLocations, tankWidth, tankHeight, simFile)
     #waterTank = diffusionModelTank(sourceLocations, tankWidth, tankHeight)
 
+    # Reuse Runs Already Simulated With the Same Inputs
+    runCache = resultCache.resultCache(cacheFolder, maxCacheBytes) if cacheFolder is not None and seed is not None else None
+
     algPositions = {}
     for i, boatType in enumerate(boatTypes):
 
-        waterTank.reinitialize()
-
         print(boatType)
-        algPositions[i] = {'x':[], 'y':[]}
-        # Add the Boats to the Tank
-        boatCollection = []
-        for boatNum in range(numBoats):
-            boatCollection.append(boatType(waterTank, boatSpeed, boatLocations[boatNum], boatDirection, sensorDistance))
+        # Load the Run from the Cache
+        if runCache is not None:
+            runKey = runCache.runKey(waterTank, boatType, boatLocations, boatSpeed, boatDirection, sensorDistance, numBoats, maxSteps, seed)
+            cachedRun = runCache.load(runKey)
+            if cachedRun is not None:
+                algPositions[i] = {'x': cachedRun['x'].tolist(), 'y': cachedRun['y'].tolist()}
+                timeSteps.append(float(cachedRun['timeSteps']))
+                continue
         
-        algPositions[i]['x'].append(boatCollection[0].position.x)
-        algPositions[i]['y'].append(boatCollection[0].position.y)
-        
-        total_time_steps = 0.0
         # Run the Search Algorythm Until the Boat Reaches the Source
-        while not waterTank.sourceFound():
-            # Move Each Boat
-            for boat in boatCollection:
-                boat.updatePosition()
-                
-            algPositions[i]['x'].append(boat.position.x)
-            algPositions[i]['y'].append(boat.position.y)
-            total_time_steps += 1
-            if total_time_steps > 39:
-                break
+        algPositions[i], total_time_steps = runStrategy(waterTank, boatType, boatLocations, boatSpeed, boatDirection, sensorDistance, numBoats, maxSteps, seed)
         timeSteps.append(total_time_steps)
+        # Save the Run
+        if runCache is not None:
+            runCache.store(runKey, x = np.array(algPositions[i]['x'], dtype=float), y = np.array(algPositions[i]['y'], dtype=float), timeSteps = total_time_steps)
             
-    fig = plt.figure()
-    ax = fig.add_subplot(111, xlim=[0, tankWidth], ylim=[0, tankHeight], autoscale_on=False)
-    ax.set_aspect('auto')
-    
-    xVec = np.linspace(0, tankWidth, 300)
-    yVec = np.linspace(0, tankHeight, 300)
-    xData, yData, zData = waterTank.find2DSimMap(xVec, yVec)
-    fullData = np.stack((xData, yData, zData))
-    sc = plt.scatter(fullData[0], fullData[1], c=fullData[2], cmap='jet', s=1)#, norm=matplotlib.colors.LogNorm())
-    #plt.clim(10E-20,10)  # identical to caxis([-4,4]) in MATLAB
-    plt.colorbar(sc)
-    
-    for i in range(len(boatTypes)):
-        plt.plot(algPositions[i]['x'], algPositions[i]['y'], color=colorTypes[i], label=labels[i]+" Steps: "+str(timeSteps[i]), linewidth=2, zorder=zOrder[i])#, path_effects=[pe.Stroke(linewidth=4, foreground='k'), pe.Normal()])
-        #break
-    #plt.plot([waterTank.sourceLocations[0][0], waterTank.sourceLocations[1][0]], [waterTank.sourceLocations[0][1], waterTank.sourceLocations[1][1]], 'o', markersize = 10)
-    
-    plt.axis('off')
-    #plt.title("Search Algorithm Comparison")
-    #plt.xlabel("Tank Width")
-    #plt.ylabel("Tank Height")
-    lgd = plt.legend(loc='upper left', bbox_to_anchor=(1.25, 1.02), fancybox=True, shadow=True)
-    
-    plt.tick_params(left=False,
-                bottom=False,
-                labelleft=False,
-                labelbottom=False)
-    
-    os.makedirs(os.path.dirname(outFile) + "/", exist_ok=True)
-    plt.savefig(outFile, dpi=300, transparent=True, bbox_extra_artists=(lgd,), bbox_inches='tight')
-    
-    plt.show()
+    # Sample the Field Once per Dataset (Drawn as an Image)
+    fieldImage, extent = figureRenderer.fieldRaster(waterTank, 300)
+    xx, yy = np.meshgrid(np.linspace(0, tankWidth, 300), np.linspace(0, tankHeight, 300), indexing='ij')
+    fullData = np.stack((xx.ravel(), yy.ravel(), fieldImage.ravel()))
+    
+    # Overlay the Trajectories
+    pathPositions = [algPositions[i] for i in range(len(boatTypes))]
+    legendLabels = [labels[i]+" Steps: "+str(timeSteps[i]) for i in range(len(boatTypes))]
+    if renderer is not None:
+        renderer.submit(pathPositions, legendLabels, colorTypes, zOrder, outFile)
+    else:
+        figureRenderer.drawRunFigure(fieldImage, extent, pathPositions, legendLabels, colorTypes, zOrder, outFile)
+        plt.show()
     
     return algPositions, fullData
 
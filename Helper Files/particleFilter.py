@@ -0,0 +1,109 @@
+"""
+Particle Filter Over Candidate Source Locations
+
+Each particle is a guess of where the source is and how strong it is. The
+field a source makes is modelled as a Gaussian plume, amplitude*exp(-d^2 /
+(2*plumeWidth^2)), and readings are compared with it in log space (readings
+span orders of magnitude), so a reading far from the source still says how far
+away it is. Every reading re-weights all particles at once; when the weights
+concentrate on a few particles they are resampled (systematic resampling) and
+jittered so the cloud keeps exploring around the likely spots.
+"""
+
+# Import Basic Modules
+import numpy as np
+
+
+class particleFilter(object):
+    """
+    numParticles weighted (x, y, log amplitude) guesses of the source.
+    """
+    def __init__(self, tankWidth, tankHeight, numParticles = 20000, plumeWidth = 5, readingNoise = 1, readingFloor = 1E-4,
+                 amplitudeRange = 10, positionJitter = 0.25, amplitudeJitter = 0.1, resampleFraction = 0.5, seed = None):
+        """
+        tankWidth, tankHeight: the tank dimensions (tiles); particles start
+            spread evenly over it
+        plumeWidth: the standard deviation of the modelled plume (tiles)
+        readingNoise: the standard deviation of a log reading about the model
+        readingFloor: readings (and predictions) below this are treated as it
+        amplitudeRange: the log amplitudes first tried span this range above
+            the strongest first reading
+        positionJitter, amplitudeJitter: the spread added when resampling
+        resampleFraction: resample when the effective number of particles
+            falls below this fraction of numParticles
+        """
+        self.tankWidth = tankWidth
+        self.tankHeight = tankHeight
+        self.numParticles = int(numParticles)
+        self.plumeWidth = plumeWidth
+        self.readingNoise = readingNoise
+        self.logFloor = np.log(readingFloor)
+        self.amplitudeRange = amplitudeRange
+        self.positionJitter = positionJitter
+        self.amplitudeJitter = amplitudeJitter
+        self.resampleFraction = resampleFraction
+        self.rng = np.random.default_rng(seed)
+        # Initialize the Particles
+        self.reset()
+
+    def reset(self):
+        self.positions = self.rng.uniform((0, 0), (self.tankWidth, self.tankHeight), (self.numParticles, 2))
+        # Set From the First Readings (the Source is at Least as Strong as Them)
+        self.logAmplitudes = None
+        self.logWeights = np.zeros(self.numParticles)
+        self.numReadings = 0
+        self.numResamples = 0
+
+    def addReadings(self, sensorPoints):
+        """
+        Weigh every particle by how well it predicts the readings.
+
+        sensorPoints: a sequence of (x, y, value) points
+        """
+        sensorPoints = np.asarray(sensorPoints, dtype=float).reshape(-1, 3)
+        logReadings = np.log(np.maximum(sensorPoints[:,2], np.exp(self.logFloor)))
+        if self.logAmplitudes is None:
+            self.logAmplitudes = logReadings.max() + self.rng.uniform(0, self.amplitudeRange, self.numParticles)
+        # Compare the Readings to Each Particle's Plume (numParticles x numReadings)
+        distanceSquared = (self.positions[:,0,None] - sensorPoints[None,:,0])**2 + (self.positions[:,1,None] - sensorPoints[None,:,1])**2
+        logPredictions = np.maximum(self.logAmplitudes[:,None] - distanceSquared/(2*self.plumeWidth**2), self.logFloor)
+        self.logWeights -= np.sum((logReadings[None,:] - logPredictions)**2, axis=1)/(2*self.readingNoise**2)
+        self.logWeights -= self.logWeights.max()
+        self.numReadings += len(sensorPoints)
+        # Resample Once Only a Few Particles Carry the Weight
+        if self.effectiveSize() < self.resampleFraction*self.numParticles:
+            self.resample()
+
+    def getWeights(self):
+        particleWeights = np.exp(self.logWeights - self.logWeights.max())
+        return particleWeights/particleWeights.sum()
+
+    def effectiveSize(self):
+        return 1/np.sum(self.getWeights()**2)
+
+    def resample(self):
+        # Systematic Resampling: One Random Offset, Evenly Spaced Picks
+        cumulativeWeights = np.cumsum(self.getWeights())
+        pickPoints = (self.rng.random() + np.arange(self.numParticles))/self.numParticles
+        particleIndices = np.minimum(np.searchsorted(cumulativeWeights, pickPoints), self.numParticles - 1)
+        # Jitter the Copies so Repeated Particles Spread Out Again
+        self.positions = self.positions[particleIndices] + self.rng.normal(0, self.positionJitter, (self.numParticles, 2))
+        np.clip(self.positions, 0, (self.tankWidth, self.tankHeight), out=self.positions)
+        self.logAmplitudes = self.logAmplitudes[particleIndices] + self.rng.normal(0, self.amplitudeJitter, self.numParticles)
+        self.logWeights = np.zeros(self.numParticles)
+        self.numResamples += 1
+
+    def getMode(self, scaleTiles = 1):
+        """
+        Return the center of the grid cell (scaleTiles cells per tile) holding
+        the most particle weight, and that weight.
+        """
+        numX = int(np.ceil(self.tankWidth*scaleTiles)); numY = int(np.ceil(self.tankHeight*scaleTiles))
+        cellX = np.minimum((self.positions[:,0]*scaleTiles).astype(int), numX - 1)
+        cellY = np.minimum((self.positions[:,1]*scaleTiles).astype(int), numY - 1)
+        cellWeights = np.bincount(cellX*numY + cellY, weights=self.getWeights(), minlength=numX*numY)
+        modeCell = int(np.argmax(cellWeights))
+        return (modeCell//numY + 0.5)/scaleTiles, (modeCell % numY + 0.5)/scaleTiles, cellWeights[modeCell]
+
+    def getMean(self):
+        return self.getWeights() @ self.positions
@@ -0,0 +1,256 @@
+"""
+Precomputed Policy Tables for Memoryless Strategies
+
+The next heading of a memoryless strategy (isMemoryless = True) depends only on
+the boat's position and heading in a fixed field, so the whole decision can be
+tabulated once. buildPolicyTable() evaluates the live strategy over a
+quantized (x, y, heading) lattice in parallel and stores the new headings in a
+compact float32 array. policyStepper then runs any number of boats with array
+lookups instead of sensing and geometry, and measurePolicyError() reports how
+far the table's headings are from the live strategy.
+"""
+
+# Import Basic Modules
+import math
+import multiprocessing
+import numpy as np
+# Import the Boat and Tank Classes
+import objectParameters
+
+# The Boat Each Worker Process Evaluates Decisions With
+workerBoat = None
+
+
+def initializeWorker(waterTank, boatType, boatSpeed, sensorDistance):
+    global workerBoat
+    workerBoat = boatType(waterTank, boatSpeed, (0, 0), [1, 0], sensorDistance)
+
+
+def setBoatState(boat, x, y, heading):
+    # Place the Boat at the Lattice State (at Full Speed)
+    boat.setBoatPosition(objectParameters.Position(x, y))
+    boat.setBoatDirectionVector(boat.getDirection(heading))
+    boat.setBoatAngle(heading)
+    boat.boatSpeed = boat.maxSpeed
+
+
+def evaluateDecisions(states):
+    """
+    Return the live strategy's new heading (degrees) for each (x, y, heading)
+    row of states.
+    """
+    newHeadings = np.empty(len(states), dtype=np.float32)
+    for stateNum, (x, y, heading) in enumerate(states):
+        setBoatState(workerBoat, x, y, heading)
+        newHeadings[stateNum] = workerBoat.getAngle(workerBoat.getNewDirection())
+    return newHeadings
+
+
+def runDecisions(waterTank, boatType, boatSpeed, sensorDistance, states, numWorkers = None, chunkSize = 2000):
+    # Split the States into Chunks for the Workers
+    stateChunks = [states[chunkStart:chunkStart + chunkSize] for chunkStart in range(0, len(states), chunkSize)]
+    if numWorkers == 1:
+        # Evaluate in This Process Without Leaving Marks on the Tank
+        savedTiles = waterTank.tiles.copy()
+        initializeWorker(waterTank, boatType, boatSpeed, sensorDistance)
+        newHeadings = [evaluateDecisions(stateChunk) for stateChunk in stateChunks]
+        waterTank.tiles = savedTiles
+    else:
+        with multiprocessing.Pool(numWorkers, initializeWorker, (waterTank, boatType, boatSpeed, sensorDistance)) as workerPool:
+            newHeadings = workerPool.map(evaluateDecisions, stateChunks)
+    return np.concatenate(newHeadings) if newHeadings else np.zeros(0, dtype=np.float32)
+
+
+class policyTable(object):
+    """
+    A policyTable holds the new heading for every lattice state. Node (i, j, k)
+    is the state (i*xStep, j*yStep, k*angleStep).
+    """
+    def __init__(self, newHeadings, xStep, yStep, angleStep, strategyName = "", errorStats = None):
+        self.newHeadings = np.asarray(newHeadings, dtype=np.float32)
+        self.xStep = xStep
+        self.yStep = yStep
+        self.angleStep = angleStep
+        self.strategyName = strategyName
+        self.errorStats = errorStats or {}
+
+    def lookup(self, x, y, heading):
+        """
+        Return the tabulated new heading at the closest lattice state.
+        Accepts single values or arrays.
+        """
+        numX, numY, numAngles = self.newHeadings.shape
+        xIndex = np.clip(np.rint(np.asarray(x)/self.xStep).astype(int), 0, numX - 1)
+        yIndex = np.clip(np.rint(np.asarray(y)/self.yStep).astype(int), 0, numY - 1)
+        angleIndex = np.rint(np.asarray(heading)/self.angleStep).astype(int) % numAngles
+        return self.newHeadings[xIndex, yIndex, angleIndex]
+
+    def save(self, tableFile):
+        np.savez_compressed(tableFile, newHeadings = self.newHeadings, steps = np.array([self.xStep, self.yStep, self.angleStep]),
+                            strategyName = np.array(self.strategyName), errorNames = np.array(list(self.errorStats.keys()), dtype=str),
+                            errorValues = np.array(list(self.errorStats.values()), dtype=float))
+
+
+def loadPolicyTable(tableFile):
+    with np.load(tableFile) as tableData:
+        xStep, yStep, angleStep = tableData['steps']
+        errorStats = dict(zip(tableData['errorNames'].tolist(), tableData['errorValues'].tolist()))
+        return policyTable(tableData['newHeadings'], xStep, yStep, angleStep, str(tableData['strategyName']), errorStats)
+
+
+def buildPolicyTable(waterTank, boatType, boatSpeed, sensorDistance, xStep = 0.5, yStep = 0.5, angleStep = 10, numWorkers = None):
+    """
+    Tabulate a memoryless strategy's decision over the (x, y, heading) lattice
+    covering the tank.
+
+    numWorkers: the number of processes (None = one per CPU, 1 = this process)
+    """
+    if not getattr(boatType, 'isMemoryless', False):
+        raise ValueError(boatType.__name__ + " Depends on its History and Cannot be Tabulated")
+    # Build the Lattice of States
+    xLattice = np.arange(0, waterTank.tankWidth + xStep/2, xStep)
+    yLattice = np.arange(0, waterTank.tankHeight + yStep/2, yStep)
+    angleLattice = np.arange(0, 360, angleStep)
+    xx, yy, aa = np.meshgrid(xLattice, yLattice, angleLattice, indexing='ij')
+    states = np.column_stack((xx.ravel(), yy.ravel(), aa.ravel()))
+
+    # Evaluate the Decision at Every State
+    newHeadings = runDecisions(waterTank, boatType, boatSpeed, sensorDistance, states, numWorkers)
+    return policyTable(newHeadings.reshape(xx.shape), xStep, yStep, angleStep, boatType.__name__)
+
+
+def angleDifference(angle1, angle2):
+    # The Smallest Difference Between Two Headings (Degrees)
+    return np.abs((np.asarray(angle1) - np.asarray(angle2) + 180) % 360 - 180)
+
+
+def measurePolicyError(table, waterTank, boatType, boatSpeed, sensorDistance, numSamples = 2000, seed = 0, numWorkers = 1):
+    """
+    Compare the table against the live strategy at random states between the
+    lattice nodes, store the heading error statistics (degrees) in
+    table.errorStats and return them.
+    """
+    randomState = np.random.RandomState(seed)
+    states = np.column_stack((randomState.uniform(sensorDistance, waterTank.tankWidth - sensorDistance, numSamples),
+                              randomState.uniform(sensorDistance, waterTank.tankHeight - sensorDistance, numSamples),
+                              randomState.uniform(0, 360, numSamples)))
+    liveHeadings = runDecisions(waterTank, boatType, boatSpeed, sensorDistance, states, numWorkers)
+    headingErrors = angleDifference(liveHeadings, table.lookup(states[:,0], states[:,1], states[:,2]))
+
+    table.errorStats = {'maxError': float(headingErrors.max()), 'meanError': float(headingErrors.mean()),
+                        'p95Error': float(np.percentile(headingErrors, 95)), 'numSamples': numSamples}
+    return table.errorStats
+
+
+def boatTurnAngle(newHeadings, headings):
+    """
+    The turn angle exactly as Boat.getAngle(newDirection, boatDirection) finds
+    it: the angle between the two headings, measured as 360 minus that angle
+    whenever the new heading points down (negative y).
+    """
+    newHeadings = np.radians(newHeadings); headings = np.radians(headings)
+    dotProduct = np.round(np.cos(newHeadings)*np.cos(headings) + np.sin(newHeadings)*np.sin(headings), 10)
+    turnAngle = np.degrees(np.arccos(dotProduct))
+    return np.where(np.sin(newHeadings) < 0, 360 - turnAngle, turnAngle)
+
+
+class policyStepper(object):
+    """
+    Runs many boats at once by looking their next heading up in a policyTable.
+    Walls are handled like Boat.updateBoat (clamp, then turn around if stuck),
+    and the speed rule of the strategy (turnSlowAngle/turnSpeedFactor of its
+    parameters) is applied to every boat.
+    """
+    def __init__(self, table, waterTank, boatType, boatSpeed, sensorDistance):
+        self.table = table
+        self.waterTank = waterTank
+        self.maxSpeed = boatSpeed
+        self.sensorDistance = sensorDistance
+        self.turnSlowAngle = boatType.parameters.turnSlowAngle
+        self.turnSpeedFactor = boatType.parameters.turnSpeedFactor
+
+    def boundMoves(self, x, y, newX, newY):
+        # If The Position is Not in the Tank, Bound the Position by the Tank
+        tankBuffer = self.sensorDistance/2
+        outsideTank = ~((tankBuffer <= newX) & (newX < self.waterTank.tankWidth - tankBuffer)
+                        & (tankBuffer <= newY) & (newY < self.waterTank.tankHeight - tankBuffer))
+        newX = np.where(outsideTank, np.clip(newX, self.sensorDistance, self.waterTank.tankWidth - self.sensorDistance), newX)
+        newY = np.where(outsideTank, np.clip(newY, self.sensorDistance, self.waterTank.tankHeight - self.sensorDistance), newY)
+        # Obstacles Need the Tank's Path Check
+        if self.waterTank.obstacleSDF is not None:
+            for boatNum in range(len(x)):
+                resolvedPos = self.waterTank.resolveMove(objectParameters.Position(x[boatNum], y[boatNum]), objectParameters.Position(newX[boatNum], newY[boatNum]), tankBuffer, self.sensorDistance)
+                newX[boatNum], newY[boatNum] = resolvedPos.getX(), resolvedPos.getY()
+        return newX, newY
+
+    def step(self, x, y, headings, speeds):
+        """
+        Advance every boat one time-step. Returns the new x, y, headings, speeds.
+        """
+        newHeadings = self.table.lookup(x, y, headings).astype(float)
+        # Prevent Big Changes
+        if self.turnSlowAngle is not None:
+            sharpTurn = boatTurnAngle(newHeadings, headings) > self.turnSlowAngle
+            speeds = np.where(sharpTurn, speeds*self.turnSpeedFactor, self.maxSpeed)
+
+        # Move Along the New Heading
+        newX = x + speeds*np.cos(np.radians(newHeadings))
+        newY = y + speeds*np.sin(np.radians(newHeadings))
+        targetX, targetY = newX, newY
+        newX, newY = self.boundMoves(x, y, newX, newY)
+        # If We are NOT Moving, Turn Around
+        notMoving = (newX == x) & (newY == y)
+        if notMoving.any():
+            newHeadings = np.where(notMoving, (newHeadings + 180) % 360, newHeadings)
+            targetX = np.where(notMoving, x + speeds*np.cos(np.radians(newHeadings)), targetX)
+            targetY = np.where(notMoving, y + speeds*np.sin(np.radians(newHeadings)), targetY)
+            turnedX, turnedY = self.boundMoves(x, y, targetX.copy(), targetY.copy())
+            newX = np.where(notMoving, turnedX, newX); newY = np.where(notMoving, turnedY, newY)
+        # Bounded Moves Point From the Old to the New Position
+        boundedMove = ((newX != targetX) | (newY != targetY)) & ((newX != x) | (newY != y))
+        newHeadings = np.where(boundedMove, np.degrees(np.arctan2(newY - y, newX - x)) % 360, newHeadings)
+        return newX, newY, newHeadings, speeds
+
+    def nearSource(self, x, y, maxDev, startX = None, startY = None):
+        # Check if Each Boat's Tile is Within maxDev Tiles of a Source (With Swept Paths, Any Tile the Move From startX, startY Crossed)
+        if startX is not None and self.waterTank.markSweptPaths:
+            tileX, tileY, segmentNums = objectParameters.supercoverTiles(startX, startY, x, y, returnSegments = True)
+        else:
+            tileX, tileY, segmentNums = np.floor(x), np.floor(y), np.arange(len(x))
+        tileFound = np.zeros(len(tileX), dtype=bool)
+        for locX, locY in self.waterTank.sourceLocations:
+            tileFound |= (np.abs(tileX - locX) <= maxDev) & (np.abs(tileY - locY) <= maxDev)
+        foundSource = np.zeros(len(x), dtype=bool)
+        foundSource[segmentNums[tileFound]] = True
+        return foundSource
+
+    def run(self, startPoints, boatDirection, maxSteps = 40, maxDev = 1):
+        """
+        Run one boat from every start point, each as if alone in the tank.
+
+        returns: a dict with 'paths' (numBoats, maxSteps + 1, 2), 'timeSteps'
+            and 'sourceFound' (one per boat)
+        """
+        startPoints = np.asarray(startPoints, dtype=float)
+        numBoats = len(startPoints)
+        x, y = startPoints[:,0].copy(), startPoints[:,1].copy()
+        headings = np.full(numBoats, math.degrees(math.atan2(boatDirection[1], boatDirection[0])) % 360)
+        speeds = np.full(numBoats, float(self.maxSpeed))
+        # Track Every Boat's Path
+        paths = np.empty((numBoats, maxSteps + 1, 2))
+        paths[:,0,0], paths[:,0,1] = x, y
+        timeSteps = np.zeros(numBoats, dtype=int)
+        sourceFound = self.nearSource(x, y, maxDev)
+
+        for stepNum in range(1, maxSteps + 1):
+            # Only Move the Boats Still Searching
+            active = ~sourceFound
+            if not active.any():
+                paths[:,stepNum] = paths[:,stepNum - 1]
+                continue
+            startX, startY = x.copy(), y.copy()
+            x[active], y[active], headings[active], speeds[active] = self.step(x[active], y[active], headings[active], speeds[active])
+            timeSteps[active] += 1
+            paths[:,stepNum,0], paths[:,stepNum,1] = x, y
+            sourceFound |= active & self.nearSource(x, y, maxDev, startX, startY)
+        return {'paths': paths, 'timeSteps': timeSteps, 'sourceFound': sourceFound}
@@ -0,0 +1,71 @@
+"""
+Read-Through Cache of Sensor Readings
+
+Boats read the same places again and again: oscillating boats, moves clamped
+at the walls and several boats on one path. When a reading is expensive
+(hardware, or an operator typing it in) a readingCache answers repeated reads
+from memory. Positions are quantized to positionQuantum, so reads closer
+than that share a reading, and the least recently used readings are dropped
+once maxEntries are held.
+
+Readings are keyed by position only (every sensor measures the same field).
+"""
+
+# Import Basic Modules
+from collections import OrderedDict
+
+
+class readingCache(object):
+    """
+    A size-bounded LRU map from quantized (x, y) positions to readings.
+    """
+    def __init__(self, positionQuantum = 0.01, maxEntries = 100000):
+        self.positionQuantum = positionQuantum
+        self.maxEntries = maxEntries
+        self.readings = OrderedDict()
+        # Usage Statistics
+        self.numHits = 0
+        self.numMisses = 0
+        self.numEvictions = 0
+
+    def positionKey(self, position):
+        if not self.positionQuantum:
+            return (float(position[0]), float(position[1]))
+        return (int(round(position[0]/self.positionQuantum)), int(round(position[1]/self.positionQuantum)))
+
+    def lookup(self, position):
+        """
+        Return the cached reading near position, or None.
+        """
+        positionKey = self.positionKey(position)
+        reading = self.readings.get(positionKey)
+        if reading is None:
+            self.numMisses += 1
+            return None
+        # Mark the Reading as Recently Used
+        self.readings.move_to_end(positionKey)
+        self.numHits += 1
+        return reading
+
+    def store(self, position, reading):
+        positionKey = self.positionKey(position)
+        self.readings[positionKey] = reading
+        self.readings.move_to_end(positionKey)
+        # Drop the Least Recently Used Readings
+        while len(self.readings) > self.maxEntries:
+            self.readings.popitem(last=False)
+            self.numEvictions += 1
+
+    def clear(self):
+        """
+        Forget every reading (e.g. when the field changes). Keeps the stats.
+        """
+        self.readings.clear()
+
+    def hitRate(self):
+        numReads = self.numHits + self.numMisses
+        return self.numHits/numReads if numReads else 0.0
+
+    def getStats(self):
+        return {'numHits': self.numHits, 'numMisses': self.numMisses, 'numEvictions': self.numEvictions,
+                'numEntries': len(self.readings), 'hitRate': self.hitRate()}
@@ -0,0 +1,242 @@
+"""
+Content-Addressed On-Disk Cache of Simulation Runs
+
+Every run is stored under a key hashed from everything that decides its
+outcome: the dataset's contents, the tank's parameters and code, the
+strategy's code (its whole class hierarchy, the helper functions and classes
+of its module and the repository modules that module uses), the start state
+and the RNG seed. Editing one strategy only changes that strategy's keys, so
+re-running a sweep only recomputes its runs. The cache folder is kept under a
+size limit by evicting the least recently used runs.
+"""
+
+# Import Basic Modules
+import os
+import sys
+import json
+import inspect
+import hashlib
+import numpy as np
+
+
+def hashBytes(*byteStrings):
+    hasher = hashlib.sha256()
+    for byteString in byteStrings:
+        hasher.update(byteString)
+    return hasher.hexdigest()
+
+
+def sourceText(codeObject):
+    # The Source of a Class, Function or Module (its Name if the Source is Not Available)
+    try:
+        return inspect.getsource(codeObject)
+    except (OSError, TypeError):
+        return getattr(codeObject, "__module__", "") + "." + getattr(codeObject, "__qualname__", getattr(codeObject, "__name__", ""))
+
+
+def jsonValue(value):
+    # Convert NumPy Values and Tuples so the Key is Stable
+    if isinstance(value, np.ndarray):
+        return [jsonValue(item) for item in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [jsonValue(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): jsonValue(item) for key, item in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class resultCache(object):
+    """
+    A resultCache stores run outcomes (arrays) in cacheFolder, one .npz file
+    per key, and evicts the least recently used files once the folder holds
+    more than maxBytes.
+
+    The folder's size is tracked in memory, so a store only scans the folder
+    when the cache may be over its limit or every rescanEvery stores (to
+    count runs other processes stored).
+    """
+    def __init__(self, cacheFolder = "./Cache/", maxBytes = 1E9, rescanEvery = 256):
+        self.cacheFolder = cacheFolder
+        self.maxBytes = maxBytes
+        self.rescanEvery = rescanEvery
+        os.makedirs(cacheFolder, exist_ok=True)
+        # Hashes Already Computed This Session
+        self.fileHashes = {}
+        self.codeHashes = {}
+        self.moduleHashes = {}
+        # Size of the Folder When Last Scanned Plus What Was Stored Since (None = Not Scanned)
+        self.cacheBytes = None
+        self.numStoresSinceScan = 0
+        # Usage Statistics
+        self.numHits = 0
+        self.numMisses = 0
+
+    # ------------------------------ Keys ------------------------------- #
+
+    def fileHash(self, fileName):
+        """
+        Hash a dataset's contents (remembered until the file changes).
+        """
+        fileStats = os.stat(fileName)
+        fileKey = (os.path.abspath(fileName), fileStats.st_mtime_ns, fileStats.st_size)
+        if fileKey not in self.fileHashes:
+            hasher = hashlib.sha256()
+            with open(fileName, "rb") as inFile:
+                for fileChunk in iter(lambda: inFile.read(1 << 20), b""):
+                    hasher.update(fileChunk)
+            self.fileHashes[fileKey] = hasher.hexdigest()
+        return self.fileHashes[fileKey]
+
+    def codeHash(self, objectType):
+        """
+        Hash the source code of a class and every class it inherits from, plus
+        its optional 'strategyVersion' and 'parameters' attributes and the
+        code the hierarchy's modules run it with (see moduleHash).
+        """
+        if objectType not in self.codeHashes:
+            classHierarchy = [parentType for parentType in inspect.getmro(objectType) if parentType is not object]
+            sourceCode = [sourceText(parentType) for parentType in classHierarchy]
+            sourceCode.append(str(getattr(objectType, "strategyVersion", "")))
+            sourceCode.append(repr(getattr(objectType, "parameters", "")))
+            for moduleName in sorted(set(parentType.__module__ for parentType in classHierarchy)):
+                sourceCode.append(self.moduleHash(moduleName))
+            self.codeHashes[objectType] = hashBytes(*[codeText.encode() for codeText in sourceCode])
+        return self.codeHashes[objectType]
+
+    def moduleHash(self, moduleName):
+        """
+        Hash the code a module's classes run with: its module-level functions,
+        its classes that do not inherit from one of its other classes (e.g.
+        supercoverTiles, Position, Boat; a strategy subclass only changes its
+        own keys) and the whole source of every repository module it uses (a
+        module in the same folder or below it, imported whole or through one
+        of its functions or classes).
+        """
+        hashKey = moduleName
+        if hashKey not in self.moduleHashes:
+            module = sys.modules.get(moduleName)
+            moduleFile = getattr(module, "__file__", None)
+            if moduleFile is None:
+                self.moduleHashes[hashKey] = moduleName
+                return self.moduleHashes[hashKey]
+            moduleFolder = os.path.dirname(os.path.abspath(moduleFile))
+            sourceCode = []; usedModules = set()
+            for valueName, value in sorted(vars(module).items()):
+                valueModule = value if inspect.ismodule(value) else inspect.getmodule(value) if inspect.isfunction(value) or inspect.isclass(value) else None
+                if valueModule is module:
+                    if not inspect.isclass(value) or not any(inspect.getmodule(parentType) is module for parentType in value.__mro__[1:]):
+                        sourceCode.append(sourceText(value))
+                elif valueModule is not None and os.path.abspath(getattr(valueModule, "__file__", None) or "/").startswith(moduleFolder + os.sep):
+                    usedModules.add(valueModule)
+            for usedModule in sorted(usedModules, key=lambda usedModule: usedModule.__name__):
+                sourceCode.append(sourceText(usedModule))
+            self.moduleHashes[hashKey] = hashBytes(*[codeText.encode() for codeText in sourceCode])
+        return self.moduleHashes[hashKey]
+
+    def tankParameters(self, waterTank):
+        """
+        Describe everything about a tank that changes a run's outcome.
+        """
+        simFile = getattr(waterTank, "simFile", None)
+        obstacleMask = getattr(waterTank, "obstacleMask", None)
+        tankParameters = {
+            "tankType": type(waterTank).__name__,
+            "tankCode": self.codeHash(type(waterTank)),
+            "tankWidth": waterTank.tankWidth,
+            "tankHeight": waterTank.tankHeight,
+            "sourceLocations": jsonValue(getattr(waterTank, "sourceLocations", None)),
+            "dataset": self.fileHash(simFile) if simFile and os.path.isfile(simFile) else None,
+            "obstacles": hashBytes(np.packbits(obstacleMask).tobytes()) if obstacleMask is not None else None,
+        }
+        # Options Only Some Tanks Have (Left Out Otherwise, so Older Keys Still Match)
+        if not getattr(waterTank, "markSweptPaths", True):
+            tankParameters["markSweptPaths"] = False
+        if hasattr(waterTank, "sensorDepths"):
+            tankParameters["sensorDepths"] = jsonValue(waterTank.sensorDepths)
+            tankParameters["depthMode"] = waterTank.depthMode
+        return tankParameters
+
+    def runKey(self, waterTank, boatType, boatLocations, boatSpeed, boatDirection, sensorDistance, numBoats, maxSteps, seed):
+        """
+        Return the key of a single strategy run.
+        """
+        keyParts = {
+            "tank": self.tankParameters(waterTank),
+            "strategy": boatType.__name__,
+            "strategyCode": self.codeHash(boatType),
+            "boatLocations": jsonValue(list(boatLocations[:numBoats])),
+            "boatSpeed": jsonValue(boatSpeed),
+            "boatDirection": jsonValue(boatDirection),
+            "sensorDistance": jsonValue(sensorDistance),
+            "numBoats": numBoats,
+            "maxSteps": maxSteps,
+            "seed": seed,
+        }
+        return hashBytes(json.dumps(keyParts, sort_keys=True).encode())
+
+    # --------------------------- Load/Store ---------------------------- #
+
+    def getFile(self, key):
+        return os.path.join(self.cacheFolder, key + ".npz")
+
+    def load(self, key):
+        """
+        Return the stored arrays for key (a dict), or None if not cached.
+        """
+        cacheFile = self.getFile(key)
+        try:
+            with np.load(cacheFile) as cachedData:
+                result = {name: cachedData[name] for name in cachedData.files}
+        except (OSError, ValueError):
+            self.numMisses += 1
+            return None
+        # Mark the Run as Recently Used
+        os.utime(cacheFile)
+        self.numHits += 1
+        return result
+
+    def store(self, key, **arrays):
+        """
+        Save the arrays under key, then trim the cache to its size limit.
+        """
+        cacheFile = self.getFile(key)
+        # Write to a Temporary File First so Readers Never See Half a File
+        tempFile = cacheFile + "." + str(os.getpid()) + ".tmp.npz"
+        np.savez(tempFile, **arrays)
+        fileSize = os.path.getsize(tempFile)
+        os.replace(tempFile, cacheFile)
+        # Only Scan the Folder When it May Have Outgrown the Limit
+        self.numStoresSinceScan += 1
+        if self.cacheBytes is None or self.numStoresSinceScan >= self.rescanEvery:
+            self.evict()
+        else:
+            self.cacheBytes += fileSize
+            if self.cacheBytes > self.maxBytes:
+                self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used runs until the cache fits in maxBytes.
+        """
+        cacheFiles = []
+        for fileName in os.listdir(self.cacheFolder):
+            if fileName.endswith(".npz") and not fileName.endswith(".tmp.npz"):
+                try:
+                    fileStats = os.stat(os.path.join(self.cacheFolder, fileName))
+                except FileNotFoundError:
+                    # Evicted by Another Process Meanwhile
+                    continue
+                cacheFiles.append((fileStats.st_mtime_ns, fileStats.st_size, fileName))
+        totalBytes = sum(fileSize for _, fileSize, _ in cacheFiles)
+        for _, fileSize, fileName in sorted(cacheFiles):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.cacheFolder, fileName))
+            except FileNotFoundError:
+                pass
+            totalBytes -= fileSize
+        self.cacheBytes = totalBytes
+        self.numStoresSinceScan = 0
@@ -0,0 +1,255 @@
+"""
+Asynchronous Sensor Sources for Hardware-in-the-Loop Runs
+
+A sensor source answers "what does this sensor read at this position". Reading
+the three sensors of a boat (or of several boats) is done concurrently, with a
+timeout and a number of retries for every reading, so a slow serial link or
+network sensor no longer serializes the run.
+
+socketSensorSource talks to a sensor over a local TCP socket using one JSON
+message per line. sensorServer is a stand-in for the hardware that answers the
+same messages from any simulated tank, so the hardware path can be tested
+offline:
+
+    server = sensorServer(cosmolSimTank(...))
+    host, port = server.startInThread()
+    waterTank = hardwareTank(sourceLocations, tankWidth, tankHeight, socketSensorSource(host, port))
+"""
+
+# Import Basic Modules
+import json
+import asyncio
+import threading
+import numpy as np
+
+
+class asyncSensorSource(object):
+    """
+    An asyncSensorSource reads sensors asynchronously.
+
+    Subclasses implement readSensor(). Every read made through readSensors()
+    or readBoats() is retried up to 'retries' times when it takes longer than
+    'timeout' seconds or the connection fails.
+    """
+    def __init__(self, timeout = 1.0, retries = 2):
+        self.timeout = timeout
+        self.retries = retries
+
+    async def connect(self):
+        """
+        Open any connection the source needs. Called once before reading.
+        """
+        pass
+
+    async def close(self):
+        pass
+
+    async def readSensor(self, position, sensorType = "Sensor"):
+        raise NotImplementedError
+
+    async def sourceFound(self):
+        """
+        Return True/False if the source can tell when the search is over
+        (e.g. an operator switch), or None if it cannot.
+        """
+        return None
+
+    async def withRetry(self, makeRequest, requestName):
+        # Try the Request Until it Succeeds or We Run Out of Retries
+        lastError = None
+        for attemptNum in range(self.retries + 1):
+            try:
+                return await asyncio.wait_for(makeRequest(), self.timeout)
+            except (asyncio.TimeoutError, ConnectionError, OSError) as requestError:
+                lastError = requestError
+        raise TimeoutError("No " + requestName + " After " + str(self.retries + 1) + " Tries: " + repr(lastError))
+
+    async def readWithRetry(self, position, sensorType = "Sensor"):
+        return await self.withRetry(lambda: self.readSensor(position, sensorType), sensorType + " Reading at " + str(tuple(position)))
+
+    async def sourceFoundWithRetry(self):
+        # Ask Like a Reading, so a Stalled Device Can Not Hang the Run
+        return await self.withRetry(self.sourceFound, "Source Found Reply")
+
+    async def readSensors(self, positions, sensorTypes):
+        """
+        Read every sensor position at the same time.
+
+        positions: a list of (x, y) sensor positions
+        sensorTypes: a list of sensor names, one per position
+        returns: a list of readings in the same order
+        """
+        return list(await asyncio.gather(*[self.readWithRetry(position, sensorType) for position, sensorType in zip(positions, sensorTypes)]))
+
+    async def readBoats(self, boatsPositions, sensorTypes = ("Front Sensor", "Left Sensor", "Right Sensor")):
+        """
+        Read the sensors of several boats at the same time.
+
+        boatsPositions: a list (one per boat) of lists of sensor positions
+        returns: a list (one per boat) of lists of readings
+        """
+        return list(await asyncio.gather(*[self.readSensors(positions, sensorTypes) for positions in boatsPositions]))
+
+
+class socketSensorSource(asyncSensorSource):
+    """
+    Reads sensors from a server over a TCP socket.
+
+    Requests and replies are single JSON lines carrying an 'id', so many reads
+    can be in flight on the same connection at once:
+        -> {"id": 1, "x": 1.0, "y": 2.0, "sensorType": "Front Sensor"}
+        <- {"id": 1, "reading": 0.5}
+    """
+    def __init__(self, host = "127.0.0.1", port = 8765, timeout = 1.0, retries = 2):
+        super().__init__(timeout, retries)
+        self.host = host
+        self.port = port
+        # Connection State (Each Connection Has its Own Map of Reads Waiting for a Reply)
+        self.reader = None
+        self.writer = None
+        self.replyTask = None
+        self.pendingReads = {}
+        self.requestID = 0
+        # Only One Read Reconnects at a Time
+        self.connectLock = asyncio.Lock()
+
+    async def connect(self):
+        # Drop Any Old Connection First (Reads Still Waiting on it Fail)
+        await self.close()
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.pendingReads = {}
+        self.replyTask = asyncio.ensure_future(self.receiveReplies(self.reader, self.pendingReads))
+
+    async def close(self):
+        if self.replyTask is not None:
+            self.replyTask.cancel()
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = self.replyTask = None
+
+    async def receiveReplies(self, reader, pendingReads):
+        # Hand Each Reply to the Read Waiting for It
+        try:
+            while True:
+                replyLine = await reader.readline()
+                if not replyLine:
+                    break
+                reply = json.loads(replyLine)
+                pendingRead = pendingReads.pop(reply.get("id"), None)
+                if pendingRead is not None and not pendingRead.done():
+                    pendingRead.set_result(reply)
+        finally:
+            # The Connection Closed: Fail Every Read Still Waiting on It
+            for pendingRead in pendingReads.values():
+                if not pendingRead.done():
+                    pendingRead.set_exception(ConnectionError("Sensor Connection Closed"))
+            pendingReads.clear()
+
+    def isConnected(self):
+        return self.writer is not None and self.replyTask is not None and not self.replyTask.done()
+
+    async def sendRequest(self, request):
+        # Reconnect if the Connection Dropped (Reads Arriving Meanwhile Wait for the New One)
+        if not self.isConnected():
+            async with self.connectLock:
+                if not self.isConnected():
+                    await self.connect()
+        writer, pendingReads = self.writer, self.pendingReads
+        self.requestID += 1
+        request["id"] = self.requestID
+        reply = asyncio.get_running_loop().create_future()
+        pendingReads[self.requestID] = reply
+        try:
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+            return await reply
+        finally:
+            # Forget Reads That Timed Out
+            pendingReads.pop(request["id"], None)
+
+    async def readSensor(self, position, sensorType = "Sensor"):
+        reply = await self.sendRequest({"x": float(position[0]), "y": float(position[1]), "sensorType": sensorType})
+        return float(reply["reading"])
+
+    async def sourceFound(self):
+        reply = await self.sendRequest({"request": "sourceFound"})
+        return reply.get("sourceFound")
+
+
+class sensorServer(object):
+    """
+    A stand-in for the sensor hardware: serves the socketSensorSource protocol
+    from any tank with a posReading() method.
+
+    readDelay: seconds to wait before each reply (to mimic a slow link)
+    """
+    def __init__(self, tank, host = "127.0.0.1", port = 0, readDelay = 0):
+        self.tank = tank
+        self.host = host
+        self.port = port
+        self.readDelay = readDelay
+        # Server State
+        self.server = None
+        self.loop = None
+        self.thread = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handleClient, self.host, self.port)
+        # Find the Port if the System Picked One
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.host, self.port
+
+    async def handleClient(self, reader, writer):
+        replyTasks = set()
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    break
+                # Answer Requests Concurrently, in Whatever Order They Finish
+                replyTask = asyncio.ensure_future(self.answerRequest(json.loads(requestLine), writer))
+                replyTasks.add(replyTask)
+                replyTask.add_done_callback(replyTasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            for replyTask in replyTasks:
+                replyTask.cancel()
+            writer.close()
+
+    async def answerRequest(self, request, writer):
+        if self.readDelay:
+            await asyncio.sleep(self.readDelay)
+        if request.get("request") == "sourceFound":
+            reply = {"id": request["id"], "sourceFound": None}
+        else:
+            reading = self.tank.posReading((request["x"], request["y"]), sensorType = request.get("sensorType", "Sensor"))
+            reply = {"id": request["id"], "reading": float(np.squeeze(reading))}
+        writer.write((json.dumps(reply) + "\n").encode())
+        await writer.drain()
+
+    def startInThread(self):
+        """
+        Run the server on its own event loop in a background thread.
+
+        returns: the (host, port) the server listens on
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        return asyncio.run_coroutine_threadsafe(self.start(), self.loop).result()
+
+    async def shutdown(self):
+        self.server.close()
+
+    def stop(self):
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+        self.server = self.loop = self.thread = None
@@ -0,0 +1,77 @@
+"""
+Compact Binary Logs of Sensor Sessions
+
+A session log stores every (position, sensorType, reading) a tank answered, so
+a live or simulated session can be replayed later (see replayTank). The file is
+    b"BOATLOG1" | header length (uint32) | JSON header | records
+where the JSON header holds the tank parameters and every record is a fixed
+25-byte entry of recordType.
+"""
+
+# Import Basic Modules
+import json
+import struct
+import numpy as np
+
+# File Layout
+LOG_MAGIC = b"BOATLOG1"
+recordType = np.dtype([('x', '<f8'), ('y', '<f8'), ('sensor', 'u1'), ('reading', '<f8')])
+# Sensor Names are Stored as a Single Byte
+sensorTypes = ["Sensor", "Front Sensor", "Left Sensor", "Right Sensor"]
+
+
+def sensorCode(sensorType):
+    # Unknown Sensor Names Share the Generic Code
+    return sensorTypes.index(sensorType) if sensorType in sensorTypes else 0
+
+
+class sessionLogWriter(object):
+    """
+    Appends sensor readings to a session log as they happen.
+    """
+    def __init__(self, logFile, header = None):
+        """
+        logFile: the path of the log to create (overwritten if it exists)
+        header: a JSON-serializable dict with the session parameters
+        """
+        self.logFile = logFile
+        self.numRecords = 0
+        # Write the File Header
+        headerBytes = json.dumps(header or {}).encode()
+        self.outFile = open(logFile, "wb")
+        self.outFile.write(LOG_MAGIC + struct.pack("<I", len(headerBytes)) + headerBytes)
+
+    def writeReadings(self, positions, sensorNames, readings):
+        """
+        Append one record per reading and flush, so a crashed session keeps
+        every reading made before the crash.
+        """
+        records = np.zeros(len(readings), dtype=recordType)
+        records['x'] = [position[0] for position in positions]
+        records['y'] = [position[1] for position in positions]
+        records['sensor'] = [sensorCode(sensorName) for sensorName in sensorNames]
+        records['reading'] = [float(np.squeeze(reading)) for reading in readings]
+        self.outFile.write(records.tobytes())
+        self.outFile.flush()
+        self.numRecords += len(records)
+
+    def close(self):
+        if not self.outFile.closed:
+            self.outFile.close()
+
+
+def readSessionLog(logFile):
+    """
+    Load a session log.
+
+    returns: the header dict and a structured array of recordType
+    """
+    with open(logFile, "rb") as inFile:
+        if inFile.read(len(LOG_MAGIC)) != LOG_MAGIC:
+            raise ValueError("Not a Session Log: " + str(logFile))
+        headerLength, = struct.unpack("<I", inFile.read(4))
+        header = json.loads(inFile.read(headerLength).decode())
+        recordBytes = inFile.read()
+    # Ignore a Partly Written Last Record
+    numRecords = len(recordBytes)//recordType.itemsize
+    return header, np.frombuffer(recordBytes[:numRecords*recordType.itemsize], dtype=recordType)
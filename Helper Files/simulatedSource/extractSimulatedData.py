@@ -106,8 +106,18 @@ class processData(dataProcessing):
         # Loop Through the Info Section and Extract the Needed Run Info from Excel
         rowGenerator = xlWorksheet.rows
         for i,cell in enumerate(rowGenerator):
+            # CSV Exports are Stored as Text: Keep Rows that Parse as Numbers (Barrier Cells are 'NaN')
+            if type(cell[0].value) == str:
+                try:
+                    rowValues = [float(cellVal.value) for cellVal in cell]
+                except (TypeError, ValueError):
+                    continue
+                x.append(rowValues[0])
+                z.append(rowValues[1])
+                # CSV Exports Only Have x,y,c Columns
+                concentrations.append(rowValues[min(zCol, len(rowValues) - 1)])
 
-            if type(cell[0].value) == type(yVal):
+            elif type(cell[0].value) == type(yVal):
                 x.append(float(cell[0].value))
                 z.append(float(cell[1].value))
                 concentrations.append(float(cell[zCol].value))
@@ -133,13 +143,29 @@ class processData(dataProcessing):
         return x, z, concentrations
     
     
-    def getData(self, oldFile, testSheetNum = 0, excelDelimiter = "fixedWidth", yVal = 0.025, zCol = 3):
+    def extractCosmolVolume(self, xlWorksheet, valueCol = 3):
         """
-        --------------------------------------------------------------------------
-        Input Variable Definitions:
-            excelFile: The Path to the Excel File Containing the Data
-            testSheetNum: An Integer Representing the Excel Worksheet (0-indexed) Order.
-        --------------------------------------------------------------------------
+        Extract every x, y, z, value row (all planes of a 3D export). Header,
+        text and barrier ('NaN' coordinate) rows are skipped.
+        """
+        x = []; y = []; z = []; values = []
+        for cell in xlWorksheet.rows:
+            if len(cell) <= valueCol:
+                continue
+            try:
+                rowValues = [float(cellVal.value) for cellVal in cell[0:3]] + [float(cell[valueCol].value)]
+            except (TypeError, ValueError):
+                continue
+            if np.isnan(rowValues[0:3]).any():
+                continue
+            x.append(rowValues[0]); y.append(rowValues[1]); z.append(rowValues[2])
+            values.append(rowValues[3])
+        return x, y, z, values
+    
+    def openWorksheet(self, oldFile, testSheetNum = 0, excelDelimiter = "fixedWidth"):
+        """
+        Return the workbook and worksheet of a data file, converting TXT and
+        CSV files to XLSX first.
         """
         # Check if File Exists
         if not os.path.exists(oldFile):
@@ -168,6 +194,17 @@ class processData(dataProcessing):
             print("The Following File is Neither CSV, TXT, Nor XLSX:", oldFile)
             sys.exit()
         print("Extracting Data from the Excel File:", excelFile)
+        return xlWorkbook, xlWorksheet
+    
+    def getData(self, oldFile, testSheetNum = 0, excelDelimiter = "fixedWidth", yVal = 0.025, zCol = 3):
+        """
+        --------------------------------------------------------------------------
+        Input Variable Definitions:
+            excelFile: The Path to the Excel File Containing the Data
+            testSheetNum: An Integer Representing the Excel Worksheet (0-indexed) Order.
+        --------------------------------------------------------------------------
+        """
+        xlWorkbook, xlWorksheet = self.openWorksheet(oldFile, testSheetNum, excelDelimiter)
         
         # Extract Time and Current Data from the File
         xPoints, zPoints, concentrations = self.extractCosmolData(xlWorksheet, yVal, zCol)
@@ -176,6 +213,22 @@ class processData(dataProcessing):
         # Finished Data Collection: Close Workbook and Return Data to User
         print("Done Collecting Data");
         return np.array(xPoints), np.array(zPoints), np.array(concentrations)
+    
+    def getVolumeData(self, oldFile, testSheetNum = 0, excelDelimiter = "fixedWidth", valueCol = 3):
+        """
+        Load every plane of a 3D export (x, y, z, value columns).
+
+        returns: arrays of the x, y, z coordinates and the values
+        """
+        xlWorkbook, xlWorksheet = self.openWorksheet(oldFile, testSheetNum, excelDelimiter)
+        xPoints, yPoints, zPoints, values = self.extractCosmolVolume(xlWorksheet, valueCol)
+        
+        xlWorkbook.close()
+        # A 2D Export (x, y, value) Has No Depth Column to Read
+        if len(values) == 0:
+            raise ValueError("No x, y, z, value Rows (Column " + str(valueCol + 1) + " Holding the Values) in " + str(oldFile) + ": Is it a 3D Export?")
+        print("Done Collecting Data");
+        return np.array(xPoints), np.array(yPoints), np.array(zPoints), np.array(values)
 
 
 if __name__ == "__main__":
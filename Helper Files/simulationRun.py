@@ -0,0 +1,153 @@
+"""
+Simulation Runs That Can be Snapshotted, Restored and Forked
+
+A simulationRun steps one strategy through a tank like runStrategy does, but
+its full state can be saved at any step: the tank's visited tiles, every
+boat (kinematics, recent readings, belief map), the path so far and the
+random number generators. To compare strategies that only differ late in a
+run, simulate the shared prefix once and fork it:
+
+    strategyRun = simulationRun(waterTank, AStar, boatLocations, ...)
+    strategyRun.runToEnd(maxSteps = 20)     # The Shared Prefix
+    results = strategyRun.fork([AStar, AStar.withParameters(blendAngle = 45)])
+
+Each variant continues from the same state and only the suffix is simulated.
+Tanks that read real sensors (hardwareTank) cannot be rewound.
+
+With useMacroSteps(), a run crosses flat parts of the field (e.g. the long
+approach far from the source) in legs: after a normal step finds the field
+flat around every boat, the boats coast straight for up to macroLength-1 more
+steps without sensing. macroLength doubles while the field stays flat (up to
+maxMacroSteps) and drops back to 1 when it is not. Coasting steps still mark
+the tiles and the source is checked before each of them.
+"""
+
+# Import Basic Modules
+import random
+import numpy as np
+
+
+class simulationRun(object):
+    """
+    One strategy's run: numBoats boats of boatType moving until the source
+    is found or maxSteps time-steps have passed.
+    """
+    def __init__(self, waterTank, boatType, boatLocations, boatSpeed, boatDirection, sensorDistance, numBoats = 1, maxSteps = 40, seed = None):
+        """
+        seed: the seed for Python's random module (None = leave it as is)
+        """
+        if seed is not None:
+            random.seed(seed)
+        waterTank.reinitialize()
+        self.waterTank = waterTank
+        self.maxSteps = maxSteps
+
+        # Add the Boats to the Tank
+        self.boats = []
+        for boatNum in range(numBoats):
+            self.boats.append(boatType(waterTank, boatSpeed, boatLocations[boatNum], boatDirection, sensorDistance))
+
+        self.positions = {'x':[self.boats[0].position.x], 'y':[self.boats[0].position.y]}
+        self.timeSteps = 0.0
+        # Coast Through Flat Fields (maxMacroSteps = 1: Sense Every Step)
+        self.maxMacroSteps = 1
+        self.flatTolerance = 1E-6
+        self.macroLength = 1
+        self.numCoastSteps = 0
+
+    def useMacroSteps(self, maxMacroSteps = 8, flatTolerance = 1E-6):
+        """
+        Cross flat parts of the field in legs of up to maxMacroSteps steps,
+        sensing only at the start of each leg (see fieldIsFlat for flatTolerance).
+        """
+        self.maxMacroSteps = max(1, int(maxMacroSteps))
+        self.flatTolerance = flatTolerance
+        self.macroLength = 1
+
+    def step(self, coastStraight = False):
+        # Move Each Boat
+        for boat in self.boats:
+            if coastStraight:
+                boat.coastStraight()
+            else:
+                boat.updatePosition()
+        # Record the Path of the Last Boat
+        self.positions['x'].append(boat.position.x)
+        self.positions['y'].append(boat.position.y)
+        self.timeSteps += 1
+        self.numCoastSteps += coastStraight
+
+    def runToEnd(self, maxSteps = None):
+        """
+        Step until the source is found or maxSteps (default: the run's
+        maxSteps) time-steps have passed in total. A run stopped early by
+        maxSteps can be continued with a larger one.
+        """
+        # Always Take a Step Unless the Source is Already Found (as runStrategy Always Did)
+        maxSteps = max(self.maxSteps if maxSteps is None else maxSteps, 1)
+        while self.timeSteps < maxSteps:
+            if self.waterTank.sourceFound():
+                break
+            self.step()
+            if self.maxMacroSteps > 1:
+                self.coastFlatLeg(maxSteps)
+
+    def coastFlatLeg(self, maxSteps):
+        # Lengthen the Legs While the Field Stays Flat Around Every Boat
+        if not all(boat.fieldIsFlat(self.flatTolerance) for boat in self.boats):
+            self.macroLength = 1
+            return
+        for _ in range(self.macroLength - 1):
+            if self.timeSteps >= maxSteps or self.waterTank.sourceFound():
+                return
+            self.step(coastStraight = True)
+        self.macroLength = min(2*self.macroLength, self.maxMacroSteps)
+
+    def getResults(self):
+        """
+        returns: the path of the last boat ({'x': [...], 'y': [...]}) and the
+            number of time-steps taken
+        """
+        return self.positions, self.timeSteps
+
+    def snapshot(self):
+        """
+        Return a copy of the run's full state (see restore).
+        """
+        return {'tank': self.waterTank.getState(),
+                'boatTypes': [type(boat) for boat in self.boats],
+                'boats': [boat.getState() for boat in self.boats],
+                'positions': {'x': list(self.positions['x']), 'y': list(self.positions['y'])},
+                'timeSteps': self.timeSteps, 'macroLength': self.macroLength,
+                'randomState': random.getstate(), 'numpyRandomState': np.random.get_state()}
+
+    def restore(self, runState, boatType = None):
+        """
+        Put the run (and its tank and random generators) back to a snapshot.
+
+        boatType: continue with this strategy instead of the snapshot's
+        """
+        self.waterTank.setState(runState['tank'])
+        boatTypes = runState['boatTypes'] if boatType is None else [boatType]*len(runState['boats'])
+        self.boats = [boatTypes[boatNum].fromState(self.waterTank, boatState) for boatNum, boatState in enumerate(runState['boats'])]
+        self.positions = {'x': list(runState['positions']['x']), 'y': list(runState['positions']['y'])}
+        self.timeSteps = runState['timeSteps']
+        self.macroLength = runState['macroLength']
+        random.setstate(runState['randomState'])
+        np.random.set_state(runState['numpyRandomState'])
+
+    def fork(self, boatTypes, maxSteps = None):
+        """
+        Continue the run from its current state once per strategy in
+        boatTypes (None = the run's own). The run itself is left unchanged.
+
+        returns: the results (see getResults) of each variant
+        """
+        forkState = self.snapshot()
+        variantResults = []
+        for boatType in boatTypes:
+            self.restore(forkState, boatType)
+            self.runToEnd(maxSteps)
+            variantResults.append(self.getResults())
+        self.restore(forkState)
+        return variantResults
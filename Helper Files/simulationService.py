@@ -0,0 +1,213 @@
+"""
+Local Simulation Service with Warm Tanks
+
+A simulationService is a small HTTP server (on localhost) that keeps tanks
+loaded between requests, so a notebook or tool pays for importing the code,
+parsing the data and triangulating it once instead of on every call.
+
+    GET  /tanks           the warm tanks and their sources
+    POST /tanks           {"name": ..., "tankType": ..., "arguments": {...}} loads a tank
+    POST /run             one run; the result as JSON
+    POST /sweep           many runs; one JSON line per run, streamed as each finishes
+
+Runs and sweeps name a warm tank ("tank": name) and otherwise take the fields
+of workQueue.sweepJobs (strategy/strategies, parameters/parameterSets,
+startPoint/startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps,
+seed). Start it with:
+
+    python "Helper Files/simulationService.py" [port]
+
+and call it with requestService(), e.g.
+
+    for runResult in requestService('/sweep', {'tank': 'twoDrop', 'strategies': ['AStar'], 'startPoints': [[5, 5], [30, 35]]}):
+        ...
+"""
+
+# Import Basic Modules
+import sys
+import json
+import threading
+import http.client
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+# Import the Simulation
+import workQueue
+from resultCache import jsonValue
+
+# The Boat Settings Used When a Request Leaves Them Out
+defaultRunSettings = {'boatSpeed': 2, 'boatDirection': [1, 1], 'sensorDistance': 1.6, 'maxSteps': 40, 'seed': 0, 'parameters': {}}
+
+
+class simulationService(object):
+    """
+    Keeps named tanks warm and runs strategies on them for HTTP requests.
+    Runs take turns: a run changes its tank's visited tiles and reseeds the
+    global random generators.
+    """
+    def __init__(self, address = ('localhost', 8765), tankSpecs = None):
+        """
+        tankSpecs: a dict from tank name to a tank spec (see workQueue.sweepJobs)
+            to load before serving
+        """
+        self.tankSpecs = {}
+        self.tanks = {}         # Shared with workQueue.runJob: Tank Spec -> Tank
+        self.tankLocks = {}     # Held While a Tank Loads
+        self.registryLock = threading.Lock()
+        self.runLock = threading.Lock()
+        for tankName, tankSpec in (tankSpecs or {}).items():
+            self.addTank(tankName, tankSpec)
+        self.server = ThreadingHTTPServer(address, serviceRequestHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self.address = self.server.server_address
+
+    def addTank(self, tankName, tankSpec):
+        """
+        Load a tank (once) and make it available as tankName.
+        """
+        tankSpec = {'tankType': tankSpec['tankType'], 'arguments': tankSpec.get('arguments', {})}
+        with self.registryLock:
+            tankLock = self.tankLocks.setdefault(repr(tankSpec), threading.Lock())
+        with tankLock:
+            if repr(tankSpec) not in self.tanks:
+                self.tanks[repr(tankSpec)] = workQueue.buildTank(tankSpec)
+        with self.registryLock:
+            self.tankSpecs[tankName] = tankSpec
+        return self.tanks[repr(tankSpec)]
+
+    def describeTanks(self):
+        with self.registryLock:
+            tankSpecs = dict(self.tankSpecs)
+        return {tankName: {'tankType': tankSpec['tankType'], 'sourceLocations': jsonValue(getattr(self.tanks[repr(tankSpec)], 'sourceLocations', None))}
+                for tankName, tankSpec in tankSpecs.items()}
+
+    def requestJobs(self, request, isSweep):
+        # Fill In the Defaults and Name the Warm Tank
+        with self.registryLock:
+            tankSpec = self.tankSpecs.get(request.get('tank'))
+            if tankSpec is None:
+                raise KeyError("Unknown Tank: " + str(request.get('tank')) + " (Warm Tanks: " + ", ".join(self.tankSpecs) + ")")
+        runSettings = dict(defaultRunSettings, **request)
+        strategyNames = runSettings['strategies'] if isSweep else [runSettings['strategy']]
+        startPoints = runSettings['startPoints'] if isSweep else [runSettings['startPoint']]
+        parameterSets = runSettings.get('parameterSets', [runSettings['parameters']])
+        return workQueue.sweepJobs(tankSpec, startPoints, strategyNames, runSettings['boatSpeed'], runSettings['boatDirection'],
+                                   runSettings['sensorDistance'], parameterSets, runSettings['maxSteps'], runSettings['seed'])
+
+    def runJobs(self, jobs):
+        """
+        Run jobs on the warm tanks, yielding each result as it finishes.
+        """
+        for job in jobs:
+            with self.runLock:
+                runResult = workQueue.runJob(job, self.tanks)
+            yield dict(strategy = job['strategy'], parameters = job['parameters'], startPoint = job['startPoint'], **runResult)
+
+    def serveForever(self):
+        print("Serving Simulations at http://" + self.address[0] + ":" + str(self.address[1]))
+        self.server.serve_forever()
+
+    def start(self):
+        """
+        Serve from a background thread (e.g. inside a notebook).
+        """
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class serviceRequestHandler(BaseHTTPRequestHandler):
+    # Keep Connections Open and Stream Sweeps in Chunks
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def sendJSON(self, value, statusCode = 200):
+        responseBody = json.dumps(jsonValue(value)).encode()
+        self.send_response(statusCode)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(responseBody)))
+        self.end_headers()
+        self.wfile.write(responseBody)
+
+    def do_GET(self):
+        if self.path == '/tanks':
+            self.sendJSON(self.server.service.describeTanks())
+        else:
+            self.sendJSON({'error': "Unknown Path: " + self.path}, 404)
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+            if self.path == '/tanks':
+                service.addTank(request['name'], request)
+                self.sendJSON(service.describeTanks())
+            elif self.path == '/run':
+                self.sendJSON(next(service.runJobs(service.requestJobs(request, isSweep = False))))
+            elif self.path == '/sweep':
+                jobs = service.requestJobs(request, isSweep = True)
+                self.streamResults(service.runJobs(jobs))
+            else:
+                self.sendJSON({'error': "Unknown Path: " + self.path}, 404)
+        except Exception as error:
+            self.sendJSON({'error': type(error).__name__ + ": " + str(error)}, 400)
+
+    def streamResults(self, runResults):
+        # One JSON Line per Run, Sent as Soon as it Finishes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for runResult in runResults:
+                self.writeChunk(json.dumps(jsonValue(runResult)).encode() + b"\n")
+        except Exception as error:
+            # The Status is Already Sent: End the Stream With the Error
+            self.writeChunk(json.dumps({'error': type(error).__name__ + ": " + str(error)}).encode() + b"\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def writeChunk(self, chunkBytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(chunkBytes), chunkBytes))
+        self.wfile.flush()
+
+
+def requestService(path, payload = None, address = ('localhost', 8765), timeout = None):
+    """
+    Call a simulationService. GET if payload is None, else POST it as JSON.
+
+    returns: the JSON reply, or (for /sweep) a generator of the streamed runs
+    """
+    connection = http.client.HTTPConnection(address[0], address[1], timeout=timeout)
+    if payload is None:
+        connection.request("GET", path)
+    else:
+        connection.request("POST", path, body=json.dumps(jsonValue(payload)), headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    if response.getheader("Content-Type") != "application/x-ndjson":
+        reply = json.loads(response.read())
+        connection.close()
+        return reply
+    def streamedRuns():
+        try:
+            for resultLine in response:
+                yield json.loads(resultLine)
+        finally:
+            connection.close()
+    return streamedRuns()
+
+
+if __name__ == "__main__":
+    # Serve the Repository's Datasets: python simulationService.py [port]
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    dataFolder = './Helper Files/simulatedSource/Input Data/Excel Files/'
+    service = simulationService(('localhost', port), {
+        'twoDrop': {'tankType': 'cosmolSimTank', 'arguments': {'sourceLocations': [(20, 20), (15, 27)], 'tankWidth': 40, 'tankHeight': 40,
+                                                               'simFile': dataFolder + 'diffusion_two_drop_4M_0speed_2.xlsx'}},
+    })
+    service.serveForever()
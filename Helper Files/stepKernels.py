@@ -0,0 +1,329 @@
+"""
+Compiled Step Kernels for the Built-In Strategies
+
+The strategies gradientDescent, maxDirection and weightedMaxDirection (and
+Boat.updateBoat's move along a heading) are written here as plain loops over
+arrays of boat states: x, y, heading and speed per boat. Sensing reads the
+tank's rasterized field (rasterizeField) by bilinear interpolation, so a step
+needs no Python objects. With numba installed the kernels are compiled (and
+cached on disk); without it they run as ordinary Python.
+
+runKernelSweep() runs every start point of a strategy at once with the
+kernels and returns the same results table as sweepEngine.runStartSweep().
+Strategies, tanks or settings the kernels do not cover (obstacles, a reading
+cache, a recorded session, subclasses that change how a step is taken) run
+through the Python classes instead, on the same rasterized field.
+
+validateKernels() checks the kernels against the Python classes: both read
+the rasterized field (the tank's readRaster) and the paths are compared.
+"""
+
+# Import Basic Modules
+import math
+import numpy as np
+# Import the Simulation
+import objectParameters
+import sweepEngine
+
+# Compile the Kernels When numba is Installed
+try:
+    import numba
+    jitKernel = numba.njit(cache=True)
+    usingNumba = True
+except ImportError:
+    def jitKernel(kernelFunction):
+        return kernelFunction
+    usingNumba = False
+
+# The Strategies With a Kernel (Their Position is the Kernel's Strategy Number)
+kernelStrategies = (objectParameters.gradientDescent, objectParameters.maxDirection, objectParameters.weightedMaxDirection)
+# Methods a Strategy Must Not Override for its Kernel to Match it
+kernelMethods = ('__init__', 'updatePosition', 'getNewDirection', 'getSensorPoints', 'getSensorsPos', 'getAngle',
+                 'getGradient', 'slowOnTurns', 'updateBoat')
+
+
+# --------------------------------------------------------------------------- #
+#                                  Kernels                                    #
+# --------------------------------------------------------------------------- #
+
+@jitKernel
+def fieldValue(fieldGrid, scaleTiles, x, y):
+    # gridInterpolation.bilinearInterpolate for One Position
+    xGrid = min(max(x*scaleTiles, 0.0), fieldGrid.shape[0] - 1.0)
+    yGrid = min(max(y*scaleTiles, 0.0), fieldGrid.shape[1] - 1.0)
+    xIndex = min(int(xGrid), fieldGrid.shape[0] - 2)
+    yIndex = min(int(yGrid), fieldGrid.shape[1] - 2)
+    xFrac = xGrid - xIndex; yFrac = yGrid - yIndex
+    return (fieldGrid[xIndex, yIndex]*(1 - xFrac)*(1 - yFrac) + fieldGrid[xIndex + 1, yIndex]*xFrac*(1 - yFrac)
+            + fieldGrid[xIndex, yIndex + 1]*(1 - xFrac)*yFrac + fieldGrid[xIndex + 1, yIndex + 1]*xFrac*yFrac)
+
+@jitKernel
+def directionAngle(directionX, directionY, referenceX, referenceY):
+    # Boat.getAngle: the Angle of a Direction from the Reference (0 <= Angle < 360)
+    referenceNorm = math.sqrt(referenceX*referenceX + referenceY*referenceY)
+    directionNorm = math.sqrt(directionX*directionX + directionY*directionY)
+    dotProduct = (directionX/directionNorm)*(referenceX/referenceNorm) + (directionY/directionNorm)*(referenceY/referenceNorm)
+    # Round to 10 Digits the Way np.round Does
+    newAngle = np.degrees(np.arccos(np.rint(dotProduct*1E10)/1E10))
+    if directionY < 0:
+        newAngle = 360 - newAngle
+    return newAngle
+
+@jitKernel
+def senseBoat(fieldGrid, scaleTiles, x, y, directionX, directionY, sensorDistance, sensorAngle, sensorPoints):
+    # Boat.getSensorPoints: Fill the (x, y, Reading) Rows of the Front, Left and Right Sensors
+    boatAngle = directionAngle(directionX, directionY, 1.0, 0.0)
+    for sensorNum in range(3):
+        pointAngle = boatAngle + (0.0, sensorAngle, -sensorAngle)[sensorNum]
+        sensorPoints[sensorNum, 0] = x + sensorDistance*math.cos(math.radians(pointAngle))
+        sensorPoints[sensorNum, 1] = y + sensorDistance*math.sin(math.radians(pointAngle))
+        sensorPoints[sensorNum, 2] = max(0.0, fieldValue(fieldGrid, scaleTiles, sensorPoints[sensorNum, 0], sensorPoints[sensorNum, 1]))
+
+@jitKernel
+def strategyDirection(strategyNum, sensorPoints, x, y, directionX, directionY):
+    # The Strategy's getNewDirection From its Sensor Points
+    frontPoint, leftPoint, rightPoint = sensorPoints[0], sensorPoints[1], sensorPoints[2]
+    if strategyNum == 0:
+        # gradientDescent: the Plane Through the Three Points (AStar.getGradient)
+        firstX = frontPoint[0] - leftPoint[0]; firstY = frontPoint[1] - leftPoint[1]; firstZ = frontPoint[2] - leftPoint[2]
+        secondX = rightPoint[0] - leftPoint[0]; secondY = rightPoint[1] - leftPoint[1]; secondZ = rightPoint[2] - leftPoint[2]
+        normalZ = firstX*secondY - firstY*secondX
+        normalSign = 1.0 if normalZ < 0 else -1.0
+        newX = (firstY*secondZ - firstZ*secondY)*normalSign
+        newY = (firstZ*secondX - firstX*secondZ)*normalSign
+    elif strategyNum == 1:
+        # maxDirection: Towards the Highest Reading (the First on Ties)
+        bestPoint = 0
+        for sensorNum in range(1, 3):
+            if sensorPoints[sensorNum, 2] > sensorPoints[bestPoint, 2]:
+                bestPoint = sensorNum
+        newX = sensorPoints[bestPoint, 0] - x; newY = sensorPoints[bestPoint, 1] - y
+    else:
+        # weightedMaxDirection: Each Sensor's Offset Weighted by its Reading
+        newX = 0.0; newY = 0.0
+        for sensorNum in range(3):
+            newX += (sensorPoints[sensorNum, 0] - x)*sensorPoints[sensorNum, 2]
+            newY += (sensorPoints[sensorNum, 1] - y)*sensorPoints[sensorNum, 2]
+    # If Completely Unsure, Go Straight
+    directionNorm = math.sqrt(newX*newX + newY*newY)
+    if directionNorm == 0:
+        if strategyNum != 0:
+            return directionX, directionY
+        newX = directionX; newY = directionY
+        directionNorm = math.sqrt(newX*newX + newY*newY)
+    return newX/directionNorm, newY/directionNorm
+
+@jitKernel
+def clampMove(x, y, tankWidth, tankHeight, tankBuffer, clampBuffer):
+    # rectangularTank.resolveMove Without Obstacles
+    if not ((tankBuffer <= x < tankWidth - tankBuffer) and (tankBuffer <= y < tankHeight - tankBuffer)):
+        x = max(clampBuffer, min(x, tankWidth - clampBuffer))
+        y = max(clampBuffer, min(y, tankHeight - clampBuffer))
+    return x, y
+
+@jitKernel
+def moveBoat(x, y, newX, newY, boatSpeed, sensorDistance, tankWidth, tankHeight):
+    # Boat.updateBoat: Move One Step Along (newX, newY), Turning Around at the Walls
+    newAngle = directionAngle(newX, newY, 1.0, 0.0)
+    targetX = x + boatSpeed*math.cos(math.radians(newAngle)); targetY = y + boatSpeed*math.sin(math.radians(newAngle))
+    candidateX, candidateY = clampMove(targetX, targetY, tankWidth, tankHeight, sensorDistance/2, sensorDistance)
+    # If We are NOT Moving, Turn Around
+    if x == candidateX and y == candidateY:
+        newAngle = (newAngle + 180) % 360
+        newX = math.cos(math.radians(newAngle)); newY = math.sin(math.radians(newAngle))
+        targetX = x + boatSpeed*math.cos(math.radians(newAngle)); targetY = y + boatSpeed*math.sin(math.radians(newAngle))
+        candidateX, candidateY = clampMove(targetX, targetY, tankWidth, tankHeight, sensorDistance/2, sensorDistance)
+    # Head Where the Boat Actually Went if the Move was Bounded
+    if candidateX != targetX or candidateY != targetY:
+        if candidateX - x != 0 or candidateY - y != 0:
+            newX = candidateX - x; newY = candidateY - y
+        else:
+            newX = math.cos(math.radians(newAngle)); newY = math.sin(math.radians(newAngle))
+    directionNorm = math.sqrt(newX*newX + newY*newY)
+    return candidateX, candidateY, newX/directionNorm, newY/directionNorm
+
+@jitKernel
+def stepBoats(strategyNum, fieldGrid, scaleTiles, tankWidth, tankHeight, boatStates, isMoving, sensorDistance, sensorAngle,
+              maxSpeed, turnSlowAngle, turnSpeedFactor):
+    """
+    Take one time-step for every moving boat. boatStates has one (x, y,
+    headingX, headingY, speed) row per boat and is updated in place.
+    turnSlowAngle: NaN to never slow down (gradientDescent only)
+    """
+    sensorPoints = np.empty((3, 3))
+    for boatNum in range(boatStates.shape[0]):
+        if not isMoving[boatNum]:
+            continue
+        x, y, directionX, directionY, boatSpeed = boatStates[boatNum]
+        senseBoat(fieldGrid, scaleTiles, x, y, directionX, directionY, sensorDistance, sensorAngle, sensorPoints)
+        newX, newY = strategyDirection(strategyNum, sensorPoints, x, y, directionX, directionY)
+        # Slow Down for Sharp Turns (AStar.slowOnTurns)
+        if strategyNum == 0:
+            if directionAngle(newX, newY, directionX, directionY) > turnSlowAngle:
+                boatSpeed = boatSpeed*turnSpeedFactor
+            else:
+                boatSpeed = maxSpeed
+        x, y, directionX, directionY = moveBoat(x, y, newX, newY, boatSpeed, sensorDistance, tankWidth, tankHeight)
+        boatStates[boatNum, 0] = x; boatStates[boatNum, 1] = y
+        boatStates[boatNum, 2] = directionX; boatStates[boatNum, 3] = directionY
+        boatStates[boatNum, 4] = boatSpeed
+
+
+# --------------------------------------------------------------------------- #
+#                                  Runs                                       #
+# --------------------------------------------------------------------------- #
+
+def kernelStrategy(boatType):
+    """
+    Return the kernel's strategy number for boatType, or None if no kernel
+    takes its steps the same way.
+    """
+    for strategyNum, strategyType in enumerate(kernelStrategies):
+        if issubclass(boatType, strategyType) and not getattr(boatType, 'useGradientOracle', False) \
+                and all(getattr(boatType, methodName, None) is getattr(strategyType, methodName, None) for methodName in kernelMethods):
+            return strategyNum
+    return None
+
+def kernelTank(waterTank):
+    # Tanks Whose Sensors the Kernels Read: a Rasterized Field, No Obstacles, Nothing Watching the Readings
+    return (isinstance(waterTank, objectParameters.cosmolSimTank) and waterTank.obstacleSDF is None
+            and waterTank.readingCache is None and waterTank.sessionLog is None)
+
+def sourceZone(waterTank):
+    """
+    Return which tiles find the source when visited: tile (i, j) is True if
+    the tank's sourceFound() is True with only that tile visited.
+    """
+    visitedTiles = waterTank.tiles.copy()
+    foundTiles = np.zeros(waterTank.tiles.shape, dtype=bool)
+    for tileX, tileY in np.ndindex(*waterTank.tiles.shape):
+        waterTank.tiles.fill(False)
+        waterTank.tiles[tileX, tileY] = True
+        foundTiles[tileX, tileY] = waterTank.sourceFound()
+    waterTank.tiles[:] = visitedTiles
+    return foundTiles
+
+def touchesZone(foundTiles, startX, startY, endX, endY, markSweptPaths = True):
+    # Return Which Moves Visit a Tile That Finds the Source (Marked as rectangularTank.markPath Does)
+    if markSweptPaths:
+        tileX, tileY, segmentNums = objectParameters.supercoverTiles(startX, startY, endX, endY, returnSegments = True)
+    else:
+        tileX, tileY, segmentNums = np.floor(endX).astype(int), np.floor(endY).astype(int), np.arange(len(endX))
+    onTiles = (0 <= tileX) & (tileX < foundTiles.shape[0]) & (0 <= tileY) & (tileY < foundTiles.shape[1])
+    reachesSource = np.zeros(len(startX), dtype=bool)
+    reachesSource[segmentNums[onTiles][foundTiles[tileX[onTiles], tileY[onTiles]]]] = True
+    return reachesSource
+
+def runKernelStrategy(waterTank, boatType, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps = 40, scaleTiles = 10):
+    """
+    Run one boat of boatType from every start point at once with the kernels
+    (see kernelStrategy and kernelTank for what they cover).
+
+    returns: one sweepEngine.runMergedStrategy() result per start point
+    """
+    strategyNum = kernelStrategy(boatType)
+    fieldGrid = np.ascontiguousarray(waterTank.rasterizeField(scaleTiles), dtype=float)
+    foundTiles = sourceZone(waterTank)
+    parameters = boatType.parameters
+    turnSlowAngle = np.nan if parameters.turnSlowAngle is None else float(parameters.turnSlowAngle)
+
+    # Every Boat's (x, y, Heading, Speed), Like a New Boat's
+    startPoints = np.asarray(startPoints, dtype=float).reshape(-1, 2)
+    numBoats = len(startPoints)
+    boatStates = np.zeros((numBoats, 5))
+    boatStates[:,0:2] = startPoints; boatStates[:,2:4] = boatDirection; boatStates[:,4] = boatSpeed
+    boatPaths = [startPoints.copy()]
+    # The Start Tile is Visited When the Boat is Placed
+    sourceFound = touchesZone(foundTiles, startPoints[:,0], startPoints[:,1], startPoints[:,0], startPoints[:,1], markSweptPaths = False)
+    isMoving = ~sourceFound
+    timeSteps = np.zeros(numBoats, dtype=int)
+    # Always Take a Step Unless the Source is Already Found (as runStrategy Does)
+    for _ in range(max(maxSteps, 1)):
+        if not isMoving.any():
+            break
+        lastPositions = boatStates[:,0:2].copy()
+        stepBoats(strategyNum, fieldGrid, float(scaleTiles), float(waterTank.tankWidth), float(waterTank.tankHeight), boatStates, isMoving,
+                  float(sensorDistance), float(parameters.sensorAngle), float(boatSpeed), turnSlowAngle, float(parameters.turnSpeedFactor))
+        movingBoats = np.flatnonzero(isMoving)
+        sourceFound[movingBoats] |= touchesZone(foundTiles, lastPositions[movingBoats,0], lastPositions[movingBoats,1],
+                                                boatStates[movingBoats,0], boatStates[movingBoats,1], waterTank.markSweptPaths)
+        timeSteps[isMoving] += 1
+        boatPaths.append(np.where(isMoving[:,None], boatStates[:,0:2], np.nan))
+        isMoving &= ~sourceFound
+
+    boatPaths = np.array(boatPaths)
+    return [{'x': boatPaths[:timeSteps[boatNum] + 1, boatNum, 0].tolist(), 'y': boatPaths[:timeSteps[boatNum] + 1, boatNum, 1].tolist(),
+             'timeSteps': int(timeSteps[boatNum]), 'sourceFound': bool(sourceFound[boatNum]), 'simulatedSteps': int(timeSteps[boatNum])}
+            for boatNum in range(numBoats)]
+
+def runPythonStrategy(waterTank, boatType, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps = 40, scaleTiles = 10, seed = 0):
+    # Run the Python Classes, Reading the Rasterized Field When the Tank Can
+    lastRaster = getattr(waterTank, 'readRaster', None)
+    if hasattr(waterTank, 'readRaster'):
+        waterTank.readRaster = scaleTiles
+    try:
+        return [sweepEngine.runMergedStrategy(waterTank, boatType, startPoint, boatSpeed, boatDirection, sensorDistance, maxSteps, seed)
+                for startPoint in startPoints]
+    finally:
+        if hasattr(waterTank, 'readRaster'):
+            waterTank.readRaster = lastRaster
+
+def runKernelSweep(waterTank, boatTypes, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps = 40, scaleTiles = 10, seed = 0):
+    """
+    Run every strategy in boatTypes from every start point, with the kernels
+    where they cover the strategy and tank and the Python classes otherwise.
+    Both read the field rasterized at scaleTiles (when the tank has one).
+
+    returns: a results table (see sweepEngine.runStartSweep), plus a
+        'usedKernel' column
+    """
+    resultsTable = {'strategy': [], 'startX': [], 'startY': [], 'endX': [], 'endY': [], 'timeSteps': [],
+                    'sourceFound': [], 'simulatedSteps': [], 'usedKernel': [], 'paths': []}
+    for boatType in boatTypes:
+        usedKernel = kernelStrategy(boatType) is not None and kernelTank(waterTank)
+        runStrategy = runKernelStrategy if usedKernel else runPythonStrategy
+        for startPoint, runResult in zip(startPoints, runStrategy(waterTank, boatType, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps, scaleTiles)):
+            resultsTable['strategy'].append(boatType.__name__)
+            resultsTable['startX'].append(startPoint[0]); resultsTable['startY'].append(startPoint[1])
+            resultsTable['endX'].append(runResult['x'][-1]); resultsTable['endY'].append(runResult['y'][-1])
+            resultsTable['timeSteps'].append(runResult['timeSteps'])
+            resultsTable['sourceFound'].append(runResult['sourceFound'])
+            resultsTable['simulatedSteps'].append(runResult['simulatedSteps'])
+            resultsTable['usedKernel'].append(usedKernel)
+            resultsTable['paths'].append(np.array([runResult['x'], runResult['y']], dtype=float))
+
+    # Convert the Table Columns to Arrays
+    for columnName in resultsTable:
+        if columnName != 'paths':
+            resultsTable[columnName] = np.array(resultsTable[columnName])
+    return resultsTable
+
+def validateKernels(waterTank, boatTypes, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps = 40, scaleTiles = 10, positionTolerance = 1E-9):
+    """
+    Run each kernel strategy in boatTypes from every start point with the
+    kernels and with the Python classes (both reading the rasterized field)
+    and compare the runs.
+
+    returns: a dict from strategy name to the number of runs compared, the
+        runs whose steps, outcome or path (beyond positionTolerance) differ,
+        and the largest position difference
+    """
+    if not kernelTank(waterTank):
+        raise ValueError("The Step Kernels Do Not Cover " + type(waterTank).__name__ + " (Obstacles, a Reading Cache or a Session Log?)")
+    validationResults = {}
+    for boatType in boatTypes:
+        if kernelStrategy(boatType) is None:
+            continue
+        kernelRuns = runKernelStrategy(waterTank, boatType, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps, scaleTiles)
+        pythonRuns = runPythonStrategy(waterTank, boatType, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps, scaleTiles)
+        differentRuns = []; maxDifference = 0.0
+        for startPoint, kernelRun, pythonRun in zip(startPoints, kernelRuns, pythonRuns):
+            if kernelRun['timeSteps'] != pythonRun['timeSteps'] or kernelRun['sourceFound'] != pythonRun['sourceFound']:
+                differentRuns.append(tuple(startPoint))
+                continue
+            pathDifference = np.max(np.abs(np.subtract([kernelRun['x'], kernelRun['y']], [pythonRun['x'], pythonRun['y']])))
+            maxDifference = max(maxDifference, float(pathDifference))
+            if pathDifference > positionTolerance:
+                differentRuns.append(tuple(startPoint))
+        validationResults[boatType.__name__] = {'numRuns': len(startPoints), 'differentRuns': differentRuns, 'maxDifference': maxDifference}
+    return validationResults
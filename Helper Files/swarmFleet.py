@@ -0,0 +1,250 @@
+"""
+Swarm Mode: Thousands of Boats in Array Form
+
+A swarmFleet keeps every boat's position, heading and speed in NumPy arrays
+and moves them all at once. Each boat follows its three sensors (the
+weightedMaxDirection rule) and keeps its distance from the others:
+
+    * Boats closer than separationRadius steer away from each other.
+    * Boats closer than collisionRadius after a move are pushed apart.
+
+Neighbours are found with a spatialHash, a uniform grid of cells the size of
+the largest radius, so only boats in neighbouring cells are compared and a
+step costs O(numBoats) for a bounded density instead of O(numBoats^2).
+"""
+
+# Import Basic Modules
+import math
+import numpy as np
+
+# Import Search Classes
+import objectParameters
+
+
+class spatialHash(object):
+    """
+    Buckets points into square cells of side cellSize. Pairs closer than
+    cellSize can only be in the same or neighbouring cells.
+    """
+    def __init__(self, cellSize, tankWidth, tankHeight):
+        self.cellSize = cellSize
+        self.numCellsX = int(math.ceil(tankWidth/cellSize)) + 1
+        self.numCellsY = int(math.ceil(tankHeight/cellSize)) + 1
+
+    def build(self, x, y):
+        # Find Each Point's Cell
+        self.cellX = np.clip((x/self.cellSize).astype(int), 0, self.numCellsX - 1)
+        self.cellY = np.clip((y/self.cellSize).astype(int), 0, self.numCellsY - 1)
+        cellIDs = self.cellX*self.numCellsY + self.cellY
+        # Sort the Points by Cell and Find Where Each Cell Starts
+        self.sortedPoints = np.argsort(cellIDs, kind='stable')
+        self.cellCounts = np.bincount(cellIDs, minlength=self.numCellsX*self.numCellsY)
+        self.cellStarts = np.cumsum(self.cellCounts) - self.cellCounts
+
+    def findPairs(self, x, y, radius):
+        """
+        Return the index arrays (pointsI, pointsJ) of every pair of points
+        closer than radius (radius <= cellSize). Each pair is listed once.
+        """
+        self.build(x, y)
+        pointsI = []; pointsJ = []
+        # Compare Half of the Neighbouring Cells so Each Pair of Cells is Seen Once
+        for offsetX, offsetY in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+            neighbourX = self.cellX + offsetX
+            neighbourY = self.cellY + offsetY
+            inGrid = (neighbourX < self.numCellsX) & (0 <= neighbourY) & (neighbourY < self.numCellsY)
+            pointNums = np.flatnonzero(inGrid)
+            neighbourIDs = neighbourX[inGrid]*self.numCellsY + neighbourY[inGrid]
+            # Pair Each Point with Every Point in the Neighbouring Cell
+            neighbourCounts = self.cellCounts[neighbourIDs]
+            pairI = np.repeat(pointNums, neighbourCounts)
+            withinCell = np.arange(len(pairI)) - np.repeat(np.cumsum(neighbourCounts) - neighbourCounts, neighbourCounts)
+            pairJ = self.sortedPoints[np.repeat(self.cellStarts[neighbourIDs], neighbourCounts) + withinCell]
+            # Keep Close Pairs (and Each Pair Inside a Cell Only Once)
+            keepPairs = (x[pairI] - x[pairJ])**2 + (y[pairI] - y[pairJ])**2 < radius**2
+            if offsetX == 0 and offsetY == 0:
+                keepPairs &= pairI < pairJ
+            pointsI.append(pairI[keepPairs]); pointsJ.append(pairJ[keepPairs])
+        return np.concatenate(pointsI), np.concatenate(pointsJ)
+
+
+def pairPushes(x, y, pointsI, pointsJ, radius):
+    """
+    Return, for every pair, the unit vector from j to i and how far inside
+    radius the pair is (0 to 1). Coincident points are pushed apart along x.
+    """
+    delX = x[pointsI] - x[pointsJ]
+    delY = y[pointsI] - y[pointsJ]
+    pairDist = np.hypot(delX, delY)
+    samePoint = pairDist == 0
+    pairDist = np.where(samePoint, 1, pairDist)
+    unitX = np.where(samePoint, 1, delX/pairDist)
+    unitY = np.where(samePoint, 0, delY/pairDist)
+    overlap = np.where(samePoint, 1, 1 - pairDist/radius)
+    return unitX, unitY, overlap
+
+
+class swarmFleet(object):
+    """
+    A fleet of boats stored as arrays: x, y, headings (degrees) and speeds.
+
+    separationRadius: boats closer than this steer apart
+    separationWeight: how strongly separation is added to the sensor direction
+    collisionRadius: after every move, boats closer than this are pushed apart
+        (collisionIterations passes; dense crowds spread out over a few steps)
+    parameters: the speed rule (turnSlowAngle/turnSpeedFactor) and sensorAngle
+        (default: weightedMaxDirection's strategyParameters: no slowing on turns)
+    """
+    def __init__(self, waterTank, boatLocations, boatSpeed, boatDirection, sensorDistance, separationRadius = 1,
+                 separationWeight = 1, collisionRadius = 0.25, collisionIterations = 2, parameters = None):
+        self.waterTank = waterTank
+        self.maxSpeed = boatSpeed
+        self.sensorDistance = sensorDistance
+        self.separationRadius = separationRadius
+        self.separationWeight = separationWeight
+        self.collisionRadius = collisionRadius
+        self.collisionIterations = collisionIterations
+        self.parameters = parameters or objectParameters.weightedMaxDirection.parameters
+        # Store the Boats as Arrays
+        boatLocations = np.asarray(boatLocations, dtype=float).reshape(-1, 2)
+        self.x = boatLocations[:,0].copy()
+        self.y = boatLocations[:,1].copy()
+        self.headings = np.full(len(self.x), math.degrees(math.atan2(boatDirection[1], boatDirection[0])) % 360)
+        self.speeds = np.full(len(self.x), float(boatSpeed))
+        # Find Neighbours with a Grid of Cells as Big as the Largest Radius
+        self.neighbourGrid = spatialHash(max(separationRadius, collisionRadius), waterTank.tankWidth, waterTank.tankHeight)
+        self.markAsVisited()
+
+    def __len__(self):
+        return len(self.x)
+
+    def markAsVisited(self):
+        # Mark the Tiles Under Every Boat
+        tileX = np.floor(self.x).astype(int); tileY = np.floor(self.y).astype(int)
+        onTiles = (0 <= tileX) & (tileX < self.waterTank.tankWidth) & (0 <= tileY) & (tileY < self.waterTank.tankHeight)
+        self.waterTank.tiles[tileX[onTiles], tileY[onTiles]] = True
+
+    def sensorDirections(self):
+        """
+        Read every boat's three sensors and return the weighted sensor
+        direction of each boat (weightedMaxDirection's rule; not normalized).
+        """
+        sensorAngles = np.radians(self.headings[:,None] + np.array([0, self.parameters.sensorAngle, -self.parameters.sensorAngle]))
+        offsetX = self.sensorDistance*np.cos(sensorAngles)
+        offsetY = self.sensorDistance*np.sin(sensorAngles)
+        readings = self.waterTank.fieldReadings(self.x[:,None] + offsetX, self.y[:,None] + offsetY)
+        return np.sum(offsetX*readings, axis=1), np.sum(offsetY*readings, axis=1)
+
+    def separationDirections(self):
+        # Steer Away From Every Boat Inside the Separation Radius (Harder When Closer)
+        pointsI, pointsJ = self.neighbourGrid.findPairs(self.x, self.y, self.separationRadius)
+        unitX, unitY, overlap = pairPushes(self.x, self.y, pointsI, pointsJ, self.separationRadius)
+        numBoats = len(self.x)
+        separationX = np.bincount(pointsI, unitX*overlap, numBoats) - np.bincount(pointsJ, unitX*overlap, numBoats)
+        separationY = np.bincount(pointsI, unitY*overlap, numBoats) - np.bincount(pointsJ, unitY*overlap, numBoats)
+        return separationX, separationY
+
+    def resolveCollisions(self):
+        # Push Overlapping Boats Apart, Half the Overlap Each
+        numBoats = len(self.x)
+        for _ in range(self.collisionIterations):
+            pointsI, pointsJ = self.neighbourGrid.findPairs(self.x, self.y, self.collisionRadius)
+            if len(pointsI) == 0:
+                break
+            unitX, unitY, overlap = pairPushes(self.x, self.y, pointsI, pointsJ, self.collisionRadius)
+            pushDist = overlap*self.collisionRadius/2
+            # Check the Pushes Like Moves: From Where the Boats Were to Where They are Pushed
+            pushedX = self.x + np.bincount(pointsI, unitX*pushDist, numBoats) - np.bincount(pointsJ, unitX*pushDist, numBoats)
+            pushedY = self.y + np.bincount(pointsI, unitY*pushDist, numBoats) - np.bincount(pointsJ, unitY*pushDist, numBoats)
+            self.x, self.y = self.boundMoves(self.x, self.y, pushedX, pushedY)
+
+    def boundMoves(self, x, y, newX, newY):
+        # If The Position is Not in the Tank, Bound the Position by the Tank
+        tankBuffer = self.sensorDistance/2
+        outsideTank = ~((tankBuffer <= newX) & (newX < self.waterTank.tankWidth - tankBuffer)
+                        & (tankBuffer <= newY) & (newY < self.waterTank.tankHeight - tankBuffer))
+        newX = np.where(outsideTank, np.clip(newX, self.sensorDistance, self.waterTank.tankWidth - self.sensorDistance), newX)
+        newY = np.where(outsideTank, np.clip(newY, self.sensorDistance, self.waterTank.tankHeight - self.sensorDistance), newY)
+        # Obstacles Need the Tank's Path Check (All Moving Boats at Once)
+        if self.waterTank.obstacleSDF is not None:
+            movedBoats = np.flatnonzero((newX != x) | (newY != y))
+            newX[movedBoats], newY[movedBoats] = self.waterTank.resolveMoves(x[movedBoats], y[movedBoats], newX[movedBoats], newY[movedBoats], tankBuffer, self.sensorDistance)
+        return newX, newY
+
+    def step(self):
+        """
+        Move every boat one time-step.
+        """
+        # Combine the Sensor Direction with the Separation From Neighbours
+        directionX, directionY = self.sensorDirections()
+        directionNorm = np.hypot(directionX, directionY)
+        noReading = directionNorm == 0
+        directionX = np.where(noReading, np.cos(np.radians(self.headings)), directionX/np.where(noReading, 1, directionNorm))
+        directionY = np.where(noReading, np.sin(np.radians(self.headings)), directionY/np.where(noReading, 1, directionNorm))
+        if self.separationWeight and len(self.x) > 1:
+            separationX, separationY = self.separationDirections()
+            directionX = directionX + self.separationWeight*separationX
+            directionY = directionY + self.separationWeight*separationY
+        newHeadings = np.where((directionX == 0) & (directionY == 0), self.headings, np.degrees(np.arctan2(directionY, directionX)) % 360)
+
+        # Prevent Big Changes
+        if self.parameters.turnSlowAngle is not None:
+            turnAngle = np.abs((newHeadings - self.headings + 180) % 360 - 180)
+            self.speeds = np.where(turnAngle > self.parameters.turnSlowAngle, self.speeds*self.parameters.turnSpeedFactor, self.maxSpeed)
+
+        # Move, Stay in the Tank and Keep Apart
+        startX, startY = self.x.copy(), self.y.copy()
+        newX = self.x + self.speeds*np.cos(np.radians(newHeadings))
+        newY = self.y + self.speeds*np.sin(np.radians(newHeadings))
+        self.x, self.y = self.boundMoves(self.x, self.y, newX, newY)
+        self.headings = newHeadings
+        if self.collisionRadius and len(self.x) > 1:
+            self.resolveCollisions()
+        # Mark the Tiles Every Boat Crossed
+        if self.waterTank.markSweptPaths:
+            self.waterTank.markSegments(startX, startY, self.x, self.y)
+        else:
+            self.markAsVisited()
+
+    def nearSource(self, maxDev = 1):
+        """
+        Return a boolean array: True for boats on a tile within maxDev tiles of
+        a known source (the rule of the tanks' sourceFound()).
+        """
+        tileX = np.floor(self.x); tileY = np.floor(self.y)
+        atSource = np.zeros(len(self.x), dtype=bool)
+        for locX, locY in getattr(self.waterTank, 'sourceLocations', None) or []:
+            atSource |= (np.abs(tileX - locX) <= maxDev) & (np.abs(tileY - locY) <= maxDev)
+        return atSource
+
+
+def runSwarm(waterTank, boatLocations, boatSpeed, boatDirection, sensorDistance, maxSteps = 40, stopOnFirst = True, recordPaths = False, **fleetOptions):
+    """
+    Run a swarm from boatLocations (one boat per location).
+
+    stopOnFirst: stop as soon as the tank reports the source found (like
+        runStrategy); otherwise run until every boat is near a source
+    fleetOptions: passed to swarmFleet (separationRadius, collisionRadius, ...)
+    returns: a dict with the final 'x', 'y', each boat's 'arrivalStep' (-1 if it
+        never got near a source), 'timeSteps', 'sourceFound' and, with
+        recordPaths, 'paths' (an array of shape (timeSteps + 1, numBoats, 2))
+    """
+    waterTank.reinitialize()
+    fleet = swarmFleet(waterTank, boatLocations, boatSpeed, boatDirection, sensorDistance, **fleetOptions)
+    arrivalStep = np.where(fleet.nearSource(), 0, -1)
+    paths = [np.column_stack((fleet.x, fleet.y))] if recordPaths else None
+
+    timeSteps = 0
+    while timeSteps < maxSteps:
+        if (waterTank.sourceFound() if stopOnFirst else np.all(arrivalStep >= 0)):
+            break
+        fleet.step()
+        timeSteps += 1
+        arrivalStep = np.where((arrivalStep < 0) & fleet.nearSource(), timeSteps, arrivalStep)
+        if recordPaths:
+            paths.append(np.column_stack((fleet.x, fleet.y)))
+
+    swarmResult = {'x': fleet.x, 'y': fleet.y, 'arrivalStep': arrivalStep, 'timeSteps': timeSteps, 'sourceFound': bool(waterTank.sourceFound())}
+    if recordPaths:
+        swarmResult['paths'] = np.stack(paths)
+    return swarmResult
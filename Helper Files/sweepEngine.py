@@ -0,0 +1,324 @@
+"""
+Sweep Engine: Run Strategies from Many Start Points
+
+runStartSweep() runs each strategy from every start point and returns a
+results table (a dict of arrays with one row per strategy and start point).
+Every run is simulated exactly unless mergeTrajectories is turned on.
+
+Memoryless strategies (isMemoryless = True) move based only on the boat's
+position, heading and speed. Once a run reaches a state that an earlier run
+already passed through, its remaining path is the same as the earlier run's,
+so with mergeTrajectories the sweep splices in the cached tail instead of
+simulating it. States are compared after quantizing them by
+positionQuantum/angleQuantum/speedQuantum. Start points only rarely reach
+exactly the same state, so merging is an approximation: coarser quanta merge
+more runs but shift the spliced tails by up to one quantum, and a spliced run
+can take a different number of steps than the exact one. With a result cache,
+runs loaded from it also provide tails, and only exact (unspliced) runs are
+stored in it.
+
+tuneStrategy() searches a strategy's parameters (see strategyParameters) with
+successive halving: every configuration is run from a few sampled start
+points, the weakest are dropped, and the survivors are run from more points,
+so most of the runs go to the configurations worth telling apart. Runs are
+spread over a pool of worker processes.
+"""
+
+# Import Basic Modules
+import math
+import random
+import itertools
+import multiprocessing
+import numpy as np
+
+
+class trajectoryCache(object):
+    """
+    Remembers every (quantized) state reached by a memoryless strategy and
+    where in which stored path it was reached.
+    """
+    def __init__(self, positionQuantum = 0.25, angleQuantum = 5, speedQuantum = 0.01):
+        self.positionQuantum = positionQuantum
+        self.angleQuantum = angleQuantum
+        self.speedQuantum = speedQuantum
+        # Stored Paths and the States Along Them
+        self.paths = []
+        self.stateLookup = {}
+        # Usage Statistics
+        self.numMerges = 0
+
+    def stateKey(self, boat):
+        return self.quantizeState(boat.position.getX(), boat.position.getY(), boat.getAngle(boat.boatDirection), boat.boatSpeed)
+
+    def quantizeState(self, x, y, boatAngle, boatSpeed):
+        # Quantize the Boat's Position, Heading and Speed
+        return (int(round(x/self.positionQuantum)), int(round(y/self.positionQuantum)),
+                int(round((boatAngle % 360)/self.angleQuantum)) % int(round(360/self.angleQuantum)), int(round(boatSpeed/self.speedQuantum)))
+
+    def lookup(self, stateKey):
+        """
+        Return (path, index) of a stored path that passed through the state,
+        or None.
+        """
+        pathIndex = self.stateLookup.get(stateKey)
+        if pathIndex is None:
+            return None
+        return self.paths[pathIndex[0]], pathIndex[1]
+
+    def addPath(self, xPath, yPath, sourceFound, stateKeys):
+        """
+        Store a finished path. stateKeys holds the keys of the states that were
+        simulated (the first len(stateKeys) points of the path).
+        """
+        pathNum = len(self.paths)
+        self.paths.append({'x': xPath, 'y': yPath, 'sourceFound': sourceFound})
+        for stateIndex, stateKey in enumerate(stateKeys):
+            self.stateLookup.setdefault(stateKey, (pathNum, stateIndex))
+
+
+def runMergedStrategy(waterTank, boatType, startPoint, boatSpeed, boatDirection, sensorDistance, maxSteps = 40, seed = None, pathCache = None):
+    """
+    Run one boat from startPoint like objectParameters.runStrategy(), but stop
+    simulating as soon as the boat reaches a state stored in pathCache.
+
+    returns: a dict with the path ('x', 'y'), 'timeSteps', 'sourceFound',
+        'simulatedSteps' (the steps that were actually simulated), 'merged'
+        (True if a cached tail was spliced in) and the heading and speed of
+        each simulated state ('angles', 'speeds'; see trajectoryCache)
+    """
+    if seed is not None:
+        random.seed(seed)
+    waterTank.reinitialize()
+    boat = boatType(waterTank, boatSpeed, startPoint, boatDirection, sensorDistance)
+
+    xPath = [boat.position.x]; yPath = [boat.position.y]
+    boatAngles = [boat.getAngle(boat.boatDirection)]; boatSpeeds = [boat.boatSpeed]
+    stateKeys = [pathCache.stateKey(boat)] if pathCache is not None else []
+    timeSteps = 0; sourceFound = False; merged = False
+    while True:
+        if waterTank.sourceFound():
+            sourceFound = True
+            break
+        # If an Earlier Run Passed Through This State, Follow its Path
+        cachedState = pathCache.lookup(stateKeys[-1]) if pathCache is not None else None
+        if cachedState is not None:
+            cachedPath, stateIndex = cachedState
+            remainingSteps = len(cachedPath['x']) - 1 - stateIndex
+            # The Cached Run Found the Source Within Our Step Limit
+            if cachedPath['sourceFound'] and timeSteps + remainingSteps <= maxSteps:
+                numSplice = remainingSteps
+                sourceFound = True
+            # The Cached Run Covers Every Step We Have Left
+            elif timeSteps + remainingSteps >= maxSteps:
+                numSplice = maxSteps - timeSteps
+            else:
+                numSplice = None
+            if numSplice is not None:
+                xPath.extend(cachedPath['x'][stateIndex + 1:stateIndex + 1 + numSplice])
+                yPath.extend(cachedPath['y'][stateIndex + 1:stateIndex + 1 + numSplice])
+                timeSteps += numSplice
+                merged = True
+                break
+        # Move the Boat
+        boat.updatePosition()
+        xPath.append(boat.position.x); yPath.append(boat.position.y)
+        boatAngles.append(boat.getAngle(boat.boatDirection)); boatSpeeds.append(boat.boatSpeed)
+        timeSteps += 1
+        if pathCache is not None:
+            stateKeys.append(pathCache.stateKey(boat))
+        if timeSteps > maxSteps - 1:
+            sourceFound = bool(waterTank.sourceFound())
+            break
+
+    # Remember the States This Run Simulated
+    if pathCache is not None:
+        pathCache.addPath(xPath, yPath, sourceFound, stateKeys)
+        pathCache.numMerges += merged
+    return {'x': xPath, 'y': yPath, 'timeSteps': timeSteps, 'sourceFound': sourceFound, 'simulatedSteps': len(boatAngles) - 1,
+            'merged': merged, 'angles': boatAngles, 'speeds': boatSpeeds}
+
+
+def loadCachedRun(runCache, waterTank, boatType, startPoint, boatSpeed, boatDirection, sensorDistance, maxSteps, seed):
+    """
+    Return a run stored in runCache (a resultCache) as a runMergedStrategy()
+    result, or None if it was never stored. Runs stored without their
+    headings and speeds have no 'angles'/'speeds'.
+    """
+    cachedRun = runCache.load(runCache.runKey(waterTank, boatType, [startPoint], boatSpeed, boatDirection, sensorDistance, 1, maxSteps, seed))
+    if cachedRun is None:
+        return None
+    # The Source Was Found if the Tiles the Path Visited Reach it
+    waterTank.reinitialize()
+    tileX = np.floor(cachedRun['x']).astype(int); tileY = np.floor(cachedRun['y']).astype(int)
+    onTiles = (0 <= tileX) & (tileX < waterTank.tankWidth) & (0 <= tileY) & (tileY < waterTank.tankHeight)
+    waterTank.tiles[tileX[onTiles], tileY[onTiles]] = True
+    if waterTank.markSweptPaths:
+        waterTank.markSegments(cachedRun['x'][:-1], cachedRun['y'][:-1], cachedRun['x'][1:], cachedRun['y'][1:])
+    loadedRun = {'x': cachedRun['x'].tolist(), 'y': cachedRun['y'].tolist(), 'timeSteps': int(cachedRun['timeSteps']),
+                 'sourceFound': bool(waterTank.sourceFound()), 'simulatedSteps': 0, 'merged': False}
+    if 'angles' in cachedRun and 'speeds' in cachedRun:
+        loadedRun['angles'] = cachedRun['angles'].tolist(); loadedRun['speeds'] = cachedRun['speeds'].tolist()
+    return loadedRun
+
+
+def runStartSweep(waterTank, boatTypes, startPoints, boatSpeed, boatDirection, sensorDistance, maxSteps = 40, seed = 0, mergeTrajectories = False,
+                  positionQuantum = 0.25, angleQuantum = 5, speedQuantum = 0.01, runCache = None):
+    """
+    Run every strategy in boatTypes from every start point.
+
+    mergeTrajectories: splice in cached tails for memoryless strategies. This
+        is an approximation (see the module docstring): spliced runs can end
+        up to a quantum away and take a different number of steps. Off by
+        default, so a sweep is exact unless asked otherwise.
+    runCache: a resultCache to load runs from and store them in (shared with
+        compareAlgorythms). Loaded runs provide tails to splice, and only
+        exact runs (nothing spliced in) are stored.
+    returns: a results table, a dict with one entry per run in each of
+        'strategy', 'startX', 'startY', 'endX', 'endY', 'timeSteps',
+        'sourceFound', 'simulatedSteps' (arrays) and 'paths' (a list)
+    """
+    resultsTable = {'strategy': [], 'startX': [], 'startY': [], 'endX': [], 'endY': [], 'timeSteps': [],
+                    'sourceFound': [], 'simulatedSteps': [], 'paths': []}
+    for boatType in boatTypes:
+        # Only Memoryless Strategies Have Tails That Depend on the State Alone
+        pathCache = None
+        if mergeTrajectories and getattr(boatType, 'isMemoryless', False):
+            pathCache = trajectoryCache(positionQuantum, angleQuantum, speedQuantum)
+
+        for startPoint in startPoints:
+            runResult = loadCachedRun(runCache, waterTank, boatType, startPoint, boatSpeed, boatDirection, sensorDistance, maxSteps, seed) if runCache is not None else None
+            if runResult is None:
+                runResult = runMergedStrategy(waterTank, boatType, startPoint, boatSpeed, boatDirection, sensorDistance, maxSteps, seed, pathCache)
+                # Spliced Runs are Approximate: Only Exact Runs are Stored
+                if runCache is not None and not runResult['merged']:
+                    runKey = runCache.runKey(waterTank, boatType, [startPoint], boatSpeed, boatDirection, sensorDistance, 1, maxSteps, seed)
+                    runCache.store(runKey, x = np.array(runResult['x'], dtype=float), y = np.array(runResult['y'], dtype=float), timeSteps = runResult['timeSteps'],
+                                   angles = np.array(runResult['angles'], dtype=float), speeds = np.array(runResult['speeds'], dtype=float))
+            elif pathCache is not None and 'angles' in runResult:
+                # A Loaded Run's States Give Tails for the Runs After It
+                pathCache.addPath(runResult['x'], runResult['y'], runResult['sourceFound'],
+                                  [pathCache.quantizeState(*runState) for runState in zip(runResult['x'], runResult['y'], runResult['angles'], runResult['speeds'])])
+            # Store the Run in the Table
+            resultsTable['strategy'].append(boatType.__name__)
+            resultsTable['startX'].append(startPoint[0]); resultsTable['startY'].append(startPoint[1])
+            resultsTable['endX'].append(runResult['x'][-1]); resultsTable['endY'].append(runResult['y'][-1])
+            resultsTable['timeSteps'].append(runResult['timeSteps'])
+            resultsTable['sourceFound'].append(runResult['sourceFound'])
+            resultsTable['simulatedSteps'].append(runResult['simulatedSteps'])
+            resultsTable['paths'].append(np.array([runResult['x'], runResult['y']], dtype=float))
+
+    # Convert the Table Columns to Arrays
+    for columnName in resultsTable:
+        if columnName != 'paths':
+            resultsTable[columnName] = np.array(resultsTable[columnName])
+    return resultsTable
+
+
+# --------------------------------------------------------------------------- #
+#                       Tune Strategy Parameters                              #
+# --------------------------------------------------------------------------- #
+
+def sampleConfigurations(parameterGrid, numConfigs = None, seed = 0):
+    """
+    Return parameter configurations to try.
+
+    parameterGrid: a dict from parameter name to the list of values to try,
+        e.g. {'blendAngle': [45, 60, 75, 90], 'turnSpeedFactor': [1/4, 1/2]}
+    numConfigs: the number of distinct random combinations to pick (None = all)
+    returns: a list of dicts from parameter name to value
+    """
+    parameterNames = sorted(parameterGrid)
+    allValues = list(itertools.product(*[parameterGrid[parameterName] for parameterName in parameterNames]))
+    if numConfigs is not None and numConfigs < len(allValues):
+        allValues = random.Random(seed).sample(allValues, numConfigs)
+    return [dict(zip(parameterNames, parameterValues)) for parameterValues in allValues]
+
+
+# State of Each Tuning Worker (Set Once per Process)
+tunerState = {}
+
+def initializeTuner(waterTank, boatType, boatSpeed, boatDirection, sensorDistance, maxSteps, seed):
+    tunerState.update(waterTank = waterTank, boatType = boatType, boatSpeed = boatSpeed, boatDirection = boatDirection,
+                      sensorDistance = sensorDistance, maxSteps = maxSteps, seed = seed, configTypes = {})
+
+def evaluateRun(tuningJob):
+    # Build the Strategy for This Configuration Once per Worker
+    parameterValues, startPoint = tuningJob
+    configKey = tuple(sorted(parameterValues.items()))
+    if configKey not in tunerState['configTypes']:
+        tunerState['configTypes'][configKey] = tunerState['boatType'].withParameters(**parameterValues)
+    runResult = runMergedStrategy(tunerState['waterTank'], tunerState['configTypes'][configKey], startPoint, tunerState['boatSpeed'],
+                                  tunerState['boatDirection'], tunerState['sensorDistance'], tunerState['maxSteps'], tunerState['seed'])
+    return runResult['timeSteps'], runResult['sourceFound']
+
+
+def tuneStrategy(waterTank, boatType, configurations, startPoints, boatSpeed, boatDirection, sensorDistance, minStarts = 8,
+                 reductionFactor = 3, maxSteps = 40, failurePenalty = None, seed = 0, numWorkers = None):
+    """
+    Find the best parameters for a strategy with successive halving.
+
+    Each round runs every remaining configuration from the first numStarts
+    of the (shuffled) start points, reusing the runs of earlier rounds. Only
+    the best 1/reductionFactor of the configurations go on to the next round,
+    which uses reductionFactor times as many start points. The search stops
+    when one configuration is left or every start point has been used.
+
+    A configuration's score is its mean number of steps to the source; runs
+    that never find it count as maxSteps + failurePenalty (default maxSteps).
+
+    configurations: a list of parameter dicts (see sampleConfigurations)
+    numWorkers: the number of worker processes (None = one per CPU, 1 = run
+        in this process)
+    returns: the best configuration (a dict) and a tuning table, a dict of
+        arrays with one row per configuration and round: 'round', 'configNum',
+        'numStarts', 'score', 'foundRate'
+    """
+    failurePenalty = maxSteps if failurePenalty is None else failurePenalty
+    # Use the Start Points in a Random (but Repeatable) Order
+    startOrder = [startPoints[startNum] for startNum in np.random.RandomState(seed).permutation(len(startPoints))]
+    
+    tuningTable = {'round': [], 'configNum': [], 'numStarts': [], 'score': [], 'foundRate': []}
+    runResults = [[] for _ in configurations]
+    candidates = list(range(len(configurations)))
+    numStarts = min(minStarts, len(startOrder))
+    tunerArgs = (waterTank, boatType, boatSpeed, boatDirection, sensorDistance, maxSteps, seed)
+    numWorkers = numWorkers or multiprocessing.cpu_count()
+    workerPool = multiprocessing.Pool(numWorkers, initializeTuner, tunerArgs) if numWorkers != 1 else None
+    if workerPool is None:
+        initializeTuner(*tunerArgs)
+    try:
+        roundNum = 0
+        while True:
+            # Run Each Candidate From the Start Points it Has Not Tried Yet
+            tuningJobs = [(configNum, startPoint) for configNum in candidates for startPoint in startOrder[len(runResults[configNum]):numStarts]]
+            jobArgs = [(configurations[configNum], startPoint) for configNum, startPoint in tuningJobs]
+            if workerPool is not None:
+                jobResults = workerPool.map(evaluateRun, jobArgs, chunksize = max(1, len(jobArgs)//(4*numWorkers)))
+            else:
+                jobResults = [evaluateRun(jobArg) for jobArg in jobArgs]
+            for (configNum, _), jobResult in zip(tuningJobs, jobResults):
+                runResults[configNum].append(jobResult)
+            
+            # Score the Candidates
+            configScores = {}
+            for configNum in candidates:
+                timeSteps, sourceFound = np.array(runResults[configNum], dtype=float).T
+                configScores[configNum] = float(np.mean(timeSteps + failurePenalty*(1 - sourceFound)))
+                tuningTable['round'].append(roundNum); tuningTable['configNum'].append(configNum); tuningTable['numStarts'].append(numStarts)
+                tuningTable['score'].append(configScores[configNum]); tuningTable['foundRate'].append(float(np.mean(sourceFound)))
+            if len(candidates) == 1 or numStarts == len(startOrder):
+                break
+            # Keep the Best Configurations and Give Them More Start Points
+            candidates = sorted(candidates, key=configScores.get)[:max(1, math.ceil(len(candidates)/reductionFactor))]
+            numStarts = min(numStarts*reductionFactor, len(startOrder))
+            roundNum += 1
+    finally:
+        if workerPool is not None:
+            workerPool.close()
+            workerPool.join()
+    
+    # Convert the Table Columns to Arrays
+    for columnName in tuningTable:
+        tuningTable[columnName] = np.array(tuningTable[columnName])
+    bestConfig = min(candidates, key=configScores.get)
+    return configurations[bestConfig], tuningTable
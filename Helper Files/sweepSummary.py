@@ -0,0 +1,118 @@
+"""
+Sweep Summary Figures
+
+Draws one figure per sweep from runStartSweep's results table instead of one
+figure per run. For every strategy it shows, over the grid of start points:
+
+    * the number of steps the boat needed to reach a source (blank if it
+      never did), and
+    * which source it reached (the basins of attraction).
+
+Trajectories are only drawn on request (showPaths), as a single line
+collection per strategy.
+"""
+
+# Import Basic Modules
+import os
+import numpy as np
+# Import Plotting Modules
+import matplotlib.pyplot as plt
+from matplotlib.colors import ListedColormap
+from matplotlib.collections import LineCollection
+from matplotlib.patches import Patch
+
+
+def reachedSources(resultsTable, sourceLocations):
+    """
+    Return the index of the source each run reached (the closest source to
+    where it ended), or -1 for runs that never found a source.
+    """
+    sourceLocations = np.asarray(sourceLocations, dtype=float).reshape(-1, 2)
+    if len(sourceLocations) == 0:
+        return np.full(len(resultsTable['endX']), -1)
+    endDist = np.hypot(resultsTable['endX'][:,None] - sourceLocations[None,:,0], resultsTable['endY'][:,None] - sourceLocations[None,:,1])
+    return np.where(resultsTable['sourceFound'], np.argmin(endDist, axis=1), -1)
+
+
+def sweepGrids(resultsTable, strategyName, sourceIDs):
+    """
+    Arrange one strategy's runs on the grid of start points.
+
+    returns: the grid's x and y values, the steps to the source (NaN if it was
+        never found) and the reached source index (-1 if none), both indexed
+        [y, x]
+    """
+    strategyRuns = resultsTable['strategy'] == strategyName
+    startX = resultsTable['startX'][strategyRuns]; startY = resultsTable['startY'][strategyRuns]
+    xValues, xIndex = np.unique(startX, return_inverse=True)
+    yValues, yIndex = np.unique(startY, return_inverse=True)
+    # Fill the Grid (Start Points Not in the Sweep Stay Blank)
+    stepsGrid = np.full((len(yValues), len(xValues)), np.nan)
+    sourceGrid = np.full((len(yValues), len(xValues)), -2)
+    foundSource = resultsTable['sourceFound'][strategyRuns]
+    stepsGrid[yIndex, xIndex] = np.where(foundSource, resultsTable['timeSteps'][strategyRuns], np.nan)
+    sourceGrid[yIndex, xIndex] = sourceIDs[strategyRuns]
+    return xValues, yValues, stepsGrid, sourceGrid
+
+
+def gridExtent(xValues, yValues):
+    # Center Each Cell on its Start Point
+    xStep = np.diff(xValues).min() if len(xValues) > 1 else 1
+    yStep = np.diff(yValues).min() if len(yValues) > 1 else 1
+    return (xValues[0] - xStep/2, xValues[-1] + xStep/2, yValues[0] - yStep/2, yValues[-1] + yStep/2)
+
+
+def plotSweepSummary(resultsTable, sourceLocations, outFile = "./sweepSummary.png", tankWidth = None, tankHeight = None,
+                     showPaths = False, pathStride = 1, dpi = 200, showFigure = False):
+    """
+    Draw the steps-to-source and reached-source heatmaps of every strategy in
+    the results table, one column per strategy, and save them to outFile.
+
+    showPaths: overlay the trajectories (every pathStride-th run)
+    returns: the figure
+    """
+    strategyNames = list(dict.fromkeys(resultsTable['strategy'].tolist()))
+    sourceIDs = reachedSources(resultsTable, sourceLocations)
+    numSources = len(sourceLocations)
+    # Blank (Outside the Sweep), Gray (No Source), Then One Color per Source
+    sourceColors = ListedColormap(['white', 'lightgray'] + [plt.cm.tab10(sourceNum % 10) for sourceNum in range(numSources)])
+    maxSteps = np.nanmax(np.where(resultsTable['sourceFound'], resultsTable['timeSteps'], np.nan)) if resultsTable['sourceFound'].any() else 1
+
+    fig, axes = plt.subplots(2, len(strategyNames), figsize=(3.2*len(strategyNames) + 1.5, 6.4), squeeze=False, constrained_layout=True)
+    for columnNum, strategyName in enumerate(strategyNames):
+        xValues, yValues, stepsGrid, sourceGrid = sweepGrids(resultsTable, strategyName, sourceIDs)
+        extent = gridExtent(xValues, yValues)
+        stepsAx, sourceAx = axes[0, columnNum], axes[1, columnNum]
+        # Steps to the Source
+        stepsImage = stepsAx.imshow(np.ma.masked_invalid(stepsGrid), origin='lower', extent=extent, cmap='viridis', vmin=0, vmax=maxSteps, interpolation='nearest')
+        foundRate = np.mean(resultsTable['sourceFound'][resultsTable['strategy'] == strategyName])
+        stepsAx.set_title(strategyName + "\nFound: " + str(round(100*foundRate)) + "%", fontsize=9)
+        # Reached Source
+        sourceAx.imshow(sourceGrid + 2, origin='lower', extent=extent, cmap=sourceColors, vmin=-0.5, vmax=numSources + 1.5, interpolation='nearest')
+
+        # Overlay the Trajectories
+        if showPaths:
+            strategyPaths = [resultsTable['paths'][runNum] for runNum in np.flatnonzero(resultsTable['strategy'] == strategyName)[::pathStride]]
+            stepsAx.add_collection(LineCollection([runPath.T for runPath in strategyPaths], colors='white', linewidths=0.3, alpha=0.5))
+        # Mark the Sources
+        for ax in (stepsAx, sourceAx):
+            for sourceX, sourceY in sourceLocations:
+                ax.plot(sourceX, sourceY, marker='*', markersize=9, color='red', markeredgecolor='black')
+            ax.set_xlim(min(0, extent[0]), tankWidth if tankWidth is not None else extent[1])
+            ax.set_ylim(min(0, extent[2]), tankHeight if tankHeight is not None else extent[3])
+            ax.set_aspect('equal')
+            ax.tick_params(labelsize=7)
+
+    # Label the Figure
+    fig.colorbar(stepsImage, ax=axes[0,:].tolist(), shrink=0.8, label="Steps to Source")
+    sourcePatches = [Patch(color='lightgray', label='No Source')] + [Patch(color=sourceColors(sourceNum + 2), label="Source " + str(sourceNum)) for sourceNum in range(numSources)]
+    axes[1, -1].legend(handles=sourcePatches, loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=7)
+
+    if outFile:
+        os.makedirs(os.path.dirname(outFile) or ".", exist_ok=True)
+        fig.savefig(outFile, dpi=dpi, bbox_inches='tight')
+    if showFigure:
+        plt.show()
+    else:
+        plt.close(fig)
+    return fig
@@ -0,0 +1,111 @@
+"""
+Fixed-Size Ring Buffer of a Boat's Recent Sensor Readings
+
+Every slot is written twice (at i and i + capacity), so the last k readings
+are always one contiguous slice of the buffer: window() returns a view and
+never copies. Appending a reading only writes into preallocated arrays.
+
+Oscillation (a boat going back and forwards between two spots) is tracked as
+the readings arrive: the quantized front sensor position is compared with the
+one two steps back, and the number of consecutive two-step returns is kept for
+each parity of the step count, so isOscillating() is O(1).
+"""
+
+# Import Basic Modules
+import numpy as np
+
+
+class telemetryBuffer(object):
+    """
+    The last capacity readings of a boat, each reading being numSensors
+    (x, y, value) points.
+    """
+    def __init__(self, capacity, numSensors = 3, positionDigits = 4):
+        """
+        capacity: the number of readings held
+        positionDigits: positions are rounded to this many digits when
+            checking if the boat returned to the same spot
+        """
+        self.capacity = max(1, int(capacity))
+        self.numSensors = numSensors
+        self.positionScale = 10.0**positionDigits
+        # Each Reading is Stored at Slot and Slot + Capacity
+        self.readings = np.zeros((2*self.capacity, numSensors, 3))
+        self.numWritten = 0
+        # Step Number of the Oldest Reading That Can be Held (Moves on in resize)
+        self.firstKept = 0
+        # Quantized Front Position and Two-Step Return Streak, by Step Parity
+        self.positionKeys = np.zeros((2, 2), dtype=np.int64)
+        self.returnStreaks = np.zeros(2, dtype=np.int64)
+
+    def append(self, sensorPoints):
+        """
+        Add one reading: a sequence of numSensors (x, y, value) points, the
+        first being the front sensor.
+        """
+        slotNum = self.numWritten % self.capacity
+        self.readings[slotNum] = sensorPoints
+        self.readings[slotNum + self.capacity] = self.readings[slotNum]
+        # Compare the Front Sensor With Where it Was Two Steps Back
+        parity = self.numWritten % 2
+        keyX = np.rint(self.readings[slotNum, 0, 0]*self.positionScale)
+        keyY = np.rint(self.readings[slotNum, 0, 1]*self.positionScale)
+        if self.numWritten >= 2 and self.positionKeys[parity, 0] == keyX and self.positionKeys[parity, 1] == keyY:
+            self.returnStreaks[parity] += 1
+        else:
+            self.returnStreaks[parity] = 0
+        self.positionKeys[parity] = (keyX, keyY)
+        self.numWritten += 1
+
+    def numHeld(self):
+        return min(self.numWritten - self.firstKept, self.capacity)
+
+    def window(self, numRecent = None):
+        """
+        Return a view of the last numRecent readings (all held if None),
+        oldest first, shaped (numReadings, numSensors, 3).
+        """
+        numHeld = self.numHeld()
+        numRecent = numHeld if numRecent is None else min(numRecent, numHeld)
+        windowEnd = (self.numWritten - 1) % self.capacity + 1 + self.capacity
+        return self.readings[windowEnd - numRecent:windowEnd]
+
+    def points(self, numRecent = None):
+        """
+        Return a view of the points of the last numRecent readings as one
+        (numPoints, 3) array of x, y, value rows.
+        """
+        return self.window(numRecent).reshape(-1, 3)
+
+    def isOscillating(self, numConsider = 5):
+        """
+        Return True if, over the last numConsider readings, the front sensor
+        kept coming back to where it was two steps before. Needs numConsider
+        readings held.
+        """
+        if self.numHeld() < numConsider:
+            return False
+        # The Last Return Checked is This Step (Odd numConsider) or the One Before
+        lastParity = (self.numWritten - 1 - (numConsider - 1) % 2) % 2
+        return self.returnStreaks[lastParity] >= (numConsider - 1)//2
+
+    def resize(self, capacity):
+        """
+        Hold capacity readings from now on, keeping the most recent ones.
+        """
+        capacity = max(1, int(capacity))
+        if capacity == self.capacity:
+            return
+        keptReadings = self.window(capacity).copy()
+        self.firstKept = self.numWritten - len(keptReadings)
+        self.capacity = capacity
+        self.readings = np.zeros((2*capacity, self.numSensors, 3))
+        # Put the Kept Readings Back in the Slots of Their Step Numbers
+        for readingNum, reading in enumerate(keptReadings, self.firstKept):
+            self.readings[readingNum % capacity] = reading
+            self.readings[readingNum % capacity + capacity] = reading
+
+    def clear(self):
+        self.numWritten = 0
+        self.firstKept = 0
+        self.returnStreaks[:] = 0
@@ -0,0 +1,112 @@
+"""
+Memory-Mapped Regular Grid of a 3D Field
+
+A 3D simulation export (x, y, z, value rows on a regular lattice) is written
+once to a .npy file stored depth plane by depth plane ([z, x, y]), next to a
+small file of the grid's axes. The grid is then opened memory-mapped, so a
+lookup only reads the grid nodes it needs from disk and a depth slice only
+reads two planes: the volume is never loaded into RAM as a whole.
+
+Lattice nodes missing from the export (e.g. inside barriers) are NaN; lookups
+leave them out.
+"""
+
+# Import Basic Modules
+import os
+import numpy as np
+
+
+def axesFile(gridFile):
+    return os.path.splitext(gridFile)[0] + "_axes.npz"
+
+
+def writeVolumeGrid(x, y, z, values, gridFile, dtype = np.float32, coordDigits = 9):
+    """
+    Arrange samples on a regular lattice into gridFile (a memory-mappable
+    .npy file) and save the lattice's axes beside it.
+
+    coordDigits: coordinates are rounded to this many digits so values of
+        the same lattice line match exactly
+    """
+    axes = []; axisIndices = []
+    for coordinates in (z, x, y):
+        axisValues, axisIndex = np.unique(np.round(np.asarray(coordinates, dtype=float), coordDigits), return_inverse=True)
+        axes.append(axisValues); axisIndices.append(axisIndex)
+    # Fill the Lattice Without Holding a Second Copy of the Volume
+    os.makedirs(os.path.dirname(gridFile) or ".", exist_ok=True)
+    grid = np.lib.format.open_memmap(gridFile, mode='w+', dtype=dtype, shape=tuple(len(axisValues) for axisValues in axes))
+    grid[:] = np.nan
+    grid[axisIndices[0], axisIndices[1], axisIndices[2]] = values
+    grid.flush()
+    del grid
+    np.savez(axesFile(gridFile), z=axes[0], x=axes[1], y=axes[2])
+
+
+class volumeGrid(object):
+    """
+    A read-only, memory-mapped 3D grid with trilinear lookups. xAxis, yAxis
+    and zAxis give the (increasing) coordinates of the grid nodes; they can be
+    rescaled (e.g. to tank units) without touching the grid.
+    """
+    def __init__(self, gridFile):
+        self.gridFile = gridFile
+        self.values = np.load(gridFile, mmap_mode='r')
+        with np.load(axesFile(gridFile)) as gridAxes:
+            self.xAxis = gridAxes['x'].copy(); self.yAxis = gridAxes['y'].copy(); self.zAxis = gridAxes['z'].copy()
+
+    def axisWeights(self, axis, coordinates):
+        # Find the Grid Nodes on Either Side (Clamped to the Grid) and the Weight of the Upper One
+        coordinates = np.asarray(coordinates, dtype=float)
+        if len(axis) == 1:
+            lowerIndex = np.zeros(coordinates.shape, dtype=int)
+            return lowerIndex, lowerIndex, np.zeros(coordinates.shape)
+        lowerIndex = np.clip(np.searchsorted(axis, coordinates, side='right') - 1, 0, len(axis) - 2)
+        upperWeight = np.clip((coordinates - axis[lowerIndex])/(axis[lowerIndex + 1] - axis[lowerIndex]), 0, 1)
+        return lowerIndex, lowerIndex + 1, upperWeight
+
+    def trilinear(self, x, y, z):
+        """
+        Return the trilinear interpolation of the grid at each (x, y, z)
+        (arrays broadcast together). Positions outside are clamped to the edge.
+        Missing (NaN) nodes are left out and the other nodes' weights scaled
+        up to make up for them; the result is NaN only when every node with
+        a weight is missing.
+        """
+        x, y, z = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(z, dtype=float))
+        zLow, zHigh, zWeight = self.axisWeights(self.zAxis, z)
+        xLow, xHigh, xWeight = self.axisWeights(self.xAxis, x)
+        yLow, yHigh, yWeight = self.axisWeights(self.yAxis, y)
+        # Blend the Eight Surrounding Nodes (Only These are Read from Disk)
+        fieldValues = np.zeros(x.shape); foundWeight = np.zeros(x.shape); anyMissing = np.zeros(x.shape, dtype=bool)
+        for zIndex, zPart in ((zLow, 1 - zWeight), (zHigh, zWeight)):
+            for xIndex, xPart in ((xLow, 1 - xWeight), (xHigh, xWeight)):
+                for yIndex, yPart in ((yLow, 1 - yWeight), (yHigh, yWeight)):
+                    nodeValues = self.values[zIndex, xIndex, yIndex]
+                    nodeWeight = zPart*xPart*yPart
+                    nodeMissing = np.isnan(nodeValues)
+                    fieldValues += np.where(nodeMissing, 0, nodeValues)*nodeWeight
+                    foundWeight += np.where(nodeMissing, 0, nodeWeight)
+                    anyMissing |= nodeMissing
+        # Renormalize Only Where Nodes Were Missing (Elsewhere the Weights Already Sum to One)
+        if anyMissing.any():
+            fieldValues = np.where(anyMissing, fieldValues/np.where(foundWeight > 0, foundWeight, np.nan), fieldValues)
+        return fieldValues
+
+    def depthSlice(self, z):
+        """
+        Return the grid interpolated to depth z, indexed [x, y] (reads two
+        planes). A node missing in one plane takes the other plane's value.
+        """
+        zLow, zHigh, zWeight = self.axisWeights(self.zAxis, z)
+        lowerPlane = np.asarray(self.values[int(zLow)], dtype=float)
+        if zWeight == 0:
+            return lowerPlane
+        if zWeight == 1:
+            return np.asarray(self.values[int(zHigh)], dtype=float)
+        upperPlane = np.asarray(self.values[int(zHigh)], dtype=float)
+        blendedPlane = lowerPlane*(1 - zWeight) + upperPlane*zWeight
+        blendedPlane = np.where(np.isnan(lowerPlane), upperPlane, blendedPlane)
+        return np.where(np.isnan(upperPlane), lowerPlane, blendedPlane)
+
+    def nbytes(self):
+        return self.values.nbytes
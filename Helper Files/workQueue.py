@@ -0,0 +1,341 @@
+"""
+Sweeps Spread Over Many Machines with a Work-Queue Server
+
+A sweepCoordinator serves a queue of jobs over TCP (multiprocessing.connection,
+authenticated with a shared authkey: needed to listen on anything but the
+loopback interface, and a random one is made for loopback-only queues). Workers on any machine ask it for a job,
+run it and send the result back. Each job handed out is leased: a worker
+renews the leases of its jobs while it runs them, and a job whose lease runs
+out (its worker died or lost the network) goes back on the queue for another
+worker. The first result received for a job is kept.
+
+A job is one run: (dataset/tank, start point, strategy, parameters). On the
+coordinator's machine:
+
+    coordinator = sweepCoordinator(('0.0.0.0', 6000), authkey)
+    coordinator.addJobs(sweepJobs(tankSpec, startPoints, ['AStar', 'gradientDescent'], ...))
+    resultsTable = coordinator.resultsTable()   # Waits for Every Job
+
+and on each worker machine (from the repository folder):
+
+    python "Helper Files/workQueue.py" coordinatorHost 6000 authkey
+
+distributedSweep() does both on one machine with local worker processes.
+"""
+
+# Import Basic Modules
+import os
+import sys
+import time
+import socket
+import ipaddress
+import threading
+import traceback
+import collections
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+import numpy as np
+# Import the Simulation
+import objectParameters
+import sweepEngine
+
+
+def sweepJobs(tankSpec, startPoints, strategyNames, boatSpeed, boatDirection, sensorDistance, parameterSets = ({},), maxSteps = 40, seed = 0):
+    """
+    Return one job per strategy, parameter set and start point.
+
+    tankSpec: the tank to build, {'tankType': 'cosmolSimTank', 'arguments':
+        {'sourceLocations': ..., 'tankWidth': ..., 'tankHeight': ..., 'simFile': ...}}
+    strategyNames: names of Boat strategies in objectParameters
+    parameterSets: strategyParameters values to run each strategy with
+    """
+    return [{'tank': tankSpec, 'strategy': strategyName, 'parameters': dict(parameterValues), 'startPoint': tuple(startPoint),
+             'boatSpeed': boatSpeed, 'boatDirection': list(boatDirection), 'sensorDistance': sensorDistance, 'maxSteps': maxSteps, 'seed': seed}
+            for strategyName in strategyNames for parameterValues in parameterSets for startPoint in startPoints]
+
+
+def isLoopback(host):
+    # True if Only This Machine Can Reach host
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == 'localhost'
+
+
+class sweepCoordinator(object):
+    """
+    Hands out jobs to workers, tracks their leases and collects the results.
+    The server runs in a background thread from the moment it is created.
+
+    address: the (host, port) to listen on (port 0 = any free port; see
+        self.address)
+    authkey: the key workers must send (bytes). Required unless address is
+        loopback, where None makes a random one (see self.authkey)
+    leaseTime: seconds a worker may go without renewing a job's lease
+    maxAttempts: a job that raised an error this many times is given up
+    """
+    def __init__(self, address = ('localhost', 0), authkey = None, leaseTime = 30, maxAttempts = 3):
+        if authkey is None:
+            if not isLoopback(address[0]):
+                raise ValueError("An authkey is Needed to Listen on " + repr(address[0]))
+            authkey = os.urandom(32)
+        self.authkey = authkey
+        self.leaseTime = leaseTime
+        self.maxAttempts = maxAttempts
+        # Queue State (Guarded by jobLock)
+        self.jobs = []
+        self.pendingJobs = collections.deque()
+        self.leases = {}        # Job Number -> (Worker Name, Expiry Time)
+        self.results = {}       # Job Number -> Result
+        self.numAttempts = collections.Counter()
+        self.numReassigned = 0
+        self.jobLock = threading.Condition()
+        self.closed = False
+        # Start Serving
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.serverThread = threading.Thread(target=self.serve, daemon=True)
+        self.serverThread.start()
+
+    def addJobs(self, jobs):
+        """
+        Queue jobs (see sweepJobs). returns: their job numbers
+        """
+        with self.jobLock:
+            jobNums = list(range(len(self.jobs), len(self.jobs) + len(jobs)))
+            self.jobs.extend(jobs)
+            self.pendingJobs.extend(jobNums)
+            self.jobLock.notify_all()
+        return jobNums
+
+    # ------------------------------ Server ------------------------------ #
+
+    def serve(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                # Closed, or a Client That Failed to Authenticate
+                continue
+            threading.Thread(target=self.handleConnection, args=(connection,), daemon=True).start()
+
+    def handleConnection(self, connection):
+        try:
+            with connection:
+                request = connection.recv()
+                connection.send(self.handleRequest(*request))
+        except (OSError, EOFError):
+            pass
+
+    def reclaimExpiredLeases(self):
+        # Put Jobs Whose Worker Stopped Renewing Back on the Queue (Holding jobLock)
+        currentTime = time.time()
+        for jobNum, (_, expiryTime) in list(self.leases.items()):
+            if expiryTime < currentTime:
+                del self.leases[jobNum]
+                self.pendingJobs.appendleft(jobNum)
+                self.numReassigned += 1
+
+    def handleRequest(self, command, workerName, *arguments):
+        with self.jobLock:
+            if command == 'getJob':
+                self.reclaimExpiredLeases()
+                if self.closed:
+                    return ('done',)
+                while self.pendingJobs:
+                    jobNum = self.pendingJobs.popleft()
+                    if jobNum not in self.results:
+                        self.leases[jobNum] = (workerName, time.time() + self.leaseTime)
+                        return ('job', jobNum, self.jobs[jobNum], self.leaseTime)
+                # Nothing to Hand Out Now: Jobs May Still Come Back From Dead Workers
+                return ('wait', min(1.0, self.leaseTime/4))
+            elif command == 'renew':
+                for jobNum in arguments[0]:
+                    if self.leases.get(jobNum, (None,))[0] == workerName:
+                        self.leases[jobNum] = (workerName, time.time() + self.leaseTime)
+                return ('ok',)
+            elif command == 'result':
+                jobNum, jobResult = arguments
+                self.leases.pop(jobNum, None)
+                self.results.setdefault(jobNum, jobResult)
+                self.jobLock.notify_all()
+                return ('ok',)
+            elif command == 'failed':
+                jobNum, errorText = arguments
+                self.leases.pop(jobNum, None)
+                self.numAttempts[jobNum] += 1
+                if self.numAttempts[jobNum] >= self.maxAttempts:
+                    self.results.setdefault(jobNum, {'error': errorText})
+                    self.jobLock.notify_all()
+                elif jobNum not in self.results:
+                    self.pendingJobs.append(jobNum)
+                return ('ok',)
+            return ('error', "Unknown Command: " + str(command))
+
+    # ------------------------------ Results ----------------------------- #
+
+    def waitForResults(self, timeout = None):
+        """
+        Wait until every queued job has a result (or timeout seconds pass).
+
+        returns: a dict from job number to result; failed jobs have an 'error'
+        """
+        endTime = None if timeout is None else time.time() + timeout
+        with self.jobLock:
+            while len(self.results) < len(self.jobs):
+                # Wake Up to Reassign Jobs Even if No Worker Asks for One
+                self.reclaimExpiredLeases()
+                waitTime = self.leaseTime/4 if endTime is None else min(self.leaseTime/4, endTime - time.time())
+                if waitTime <= 0:
+                    break
+                self.jobLock.wait(waitTime)
+            return dict(self.results)
+
+    def resultsTable(self, timeout = None):
+        """
+        Wait for the results and arrange them like runStartSweep's results
+        table (failed jobs are left out), plus a 'parameters' column.
+        """
+        jobResults = self.waitForResults(timeout)
+        resultsTable = {'strategy': [], 'parameters': [], 'startX': [], 'startY': [], 'endX': [], 'endY': [], 'timeSteps': [],
+                        'sourceFound': [], 'simulatedSteps': [], 'paths': []}
+        for jobNum, job in enumerate(self.jobs):
+            runResult = jobResults.get(jobNum)
+            if runResult is None or 'error' in runResult:
+                continue
+            resultsTable['strategy'].append(job['strategy']); resultsTable['parameters'].append(job['parameters'])
+            resultsTable['startX'].append(job['startPoint'][0]); resultsTable['startY'].append(job['startPoint'][1])
+            resultsTable['endX'].append(runResult['x'][-1]); resultsTable['endY'].append(runResult['y'][-1])
+            resultsTable['timeSteps'].append(runResult['timeSteps'])
+            resultsTable['sourceFound'].append(runResult['sourceFound'])
+            resultsTable['simulatedSteps'].append(runResult['simulatedSteps'])
+            resultsTable['paths'].append(np.array([runResult['x'], runResult['y']], dtype=float))
+        # Convert the Table Columns to Arrays
+        for columnName in resultsTable:
+            if columnName not in ('paths', 'parameters'):
+                resultsTable[columnName] = np.array(resultsTable[columnName])
+        return resultsTable
+
+    def close(self):
+        """
+        Stop serving; workers asking for a job are told to stop.
+        """
+        with self.jobLock:
+            self.closed = True
+        self.listener.close()
+
+
+# --------------------------------------------------------------------------- #
+#                                  Workers                                    #
+# --------------------------------------------------------------------------- #
+
+def sendRequest(address, authkey, request):
+    with Client(address, authkey=authkey) as connection:
+        connection.send(request)
+        return connection.recv()
+
+
+def buildTank(tankSpec):
+    # Build the Tank of a Job's Tank Spec (see sweepJobs), Without Plotting its Data
+    tankType = getattr(objectParameters, tankSpec['tankType'])
+    tankArguments = dict(tankSpec['arguments'])
+    if issubclass(tankType, objectParameters.cosmolSimTank):
+        tankArguments.setdefault('plotData', False)
+    return tankType(**tankArguments)
+
+
+def runJob(job, tanks):
+    # Build Each Tank Once per Worker
+    tankKey = repr(job['tank'])
+    if tankKey not in tanks:
+        tanks[tankKey] = buildTank(job['tank'])
+    boatType = getattr(objectParameters, job['strategy'])
+    if job['parameters']:
+        boatType = boatType.withParameters(**job['parameters'])
+    runResult = sweepEngine.runMergedStrategy(tanks[tankKey], boatType, job['startPoint'], job['boatSpeed'], job['boatDirection'],
+                                              job['sensorDistance'], job['maxSteps'], job['seed'])
+    runResult['x'] = [float(x) for x in runResult['x']]; runResult['y'] = [float(y) for y in runResult['y']]
+    return runResult
+
+
+def runWorker(address, authkey, workerName = None):
+    """
+    Run jobs from the coordinator at address until it says the queue is done
+    or stops answering.
+    """
+    # Workers Never Show Figures
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    workerName = workerName or socket.gethostname() + ":" + str(os.getpid())
+    tanks = {}
+    # Renew the Lease of the Running Job in the Background (Started With the First Job, Which Gives the Lease Time)
+    runningJobs = set(); leaseTime = [None]
+    stopRenewing = threading.Event()
+    def renewLeases():
+        while not stopRenewing.wait(leaseTime[0]/3):
+            if runningJobs:
+                try:
+                    sendRequest(address, authkey, ('renew', workerName, list(runningJobs)))
+                except (OSError, EOFError):
+                    pass
+    renewThread = threading.Thread(target=renewLeases, daemon=True)
+
+    numJobs = 0
+    try:
+        while True:
+            try:
+                reply = sendRequest(address, authkey, ('getJob', workerName))
+            except (OSError, EOFError):
+                break
+            if reply[0] == 'done':
+                break
+            if reply[0] == 'wait':
+                time.sleep(reply[1])
+                continue
+            _, jobNum, job, leaseTime[0] = reply
+            runningJobs.add(jobNum)
+            if not renewThread.is_alive():
+                renewThread.start()
+            try:
+                request = ('result', workerName, jobNum, runJob(job, tanks))
+            except Exception:
+                request = ('failed', workerName, jobNum, traceback.format_exc())
+            runningJobs.discard(jobNum)
+            try:
+                sendRequest(address, authkey, request)
+            except (OSError, EOFError):
+                break
+            numJobs += 1
+    finally:
+        stopRenewing.set()
+    return numJobs
+
+
+def distributedSweep(jobs, numWorkers = None, address = ('localhost', 0), authkey = None, leaseTime = 30):
+    """
+    Run jobs with a coordinator and numWorkers local worker processes (None =
+    one per CPU). Workers on other machines can join at the printed address
+    (listening beyond loopback needs an authkey; see sweepCoordinator).
+
+    returns: the results table (see sweepCoordinator.resultsTable)
+    """
+    coordinator = sweepCoordinator(address, authkey, leaseTime)
+    print("Coordinating", len(jobs), "Jobs at", coordinator.address)
+    coordinator.addJobs(jobs)
+    workers = [multiprocessing.Process(target=runWorker, args=(coordinator.address, coordinator.authkey), daemon=True) for _ in range(numWorkers or multiprocessing.cpu_count())]
+    for worker in workers:
+        worker.start()
+    try:
+        return coordinator.resultsTable()
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.join(timeout = 5)
+
+
+if __name__ == "__main__":
+    # Join a Coordinator: python workQueue.py host port authkey
+    if len(sys.argv) != 4:
+        sys.exit("Usage: python workQueue.py host port authkey")
+    host, port, authkey = sys.argv[1], int(sys.argv[2]), sys.argv[3].encode()
+    print("Ran", runWorker((host, port), authkey), "Jobs")
@@ -26,6 +26,9 @@ sys.path.append('./Helper Files/')  # Folder with All the Helper Files
 sys.path.append('./Helper Files/simulatedSource/')  # Folder with All the Helper Files
 # Import Helper Files
 import objectParameters
+import resultCache
+import sweepEngine
+import sweepSummary
 
 
 if __name__ == "__main__":
@@ -49,6 +52,16 @@ if __name__ == "__main__":
     # Specify the Simulation Data
     simFile = './Helper Files/simulatedSource/Input Data/Excel Files/diffusion_two_drop_4M_0speed_2.xlsx'
     
+    # Cache Finished Runs (Set cacheFolder = None to Always Recompute)
+    cacheFolder = './Cache/'
+    seed = 0 # Seed for the Random Strategies. Runs are Only Cached When Seeded
+    # Splice in the Tails of Earlier Runs for Memoryless Strategies (Approximate; False = Simulate Every Run Exactly)
+    mergeTrajectories = True
+    
+    # Specify the Sweep Summary Figure
+    outFile = "./ALL/sweepSummary.png"
+    showPaths = False # Overlay Every Trajectory on the Heatmaps
+    
     # ---------------------------------------------------------------------- #
     #                        Running Boat Simulation                         #
     # ---------------------------------------------------------------------- #
@@ -58,12 +71,14 @@ if __name__ == "__main__":
     for x in range(41):
         for y in range(41):
             points.append((x,y))
-    for point in points:
-        x = point[0]; y = point[1]
-        boatLocations = [point]
-        
-        outFile = "./ALL/AStar_" + str(x) + "-" + str(y) + ".png"
-        # algPositions, fullData = objectParameters.runSimulation(sourceLocations, boatLocations, boatSpeed, boatDirection, sensorDistance, tankWidth, tankHeight, numBoats, simFile, True)
-        algPositions, fullData = objectParameters.compareAlgorythms(sourceLocations, boatLocations, boatSpeed, boatDirection, sensorDistance, tankWidth, tankHeight, numBoats, simFile, outFile)
     
-    
\ No newline at end of file
+    # Run Every Strategy From Every Start Point
+    waterTank = objectParameters.cosmolSimTank(sourceLocations, tankWidth, tankHeight, simFile)
+    boatTypes = [objectParameters.AStar, objectParameters.gradientDescent, objectParameters.interpolatedMap, objectParameters.maxDirection, objectParameters.randomDirection]
+    runCache = resultCache.resultCache(cacheFolder) if cacheFolder is not None and seed is not None else None
+    resultsTable = sweepEngine.runStartSweep(waterTank, boatTypes, points, boatSpeed, boatDirection, sensorDistance, seed = seed, mergeTrajectories = mergeTrajectories, runCache = runCache)
+    # Draw One Summary Figure for the Whole Sweep
+    sweepSummary.plotSweepSummary(resultsTable, waterTank.sourceLocations, outFile, tankWidth, tankHeight, showPaths = showPaths)
+    
+    # To Draw a Single Start Point's Trajectories:
+    # algPositions, fullData = objectParameters.compareAlgorythms(sourceLocations, boatLocations, boatSpeed, boatDirection, sensorDistance, tankWidth, tankHeight, numBoats, simFile, "./ALL/AStar_30-35.png", cacheFolder = cacheFolder, seed = seed)